@@ -6,10 +6,23 @@ from flask_cors import CORS
 from config.config import config
 from config.database import init_db, create_tables
 from controllers.routes import register_blueprints
+from services.face_gallery_service import FaceGalleryService
+from services.face_recognition_service import FaceRecognitionService
+from services.recognition_executor_service import RecognitionExecutorService
+from services.recognition_cache_service import RecognitionCacheService
+from services.checkout_buffer_service import CheckoutBufferService
+from services.thumbnail_service import ThumbnailService
+from services.image_store_service import ImageStoreService
+from services.edge_sync_service import EdgeSyncService
+from services.readiness_service import ReadinessService
 import os
 
-def create_app(config_name=None):
-    """Application factory pattern"""
+def create_app(config_name=None, services=True):
+    """
+    Application factory pattern
+    services=False builds a bare app for CLI scripts: config, database and
+    routes only, without model warm-up, the gallery, workers or background threads
+    """
     if config_name is None:
         config_name = os.getenv('FLASK_ENV', 'default')
     
@@ -25,11 +38,45 @@ def create_app(config_name=None):
     # Register blueprints
     register_blueprints(app)
     
-    # Create database tables
-    create_tables(app)
+    # Create database tables (edge devices always own their local store)
+    if app.config.get('AUTO_CREATE_TABLES') or app.config.get('EDGE_MODE'):
+        create_tables(app)
+    
+    # Configure face image preprocessing
+    FaceRecognitionService.init_app(app)
+    
+    # Debounce repeated check-in frames per kiosk
+    RecognitionCacheService.init_app(app)
+    
+    # Registration photo and thumbnail settings
+    ImageStoreService.configure(app)
+    ThumbnailService.init_app(app)
+    
+    if services:
+        init_services(app)
     
     return app
 
+def init_services(app):
+    """Start what a serving process needs: edge sync, gallery, workers and background threads"""
+    # Edge mode: local store synced with the central database
+    EdgeSyncService.init_app(app)
+    
+    # Build in-memory face gallery (during warm-up unless WARMUP_MODE=off)
+    FaceGalleryService.init_app(app, load=app.config.get('WARMUP_MODE') == 'off')
+    
+    # Start pre-warmed recognition workers
+    RecognitionExecutorService.init_app(app)
+    
+    # Coalesce check-out updates in memory
+    CheckoutBufferService.init_app(app)
+    
+    # Index the photo store and start its writer thread
+    ImageStoreService.init_app(app)
+    
+    # Load models, workers and gallery; /ready answers 200 once done
+    ReadinessService.init_app(app)
+
 if __name__ == '__main__':
     app = create_app()
     app.run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,74 @@
+"""
+Compare two benchmark result files and fail on regressions
+
+Usage (from the backend directory):
+    python3 -m benchmarks.compare baseline.json current.json [--threshold 0.15]
+Exits with status 1 when a benchmark present in both files got slower than
+the baseline by more than the threshold (and by more than --min-delta-ms, so
+sub-microsecond noise does not fail the check).
+"""
+import argparse
+import json
+import sys
+
+def load_results(path):
+    """Benchmark results of a file written by benchmarks.run"""
+    with open(path, encoding='utf-8') as result_file:
+        return json.load(result_file)
+
+def compare(baseline, current, metric='median_ms', threshold=0.15, min_delta_ms=0.01):
+    """
+    Per-benchmark comparison of two result dicts
+    Returns: list of (name, baseline_ms, current_ms, ratio, status), status is ok, faster, regression, new or removed
+    """
+    rows = []
+    for name in sorted(set(baseline) | set(current)):
+        if name not in baseline:
+            rows.append((name, None, current[name][metric], None, 'new'))
+            continue
+        if name not in current:
+            rows.append((name, baseline[name][metric], None, None, 'removed'))
+            continue
+        before, after = baseline[name][metric], current[name][metric]
+        ratio = after / before if before > 0 else float('inf')
+        delta = after - before
+        if ratio > 1 + threshold and delta > min_delta_ms:
+            status = 'regression'
+        elif ratio < 1 - threshold and -delta > min_delta_ms:
+            status = 'faster'
+        else:
+            status = 'ok'
+        rows.append((name, before, after, ratio, status))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('baseline', help='results of the reference run')
+    parser.add_argument('current', help='results of the run to check')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed relative slowdown (0.15 = 15%%)')
+    parser.add_argument('--metric', default='median_ms', choices=['median_ms', 'p95_ms', 'min_ms'])
+    parser.add_argument('--min-delta-ms', type=float, default=0.01, help='ignore slowdowns smaller than this')
+    args = parser.parse_args()
+
+    baseline, current = load_results(args.baseline), load_results(args.current)
+    for label, report in (('baseline', baseline), ('current', current)):
+        meta = report.get('meta', {})
+        print(f"{label:<9} {meta.get('commit') or '-'} {meta.get('created_at', '')} "
+              f"python {meta.get('python', '?')} numpy {meta.get('numpy', '?')} ({meta.get('cpu_count', '?')} CPUs)")
+
+    rows = compare(baseline['results'], current['results'], args.metric, args.threshold, args.min_delta_ms)
+    icons = {'ok': '  ', 'faster': '✅', 'regression': '❌', 'new': '  ', 'removed': '  '}
+    for name, before, after, ratio, status in rows:
+        before_text = f"{before:10.3f}" if before is not None else f"{'-':>10}"
+        after_text = f"{after:10.3f}" if after is not None else f"{'-':>10}"
+        ratio_text = f"{ratio:6.2f}x" if ratio is not None else f"{'':>7}"
+        print(f"{icons[status]} {name:<36} {before_text} -> {after_text} ms {ratio_text} {status}")
+
+    regressions = [row for row in rows if row[4] == 'regression']
+    if regressions:
+        print(f"❌ {len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%} on {args.metric}")
+        sys.exit(1)
+    print(f"✅ No regression above {args.threshold:.0%} on {args.metric}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+Micro-benchmarks of the recognition and attendance hot paths
+
+Run from the backend directory:
+    python3 -m benchmarks.run [--sizes 100 1000 10000 100000] [--output benchmark_results.json]
+    python3 -m benchmarks.run --quick
+Inputs are synthetic (no real faces needed). Results are written as JSON
+with median/p95/min milliseconds per benchmark, for benchmarks.compare.
+Detection, encoding and the recognize_face pipeline need face_recognition
+and are reported as skipped when it is not installed.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+from flask import Flask
+from config.config import config
+from config.database import db, init_db, create_tables
+from models import User
+from services.face_gallery_service import FaceGalleryService, GalleryEntry
+from services.face_recognition_service import FaceRecognitionService
+from services.attendance_service import AttendanceService
+from utils.helpers import decode_base64_image
+from benchmarks.synthetic import (
+    synthetic_rgb, synthetic_jpeg, synthetic_base64, centered_face_box,
+    random_encodings, noisy_queries, packed_encoding
+)
+
+FRAME_SIZES = ((640, 480), (1920, 1080))
+BATCH_SIZE = 32
+
+def measure(function, repeat, warmup=2):
+    """
+    Time repeated calls of function
+    Returns: dict with median/p95/min milliseconds and the number of runs
+    """
+    for _ in range(warmup):
+        function()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return summarize(times)
+
+def summarize(times):
+    """Millisecond statistics of a list of durations in seconds"""
+    times = sorted(times)
+    return {
+        'median_ms': round(float(np.median(times)) * 1000, 4),
+        'p95_ms': round(times[min(len(times) - 1, int(len(times) * 0.95))] * 1000, 4),
+        'min_ms': round(times[0] * 1000, 4),
+        'runs': len(times),
+    }
+
+class Suite:
+    """Collects named results and prints one line per benchmark"""
+
+    def __init__(self):
+        self.results = {}
+        self.skipped = []
+
+    def add(self, name, result, **params):
+        self.results[name] = {**result, **({'params': params} if params else {})}
+        print(f"✅ {name:<36} median {result['median_ms']:>10.3f} ms  p95 {result['p95_ms']:>10.3f} ms")
+
+    def skip(self, name, reason):
+        self.skipped.append({'name': name, 'reason': reason})
+        print(f"❌ {name:<36} skipped: {reason}")
+
+def bench_decode(suite, repeat):
+    """base64 and PIL decode of kiosk frames"""
+    for width, height in FRAME_SIZES:
+        data_url = synthetic_base64(width, height)
+        jpeg = decode_base64_image(data_url)
+        suite.add(f'decode.base64.{width}x{height}', measure(lambda: decode_base64_image(data_url), repeat),
+                  bytes=len(jpeg))
+        suite.add(f'decode.image.{width}x{height}', measure(lambda: FaceRecognitionService.load_image(jpeg), repeat),
+                  bytes=len(jpeg))
+
+def bench_detection(suite, repeat):
+    """HOG detection over full frames and encoding of one known face box"""
+    for width, height in FRAME_SIZES:
+        rgb = synthetic_rgb(width, height)
+        suite.add(f'detect.{width}x{height}', measure(lambda: FaceRecognitionService.detect_faces(rgb), repeat))
+
+    width, height = FRAME_SIZES[0]
+    rgb = synthetic_rgb(width, height)
+    location = FaceRecognitionService.face_box_to_location(centered_face_box(width, height), rgb.shape)
+    suite.add('encode.one_face', measure(lambda: FaceRecognitionService.encode_faces(rgb, [location]), repeat))
+
+def install_gallery(encodings, ann=False):
+    """Replace the in-memory gallery with synthetic users 1..N, one template each"""
+    ids = np.arange(1, len(encodings) + 1, dtype=np.int64)
+    entries = (GalleryEntry(int(user_id), f'user{user_id}', f'user{user_id}@example.invalid', f'B{user_id}', '')
+               for user_id in ids)
+    FaceGalleryService.install(encodings, ids, entries,
+                               ann_settings={'enabled': ann, 'min_gallery': 0, 'lists': 0, 'probes': 8})
+
+def bench_matching(suite, sizes, repeat, ann_min_size):
+    """Single-frame and batched matching, brute force and IVF, per gallery size"""
+    for size in sizes:
+        encodings = random_encodings(size)
+        queries = noisy_queries(encodings, 256)
+        batch = queries[:BATCH_SIZE]
+        groups = list(range(len(batch)))
+
+        variants = [('brute', False)] + ([('ann', True)] if size >= ann_min_size else [])
+        for variant, ann in variants:
+            started = time.perf_counter()
+            install_gallery(encodings, ann=ann)
+            build_seconds = time.perf_counter() - started
+            cursor = iter(range(10 ** 9))
+            suite.add(f'match.{variant}.{size}',
+                      measure(lambda: FaceGalleryService.match(queries[next(cursor) % len(queries)][None, :]), repeat),
+                      gallery_size=size, build_ms=round(build_seconds * 1000, 1))
+            suite.add(f'match_batch{BATCH_SIZE}.{variant}.{size}',
+                      measure(lambda: FaceGalleryService.match_groups(batch, groups), repeat), gallery_size=size)
+
+def bench_pipeline(suite, size, repeat):
+    """recognize_face on a JPEG with a client face box: decode, encode and match"""
+    install_gallery(random_encodings(size))
+    width, height = FRAME_SIZES[0]
+    jpeg = synthetic_jpeg(width, height)
+    face_box = centered_face_box(width, height)
+    suite.add(f'recognize_face.{size}',
+              measure(lambda: FaceRecognitionService.recognize_face(jpeg, face_box=face_box), repeat), gallery_size=size)
+
+def attendance_app(database_path):
+    """Minimal app bound to a throwaway SQLite database, without background services"""
+    app = Flask(__name__)
+    app.config.from_object(config['default'])
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI='sqlite:///' + database_path,
+        SQLALCHEMY_ENGINE_OPTIONS={},
+        EDGE_MODE=False,
+    )
+    init_db(app)
+    create_tables(app)
+    return app
+
+def bench_attendance(suite, users):
+    """
+    The attendance write path against a SQLite stand-in: first check-in of
+    the day (insert), check-out (update) and a batched check-out transaction
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        app = attendance_app(os.path.join(directory, 'benchmark.db'))
+        with app.app_context():
+            db.session.add_all([
+                User(name=f'bench{i}', email=f'bench{i}@example.invalid', employee_id=f'B{i}',
+                     face_encoding=packed_encoding(i), image_path='')
+                for i in range(users)
+            ])
+            db.session.commit()
+            people = User.query.order_by(User.id).all()
+
+            for name in ('attendance.checkin', 'attendance.checkout'):
+                times = []
+                for person in people:
+                    started = time.perf_counter()
+                    _, error = AttendanceService.process_checkin(person, image_mode='none')
+                    times.append(time.perf_counter() - started)
+                    if error:
+                        raise RuntimeError(error)
+                suite.add(name, summarize(times), users=users)
+
+            batches = [people[i:i + BATCH_SIZE] for i in range(0, len(people) - BATCH_SIZE + 1, BATCH_SIZE)]
+            times = []
+            for batch in batches:
+                started = time.perf_counter()
+                _, error = AttendanceService.process_checkins(batch)
+                times.append(time.perf_counter() - started)
+                if error:
+                    raise RuntimeError(error)
+            if times:
+                suite.add(f'attendance.batch{BATCH_SIZE}', summarize(times), users=users)
+            db.session.remove()
+            db.engine.dispose()
+
+def git_commit():
+    """Current commit of the working tree, if any"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help='gallery sizes for the matching benchmarks')
+    parser.add_argument('--repeat', type=int, default=30, help='timed calls per benchmark')
+    parser.add_argument('--users', type=int, default=500, help='users in the attendance benchmark')
+    parser.add_argument('--pipeline-size', type=int, default=1000, help='gallery size of the recognize_face benchmark')
+    parser.add_argument('--ann-min-size', type=int, default=1000, help='smallest gallery also matched with IVF')
+    parser.add_argument('--quick', action='store_true', help='small sizes and few runs, for a smoke test')
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args()
+    if args.quick:
+        args.sizes, args.repeat, args.users, args.pipeline_size = [100, 1000], 5, 64, 100
+
+    np.random.seed(0)
+    suite = Suite()
+    face_models = importlib.util.find_spec('face_recognition') is not None
+
+    bench_decode(suite, args.repeat)
+    if face_models:
+        bench_detection(suite, args.repeat)
+    else:
+        suite.skip('detect/encode', 'face_recognition is not installed')
+    bench_matching(suite, args.sizes, args.repeat, args.ann_min_size)
+    if face_models:
+        bench_pipeline(suite, args.pipeline_size, args.repeat)
+    else:
+        suite.skip('recognize_face', 'face_recognition is not installed')
+    bench_attendance(suite, args.users)
+
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'arguments': vars(args),
+            'skipped': suite.skipped,
+        },
+        'results': suite.results,
+    }
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"✅ {len(suite.results)} benchmarks written to {args.output}")
+
+if __name__ == '__main__':
+    main()
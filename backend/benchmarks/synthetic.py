@@ -0,0 +1,56 @@
+"""
+Synthetic inputs for the benchmarks: camera-like frames and face encodings
+
+Nothing here contains a real face. Detection benchmarks measure the cost of
+scanning a frame; encoding and matching use fixed face boxes and random
+128-d encodings spread like dlib embeddings.
+"""
+import base64
+import io
+import numpy as np
+from PIL import Image
+from utils.helpers import FACE_ENCODING_DTYPE, pack_face_encoding
+
+ENCODING_SIZE = 128
+
+def synthetic_rgb(width, height, seed=0):
+    """Smooth gradients plus sensor-like noise, so JPEG sizes are close to camera frames"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = np.stack([
+        128 + 100 * np.sin(x / width * 6.0 + seed),
+        128 + 100 * np.cos(y / height * 4.0),
+        128 + 60 * np.sin((x + y) / (width + height) * 8.0),
+    ], axis=-1)
+    noisy = base + rng.normal(0, 12, base.shape)
+    return np.clip(noisy, 0, 255).astype(np.uint8)
+
+def synthetic_jpeg(width, height, seed=0, quality=90):
+    """JPEG bytes of a synthetic frame"""
+    buffer = io.BytesIO()
+    Image.fromarray(synthetic_rgb(width, height, seed)).save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+def synthetic_base64(width, height, seed=0):
+    """Data URL of a synthetic JPEG, as sent by the kiosk"""
+    return 'data:image/jpeg;base64,' + base64.b64encode(synthetic_jpeg(width, height, seed)).decode('ascii')
+
+def centered_face_box(width, height, fraction=0.4):
+    """Client face box {x, y, width, height} covering the middle of a frame"""
+    side = int(min(width, height) * fraction)
+    return {'x': (width - side) // 2, 'y': (height - side) // 2, 'width': side, 'height': side}
+
+def random_encodings(count, seed=0):
+    """Random encodings with roughly the per-dimension spread of dlib embeddings"""
+    rng = np.random.default_rng(seed)
+    return rng.normal(0, 0.1, (count, ENCODING_SIZE)).astype(FACE_ENCODING_DTYPE)
+
+def noisy_queries(encodings, count, noise=0.03, seed=1):
+    """Queries close to enrolled encodings, like new frames of enrolled people"""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(encodings), min(count, len(encodings)), replace=False)
+    return encodings[picks] + rng.normal(0, noise, (len(picks), ENCODING_SIZE)).astype(FACE_ENCODING_DTYPE)
+
+def packed_encoding(seed=0):
+    """One packed encoding for users.face_encoding"""
+    return pack_face_encoding(random_encodings(1, seed)[0])
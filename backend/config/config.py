@@ -18,13 +18,97 @@ class Config:
     DB_NAME = os.getenv('DB', 'checkin')
     DB_DIALECT = os.getenv('DIALECT', 'mysql')
     
-    # Construct MySQL connection string
-    SQLALCHEMY_DATABASE_URI = f'mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}?charset=utf8mb4'
+    # Construct MySQL connection string (DATABASE_URL overrides it, e.g. sqlite:///checkin.db)
+    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL') or f'mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}?charset=utf8mb4'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_pre_ping': True,
         'pool_recycle': 300,
     }
+    
+    # Startup: create missing tables on boot (skipped in production, run scripts/create_tables.py)
+    # and warm up models and gallery before /ready reports the instance ready
+    AUTO_CREATE_TABLES = os.getenv('AUTO_CREATE_TABLES', 'true').lower() == 'true'
+    WARMUP_MODE = os.getenv('WARMUP_MODE', 'background')  # background | blocking | off
+    WARMUP_RETRY_INTERVAL = float(os.getenv('WARMUP_RETRY_INTERVAL', '5'))  # Seconds between failed warm-up attempts
+    
+    # Edge mode: check-ins go to a local SQLite store (WAL) and are synced in
+    # batches to the central database above (or CENTRAL_DATABASE_URL)
+    EDGE_MODE = os.getenv('EDGE_MODE', 'false').lower() == 'true'
+    EDGE_DATABASE_PATH = os.getenv('EDGE_DATABASE_PATH', 'edge.db')
+    CENTRAL_DATABASE_URI = os.getenv('CENTRAL_DATABASE_URL')
+    EDGE_SYNC_INTERVAL = float(os.getenv('EDGE_SYNC_INTERVAL', '10'))  # Seconds between attendance uploads
+    EDGE_SYNC_BATCH_SIZE = int(os.getenv('EDGE_SYNC_BATCH_SIZE', '500'))  # Attendance rows per upload transaction
+    EDGE_GALLERY_REFRESH = float(os.getenv('EDGE_GALLERY_REFRESH', '300'))  # Seconds between user/template pulls
+    
+    # Approximate nearest-neighbour (IVF) search for large face galleries
+    FACE_ANN_ENABLED = os.getenv('FACE_ANN_ENABLED', 'false').lower() == 'true'
+    FACE_ANN_MIN_GALLERY = int(os.getenv('FACE_ANN_MIN_GALLERY', '5000'))  # Brute force below this size
+    FACE_ANN_LISTS = int(os.getenv('FACE_ANN_LISTS', '0'))  # 0 = sqrt(gallery size)
+    FACE_ANN_PROBES = int(os.getenv('FACE_ANN_PROBES', '8'))
+    
+    # Multiple face templates per user
+    FACE_TEMPLATE_REDUCTION = os.getenv('FACE_TEMPLATE_REDUCTION', 'min')  # min | centroid
+    FACE_MAX_TEMPLATES_PER_USER = int(os.getenv('FACE_MAX_TEMPLATES_PER_USER', '5'))  # Including registration image
+    FACE_TEMPLATE_LEARN_DISTANCE = float(os.getenv('FACE_TEMPLATE_LEARN_DISTANCE', '0.4'))  # Learn only confident matches
+    FACE_TEMPLATE_MIN_NOVELTY = float(os.getenv('FACE_TEMPLATE_MIN_NOVELTY', '0.15'))  # Skip near-duplicate templates
+    FACE_TEMPLATE_LEARN_INTERVAL = float(os.getenv('FACE_TEMPLATE_LEARN_INTERVAL', '3600'))  # Seconds between learnt templates per user
+    
+    # Gallery snapshot memory-mapped by every process (empty = build from the database in each process)
+    FACE_GALLERY_SNAPSHOT_DIR = os.getenv('FACE_GALLERY_SNAPSHOT_DIR', '')
+    FACE_GALLERY_REFRESH_INTERVAL = float(os.getenv('FACE_GALLERY_REFRESH_INTERVAL', '30'))  # Seconds between delta refreshes, 0 = off
+    
+    # Check-in frame preprocessing (longest side in pixels, 0 = full resolution)
+    FACE_DECODE_MAX_SIDE = int(os.getenv('FACE_DECODE_MAX_SIDE', '1280'))
+    FACE_DETECT_MAX_SIDE = int(os.getenv('FACE_DETECT_MAX_SIDE', '640'))
+    
+    # Recognition process pool (0 = recognize inside the request thread)
+    RECOGNITION_WORKERS = int(os.getenv('RECOGNITION_WORKERS', '0'))
+    RECOGNITION_QUEUE_SIZE = int(os.getenv('RECOGNITION_QUEUE_SIZE', '4'))  # Waiting requests beyond busy workers
+    RECOGNITION_TIMEOUT = float(os.getenv('RECOGNITION_TIMEOUT', '10'))  # Seconds per request
+    RECOGNITION_RETRY_AFTER = int(os.getenv('RECOGNITION_RETRY_AFTER', '1'))  # Seconds, sent with 503
+    RECOGNITION_BATCH_THREADS = int(os.getenv('RECOGNITION_BATCH_THREADS', '4'))  # Batch images encoded at once without the pool, 1 = sequential
+    CHECKIN_BATCH_MAX_IMAGES = int(os.getenv('CHECKIN_BATCH_MAX_IMAGES', '32'))
+    
+    # User listing and attendance history pagination
+    USER_PAGE_SIZE = int(os.getenv('USER_PAGE_SIZE', '100'))
+    USER_MAX_PAGE_SIZE = int(os.getenv('USER_MAX_PAGE_SIZE', '1000'))
+    HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '50'))
+    HISTORY_MAX_PAGE_SIZE = int(os.getenv('HISTORY_MAX_PAGE_SIZE', '500'))
+    
+    # Attendance reports
+    REPORT_DEFAULT_DAYS = int(os.getenv('REPORT_DEFAULT_DAYS', '30'))  # Range when no start date is given
+    REPORT_MAX_DAYS = int(os.getenv('REPORT_MAX_DAYS', '366'))  # Longest allowed range
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))  # Rows fetched per server-side cursor batch
+    
+    # Bulk enrollment from a roster CSV plus photos
+    USER_IMPORT_CHUNK_SIZE = int(os.getenv('USER_IMPORT_CHUNK_SIZE', '64'))  # Photos encoded and inserted per batch
+    USER_IMPORT_MAX_ROWS = int(os.getenv('USER_IMPORT_MAX_ROWS', '2000'))  # Roster rows per HTTP import
+    USER_IMPORT_MAX_PHOTO_BYTES = int(os.getenv('USER_IMPORT_MAX_PHOTO_BYTES', str(10 * 1024 * 1024)))
+    
+    # Debounce repeated kiosk frames of the same person (TTL 0 = disabled)
+    RECOGNITION_CACHE_TTL = float(os.getenv('RECOGNITION_CACHE_TTL', '5'))  # Seconds
+    RECOGNITION_CACHE_SIZE = int(os.getenv('RECOGNITION_CACHE_SIZE', '256'))  # Kiosk/user entries
+    RECOGNITION_CACHE_DISTANCE = float(os.getenv('RECOGNITION_CACHE_DISTANCE', '0.35'))  # Max distance to the cached frame
+    
+    # Opt-in write-behind buffer for check-out updates (interval 0 = write on every request).
+    # Buffered check-outs reach the database, summaries and edge sync only at the next
+    # flush and are lost if the process is killed
+    CHECKOUT_BUFFER_INTERVAL = float(os.getenv('CHECKOUT_BUFFER_INTERVAL', '0'))  # Seconds between flushes
+    CHECKOUT_BUFFER_MAX_PENDING = int(os.getenv('CHECKOUT_BUFFER_MAX_PENDING', '500'))  # Flush early at this size
+    
+    # Content-addressed registration photo store
+    IMAGE_STORE_DIR = os.getenv('IMAGE_STORE_DIR', 'face_images')
+    IMAGE_STORE_MAX_SIDE = int(os.getenv('IMAGE_STORE_MAX_SIDE', '1024'))  # Larger photos are re-encoded
+    IMAGE_STORE_QUALITY = int(os.getenv('IMAGE_STORE_QUALITY', '90'))  # JPEG quality when re-encoding
+    
+    # Registration photo thumbnails in check-in responses
+    CHECKIN_IMAGE_MODE = os.getenv('CHECKIN_IMAGE_MODE', 'inline')  # inline | url | none
+    THUMBNAIL_SIZE = int(os.getenv('THUMBNAIL_SIZE', '160'))  # Longest side in pixels
+    THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', '80'))
+    THUMBNAIL_DIR = os.path.join(IMAGE_STORE_DIR, 'thumbnails')
+    THUMBNAIL_CACHE_BYTES = int(os.getenv('THUMBNAIL_CACHE_BYTES', str(16 * 1024 * 1024)))
+    THUMBNAIL_MAX_AGE = int(os.getenv('THUMBNAIL_MAX_AGE', '86400'))  # Seconds, URLs are versioned by photo mtime
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -33,10 +117,27 @@ class DevelopmentConfig(Config):
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
+    AUTO_CREATE_TABLES = os.getenv('AUTO_CREATE_TABLES', 'false').lower() == 'true'
+
+class TestingConfig(Config):
+    """Testing configuration: SQLite, no warm-up, worker pool or background threads"""
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', 'sqlite:///test_checkin.db')
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    AUTO_CREATE_TABLES = True
+    WARMUP_MODE = 'off'
+    EDGE_MODE = False
+    FACE_GALLERY_SNAPSHOT_DIR = ''
+    FACE_GALLERY_REFRESH_INTERVAL = 0
+    RECOGNITION_WORKERS = 0
+    RECOGNITION_CACHE_TTL = 0
+    CHECKOUT_BUFFER_INTERVAL = 0
+    CHECKIN_IMAGE_MODE = 'none'
 
 # Configuration dictionary
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'testing': TestingConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
@@ -1,24 +1,43 @@
 """
 Database initialization
 """
+import os
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
 db = SQLAlchemy()
 
+def _configure_edge_database(app):
+    """Edge mode: the app uses a local SQLite store, the configured database becomes the central one"""
+    app.config['CENTRAL_DATABASE_URI'] = app.config.get('CENTRAL_DATABASE_URI') or app.config['SQLALCHEMY_DATABASE_URI']
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.abspath(app.config.get('EDGE_DATABASE_PATH', 'edge.db'))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+
+def _set_edge_pragmas(dbapi_connection, _):
+    """WAL lets check-ins write while the sync thread and workers read"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
 def init_db(app):
     """Initialize database with Flask app"""
+    if app.config.get('EDGE_MODE'):
+        _configure_edge_database(app)
     db.init_app(app)
     
     # Import models after db initialization to avoid circular imports
     with app.app_context():
-        from models import User, Attendance
+        from models import User, Attendance, FaceTemplate, AttendanceMonthlySummary, AttendanceDailySummary, UserDeletion
+        if app.config.get('EDGE_MODE'):
+            event.listen(db.engine, 'connect', _set_edge_pragmas)
     
 def create_tables(app):
     """Create database tables"""
     try:
         with app.app_context():
             # Import models
-            from models import User, Attendance
+            from models import User, Attendance, FaceTemplate, AttendanceMonthlySummary, AttendanceDailySummary, UserDeletion
             db.create_all()
             print("✅ Database tables created successfully!")
     except Exception as e:
@@ -1,10 +1,16 @@
 """
 Attendance controller for check-in/check-out operations
 """
-from flask import request, jsonify
+import json
+from datetime import date, timedelta
+from flask import request, jsonify, current_app, Response, stream_with_context
 from services.user_service import UserService
-from services.attendance_service import AttendanceService
-from services.face_recognition_service import FaceRecognitionService
+from services.attendance_service import AttendanceService, REPORT_GROUPS
+from services.attendance_export_service import AttendanceExportService, EXPORT_FORMATS
+from services.recognition_executor_service import RecognitionExecutorService, RecognitionBusyError
+from services.recognition_cache_service import RecognitionCacheService
+from utils.helpers import read_request_image, read_request_images
+from utils.sql_helpers import decode_keyset_cursor, REPORT_PERIODS
 
 class AttendanceController:
     """Controller for attendance operations"""
@@ -16,28 +22,60 @@ class AttendanceController:
             'success': True,
             'message': 'Face recognition check-in endpoint',
             'required_fields': ['image_data'],
+            'optional_fields': ['face_box', 'face_crop', 'face_margin', 'image_mode'],
+            'optional_headers': ['X-Kiosk-Id'],
             'method': 'POST',
-            'description': 'Send base64 encoded image for face recognition check-in/check-out'
+            'description': 'Send the image as base64 image_data, a multipart file part named image, or a raw image/jpeg body for face recognition check-in/check-out'
         })
     
+    @staticmethod
+    def _face_hints(data):
+        """
+        Client face box and crop margin; malformed values fall back to full
+        detection and the default margin instead of failing the check-in
+        Returns: (face_box or None, face_margin)
+        """
+        face_box = data.get('face_box')
+        if isinstance(face_box, str):
+            try:
+                face_box = json.loads(face_box) if face_box else None
+            except ValueError:
+                face_box = None
+        if not isinstance(face_box, dict):
+            face_box = None
+        try:
+            face_margin = float(data.get('face_margin', 0.2))
+        except (TypeError, ValueError):
+            face_margin = 0.2
+        return face_box, face_margin
+    
     @staticmethod
     def process_checkin():
         """Process face recognition and check-in/check-out"""
         try:
-            data = request.get_json() if request.is_json else request.form
-            image_data = data.get('image_data')
+            image_bytes, data = read_request_image(request)
             
-            if not image_data:
+            if not image_bytes:
                 return jsonify({
                     'success': False,
                     'message': 'Không có dữ liệu ảnh!'
                 }), 400
             
-            # Get all users for face recognition
-            users = UserService.get_all_users()
+            # Optional face box from the client-side detector (skips server detection)
+            face_box, face_margin = AttendanceController._face_hints(data)
+            face_crop = str(data.get('face_crop', '')).lower() in ('1', 'true')
+            # Registration photo as inline base64 thumbnail or cacheable URL
+            image_mode = data.get('image_mode') or current_app.config.get('CHECKIN_IMAGE_MODE', 'inline')
             
-            # Recognize face
-            found_user, confidence, error = FaceRecognitionService.recognize_face(image_data, users)
+            # Recognize face against this kiosk's recent frames, then the in-memory gallery
+            kiosk_id = request.headers.get('X-Kiosk-Id') or request.remote_addr
+            try:
+                found_user, confidence, error, face_encoding = RecognitionExecutorService.recognize(
+                    image_bytes, face_box=face_box, face_crop=face_crop, face_margin=face_margin,
+                    recent=RecognitionCacheService.recent_frames(kiosk_id)
+                )
+            except RecognitionBusyError as busy:
+                return AttendanceController._busy_response(busy)
             
             if error:
                 return jsonify({
@@ -51,8 +89,71 @@ class AttendanceController:
                     'message': 'Không nhận diện được khuôn mặt! Vui lòng đăng ký trước.'
                 }), 404
             
-            # Process attendance
-            result, error = AttendanceService.process_checkin(found_user)
+            return AttendanceController._record_recognized(kiosk_id, found_user, confidence, face_encoding, image_mode)
+            
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'Lỗi server: {str(e)}'
+            }), 500
+    
+    @staticmethod
+    def _busy_response(busy):
+        """503 with Retry-After when the recognition workers are saturated"""
+        response = jsonify({
+            'success': False,
+            'message': str(busy)
+        })
+        response.headers['Retry-After'] = str(busy.retry_after)
+        return response, 503
+    
+    @staticmethod
+    def _record_recognized(kiosk_id, found_user, confidence, face_encoding, image_mode):
+        """Record attendance of a recognized user, reusing the kiosk's result for repeated frames"""
+        # Repeated frame of the same person at the same kiosk: reuse the result
+        cached_result = RecognitionCacheService.get(kiosk_id, found_user.id, face_encoding)
+        if cached_result:
+            return jsonify({**cached_result, 'cached': True})
+        
+        # Process attendance
+        result, error = AttendanceService.process_checkin(found_user, image_mode=image_mode)
+        
+        if error:
+            return jsonify({
+                'success': False,
+                'message': error
+            }), 400
+        
+        RecognitionCacheService.put(kiosk_id, found_user.id, face_encoding, result)
+        
+        # Keep confident frames as extra templates for this user
+        UserService.learn_face_template(found_user.id, face_encoding, confidence)
+        
+        return jsonify(result)
+    
+    @staticmethod
+    def process_checkin_batch():
+        """Recognize many buffered frames and record their attendance in one transaction"""
+        try:
+            images, _ = read_request_images(request)
+            
+            if not images:
+                return jsonify({
+                    'success': False,
+                    'message': 'Không có dữ liệu ảnh!'
+                }), 400
+            
+            max_images = current_app.config.get('CHECKIN_BATCH_MAX_IMAGES', 32)
+            if len(images) > max_images:
+                return jsonify({
+                    'success': False,
+                    'message': f'Tối đa {max_images} ảnh mỗi lần gửi!'
+                }), 413
+            
+            try:
+                results, error = AttendanceService.process_checkin_batch(images)
+            except RecognitionBusyError as busy:
+                return AttendanceController._busy_response(busy)
             
             if error:
                 return jsonify({
@@ -60,7 +161,12 @@ class AttendanceController:
                     'message': error
                 }), 400
             
-            return jsonify(result)
+            return jsonify({
+                'success': True,
+                'results': results,
+                'total': len(results),
+                'recognized': len([result for result in results if result['success']])
+            })
             
         except Exception as e:
             return jsonify({
@@ -70,35 +176,30 @@ class AttendanceController:
     
     @staticmethod
     def user_history(user_id):
-        """Get attendance history for a specific user"""
+        """Get one page of attendance history for a specific user (?limit=&cursor=)"""
         try:
-            user = UserService.get_user_by_id(user_id)
+            user = UserService.get_user_summary(user_id)
             if not user:
                 return jsonify({
                     'success': False,
                     'message': 'Không tìm thấy người dùng'
                 }), 404
             
-            attendances = AttendanceService.get_user_attendances(user_id)
-            
-            # Convert attendance data to JSON format
-            attendance_data = []
-            for attendance in attendances:
-                # Calculate duration if both check_in and check_out exist
-                duration = None
-                if attendance.check_in and attendance.check_out:
-                    time_diff = attendance.check_out - attendance.check_in
-                    hours = int(time_diff.total_seconds() // 3600)
-                    minutes = int((time_diff.total_seconds() % 3600) // 60)
-                    duration = f"{hours}h {minutes}m"
-                
-                attendance_data.append({
-                    'id': attendance.id,
-                    'checkin_time': attendance.check_in.isoformat() if attendance.check_in else None,
-                    'checkout_time': attendance.check_out.isoformat() if attendance.check_out else None,
-                    'date': attendance.date.isoformat() if attendance.date else None,
-                    'duration': duration
-                })
+            # Page size and keyset cursor from the previous page
+            default_limit = current_app.config.get('HISTORY_PAGE_SIZE', 50)
+            max_limit = current_app.config.get('HISTORY_MAX_PAGE_SIZE', 500)
+            limit = min(max(request.args.get('limit', default_limit, type=int), 1), max_limit)
+            cursor = request.args.get('cursor')
+            try:
+                cursor = decode_keyset_cursor(cursor) if cursor else None
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'message': 'Cursor không hợp lệ!'
+                }), 400
+            
+            attendance_data, next_cursor = AttendanceService.get_user_history_page(user_id, limit, cursor)
+            summary = AttendanceService.get_user_history_summary(user_id)
             
             return jsonify({
                 'success': True,
@@ -109,7 +210,133 @@ class AttendanceController:
                     'employee_id': user.employee_id
                 },
                 'attendances': attendance_data,
-                'total': len(attendance_data)
+                'total': summary['total'],
+                'summary': summary,
+                'limit': limit,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            })
+            
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'Lỗi server: {str(e)}'
+            }), 500
+    
+    @staticmethod
+    def _date_range_args(max_days=None):
+        """
+        Parse ?start=&end= (YYYY-MM-DD); end defaults to today and start to
+        REPORT_DEFAULT_DAYS before it
+        Returns: (start_date, end_date, error_response or None)
+        """
+        try:
+            end_date = date.fromisoformat(request.args['end']) if request.args.get('end') else date.today()
+            default_days = current_app.config.get('REPORT_DEFAULT_DAYS', 30)
+            start_date = (date.fromisoformat(request.args['start']) if request.args.get('start')
+                          else end_date - timedelta(days=default_days - 1))
+        except ValueError:
+            return None, None, (jsonify({
+                'success': False,
+                'message': 'Ngày không hợp lệ! Định dạng YYYY-MM-DD'
+            }), 400)
+        
+        if start_date > end_date or (max_days and (end_date - start_date).days >= max_days):
+            message = f'Khoảng thời gian không hợp lệ! Tối đa {max_days} ngày' if max_days else 'Khoảng thời gian không hợp lệ!'
+            return None, None, (jsonify({
+                'success': False,
+                'message': message
+            }), 400)
+        return start_date, end_date, None
+    
+    @staticmethod
+    def report():
+        """
+        Attendance totals per day/week/month and per user or department
+        (?start=YYYY-MM-DD&end=YYYY-MM-DD&period=day|week|month&group_by=user|department)
+        """
+        try:
+            period = request.args.get('period', 'day')
+            group_by = request.args.get('group_by', 'user')
+            if period not in REPORT_PERIODS or group_by not in REPORT_GROUPS:
+                return jsonify({
+                    'success': False,
+                    'message': 'Tham số period hoặc group_by không hợp lệ!'
+                }), 400
+            
+            start_date, end_date, error_response = AttendanceController._date_range_args(
+                current_app.config.get('REPORT_MAX_DAYS', 366)
+            )
+            if error_response:
+                return error_response
+            
+            report = AttendanceService.get_attendance_report(start_date, end_date, period, group_by)
+            
+            return jsonify({
+                'success': True,
+                'start': start_date.isoformat(),
+                'end': end_date.isoformat(),
+                'period': period,
+                'group_by': group_by,
+                'rows': report,
+                'total': len(report)
+            })
+            
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'Lỗi server: {str(e)}'
+            }), 500
+    
+    @staticmethod
+    def dashboard():
+        """Monthly attendance dashboard from the summary tables (?month=YYYY-MM, default current month)"""
+        try:
+            month = request.args.get('month')
+            try:
+                month = date.fromisoformat(f'{month}-01') if month else date.today().replace(day=1)
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'message': 'Tháng không hợp lệ! Định dạng YYYY-MM'
+                }), 400
+            
+            return jsonify({
+                'success': True,
+                **AttendanceService.get_dashboard(month)
+            })
+            
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'Lỗi server: {str(e)}'
+            }), 500
+    
+    @staticmethod
+    def export():
+        """
+        Stream attendance with user details as a file download
+        (?start=YYYY-MM-DD&end=YYYY-MM-DD&format=csv|ndjson)
+        """
+        try:
+            export_format = request.args.get('format', 'csv')
+            if export_format not in EXPORT_FORMATS:
+                return jsonify({
+                    'success': False,
+                    'message': 'Định dạng xuất không hợp lệ! (csv hoặc ndjson)'
+                }), 400
+            
+            start_date, end_date, error_response = AttendanceController._date_range_args()
+            if error_response:
+                return error_response
+            
+            lines = AttendanceExportService.iter_export(
+                start_date, end_date, export_format, current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+            )
+            filename = f'attendance_{start_date.isoformat()}_{end_date.isoformat()}.{export_format}'
+            # Chunked response: rows are read and sent while the client downloads
+            return Response(stream_with_context(lines), mimetype=EXPORT_FORMATS[export_format], headers={
+                'Content-Disposition': f'attachment; filename={filename}'
             })
             
         except Exception as e:
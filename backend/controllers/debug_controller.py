@@ -4,6 +4,12 @@ Debug controller for debugging and testing
 from flask import request, jsonify
 from services.user_service import UserService
 from services.face_recognition_service import FaceRecognitionService
+from services.face_gallery_service import FaceGalleryService
+from services.recognition_cache_service import RecognitionCacheService
+from services.checkout_buffer_service import CheckoutBufferService
+from services.edge_sync_service import EdgeSyncService
+from services.thumbnail_service import ThumbnailService
+from utils.helpers import read_request_image
 
 class DebugController:
     """Controller for debug operations"""
@@ -27,22 +33,82 @@ class DebugController:
     def test_recognition():
         """Debug endpoint to test face recognition"""
         try:
-            image_data = request.form.get('image_data')
+            image_bytes, _ = read_request_image(request)
             
-            if not image_data:
+            if not image_bytes:
                 return jsonify({'success': False, 'message': 'Không có dữ liệu ảnh!'})
             
             # Get all users
             users = UserService.get_all_users()
             
             # Get detailed comparison results
-            result = FaceRecognitionService.get_face_comparison_details(image_data, users)
+            result = FaceRecognitionService.get_face_comparison_details(image_bytes, users)
             
             return jsonify({
                 'success': True,
                 **result
             })
             
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            })
+    
+    @staticmethod
+    def ann_report():
+        """Debug endpoint comparing ANN search with brute force on the live gallery"""
+        try:
+            sample_size = request.args.get('sample_size', 200, type=int)
+            n_probe = request.args.get('n_probe', None, type=int)
+            report = FaceGalleryService.ann_report(sample_size=sample_size, n_probe=n_probe)
+            return jsonify({
+                'success': True,
+                **report
+            })
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            })
+    
+    @staticmethod
+    def cache_stats():
+        """Debug endpoint with recognition and thumbnail cache counters"""
+        try:
+            return jsonify({
+                'success': True,
+                **RecognitionCacheService.stats(),
+                'thumbnails': ThumbnailService.stats()
+            })
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            })
+    
+    @staticmethod
+    def checkout_buffer():
+        """Debug endpoint with check-out write-behind buffer counters"""
+        try:
+            return jsonify({
+                'success': True,
+                **CheckoutBufferService.stats()
+            })
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            })
+    
+    @staticmethod
+    def edge_sync():
+        """Debug endpoint with edge sync lag and counters"""
+        try:
+            return jsonify({
+                'success': True,
+                **EdgeSyncService.stats()
+            })
         except Exception as e:
             return jsonify({
                 'success': False,
@@ -2,6 +2,7 @@
 Main controller for home and general routes
 """
 from flask import jsonify
+from services.readiness_service import ReadinessService
 
 class MainController:
     """Controller for main application routes"""
@@ -15,9 +16,17 @@ class MainController:
             'version': '1.0.0',
             'endpoints': {
                 'register': '/user/register',
+                'import_users': '/user/import',
                 'checkin': '/attendance/checkin',
+                'checkin_batch': '/attendance/checkin/batch',
                 'history': '/user/history',
-                'user_history': '/attendance/history/<user_id>'
+                'user_history': '/attendance/history/<user_id>',
+                'report': '/attendance/report?start=&end=&period=day|week|month&group_by=user|department',
+                'dashboard': '/attendance/dashboard?month=YYYY-MM',
+                'export': '/attendance/export?start=&end=&format=csv|ndjson',
+                'user_thumbnail': '/user/<user_id>/thumbnail',
+                'ready': '/ready',
+                'metrics': '/metrics'
             }
         })
     
@@ -29,6 +38,26 @@ class MainController:
             'message': 'Debug API endpoint',
             'debug_endpoints': {
                 'users': '/debug/users',
-                'test_recognition': '/debug/test_recognition'
+                'test_recognition': '/debug/test_recognition',
+                'ann_report': '/debug/ann_report',
+                'cache': '/debug/cache',
+                'checkout_buffer': '/debug/checkout_buffer',
+                'edge_sync': '/debug/edge_sync'
             }
+        })
+    
+    @staticmethod
+    def ready():
+        """Readiness probe: 200 once warm-up finished, 503 before"""
+        status = ReadinessService.status()
+        if not status['ready']:
+            return jsonify({
+                'success': False,
+                'message': 'Hệ thống đang khởi động, vui lòng thử lại sau!',
+                **status
+            }), 503
+        return jsonify({
+            'success': True,
+            'message': 'Hệ thống sẵn sàng',
+            **status
         })
\ No newline at end of file
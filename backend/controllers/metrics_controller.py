@@ -0,0 +1,32 @@
+"""
+Metrics controller for the Prometheus scrape endpoint
+"""
+import time
+from flask import request, g, Response
+from services.face_gallery_service import FaceGalleryService
+from utils.metrics import render, REQUEST_SECONDS, GALLERY_USERS, GALLERY_TEMPLATES
+
+class MetricsController:
+    """Controller for request timing and /metrics"""
+    
+    @staticmethod
+    def start_timer():
+        """before_request hook: remember when the request started"""
+        g.request_started = time.perf_counter()
+    
+    @staticmethod
+    def record_request(response):
+        """after_request hook: observe the request latency by endpoint and status"""
+        started = g.pop('request_started', None)
+        if started is not None and request.endpoint:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started, endpoint=request.endpoint, status=response.status_code
+            )
+        return response
+    
+    @staticmethod
+    def metrics():
+        """Prometheus text exposition of this process's counters and histograms"""
+        GALLERY_USERS.set(FaceGalleryService.size())
+        GALLERY_TEMPLATES.set(FaceGalleryService.template_count())
+        return Response(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -6,6 +6,7 @@ from controllers.main_controller import MainController
 from controllers.user_controller import UserController
 from controllers.attendance_controller import AttendanceController
 from controllers.debug_controller import DebugController
+from controllers.metrics_controller import MetricsController
 
 # Create blueprints
 main_bp = Blueprint('main', __name__)
@@ -16,24 +17,40 @@ debug_bp = Blueprint('debug', __name__, url_prefix='/debug')
 # Main routes
 main_bp.route('/')(MainController.index)
 main_bp.route('/debug')(MainController.debug)
+main_bp.route('/ready')(MainController.ready)
+main_bp.route('/metrics')(MetricsController.metrics)
 
 # User routes
 user_bp.route('/register', methods=['GET'])(UserController.register)
 user_bp.route('/register', methods=['POST'])(UserController.register_user)
+user_bp.route('/import', methods=['POST'])(UserController.import_users)
 user_bp.route('/history')(UserController.history)
+user_bp.route('/<int:user_id>/thumbnail')(UserController.thumbnail)
 
 # Attendance routes
 attendance_bp.route('/checkin', methods=['GET'])(AttendanceController.checkin)
 attendance_bp.route('/checkin', methods=['POST'])(AttendanceController.process_checkin)
+attendance_bp.route('/checkin/batch', methods=['POST'])(AttendanceController.process_checkin_batch)
 attendance_bp.route('/history/<int:user_id>')(AttendanceController.user_history)
+attendance_bp.route('/report')(AttendanceController.report)
+attendance_bp.route('/dashboard')(AttendanceController.dashboard)
+attendance_bp.route('/export')(AttendanceController.export)
 
 # Debug routes
 debug_bp.route('/users')(DebugController.debug_users)
 debug_bp.route('/test_recognition', methods=['POST'])(DebugController.test_recognition)
+debug_bp.route('/ann_report')(DebugController.ann_report)
+debug_bp.route('/cache')(DebugController.cache_stats)
+debug_bp.route('/checkout_buffer')(DebugController.checkout_buffer)
+debug_bp.route('/edge_sync')(DebugController.edge_sync)
 
 def register_blueprints(app):
     """Register all blueprints with the Flask app"""
     app.register_blueprint(main_bp)
     app.register_blueprint(user_bp)
     app.register_blueprint(attendance_bp)
-    app.register_blueprint(debug_bp)
\ No newline at end of file
+    app.register_blueprint(debug_bp)
+    
+    # Per-endpoint request latency for /metrics
+    app.before_request(MetricsController.start_timer)
+    app.after_request(MetricsController.record_request)
\ No newline at end of file
@@ -1,8 +1,12 @@
 """
 User controller for user-related operations
 """
-from flask import request, jsonify
+from flask import request, jsonify, make_response, current_app
 from services.user_service import UserService
+from services.user_import_service import UserImportService, PhotoSource
+from utils.helpers import read_request_image, read_request_images
+
+EDGE_READ_ONLY_MESSAGE = 'Thiết bị biên chỉ chấm công, vui lòng đăng ký trên máy chủ trung tâm!'
 
 class UserController:
     """Controller for user operations"""
@@ -14,27 +18,54 @@ class UserController:
             'success': True,
             'message': 'User registration endpoint',
             'required_fields': ['name', 'email', 'employee_id', 'image_data'],
-            'method': 'POST'
+            'optional_fields': ['department', 'extra_images'],
+            'method': 'POST',
+            'description': 'image_data as base64, a multipart file part named image, or a raw image/jpeg body with the other fields in the query string'
         })
     
+    @staticmethod
+    def _edge_read_only():
+        """403 for enrollment requests on an edge device"""
+        return jsonify({
+            'success': False,
+            'message': EDGE_READ_ONLY_MESSAGE
+        }), 403
+    
+    @staticmethod
+    def _user_payload(user):
+        """Registered user fields returned to the client"""
+        return {
+            'id': user.id,
+            'name': user.name,
+            'email': user.email,
+            'employee_id': user.employee_id,
+            'department': user.department,
+            'created_at': user.created_at.isoformat() if user.created_at else None
+        }
+    
     @staticmethod
     def register_user():
         """Process user registration"""
+        if current_app.config.get('EDGE_MODE'):
+            return UserController._edge_read_only()
+        
         try:
-            data = request.get_json() if request.is_json else request.form
+            image_bytes, data = read_request_image(request)
             
             name = data.get('name')
             email = data.get('email')
             employee_id = data.get('employee_id')
-            image_data = data.get('image_data')
+            department = data.get('department')
             
-            if not image_data:
+            if not image_bytes:
                 return jsonify({
                     'success': False,
                     'message': 'Vui lòng chụp ảnh khuôn mặt!'
                 }), 400
             
-            user, error = UserService.create_user(name, email, employee_id, image_data)
+            extra_images, _ = read_request_images(request, 'extra_images')
+            
+            user, error = UserService.create_user(name, email, employee_id, image_bytes, extra_images, department)
             
             if error:
                 return jsonify({
@@ -45,13 +76,76 @@ class UserController:
             return jsonify({
                 'success': True,
                 'message': 'Đăng ký thành công!',
-                'user': {
-                    'id': user.id,
-                    'name': user.name,
-                    'email': user.email,
-                    'employee_id': user.employee_id,
-                    'created_at': user.created_at.isoformat() if user.created_at else None
-                }
+                'user': UserController._user_payload(user)
+            })
+            
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'Lỗi server: {str(e)}'
+            }), 500
+    
+    @staticmethod
+    def _invalid_import(message, status=400):
+        """Error result of _read_import_upload"""
+        return None, None, (jsonify({
+            'success': False,
+            'message': message
+        }), status)
+    
+    @staticmethod
+    def _read_import_upload():
+        """
+        Roster rows and photo archive of an import request
+        Returns: (rows, photos, None) or (None, None, error response)
+        """
+        roster_file = request.files.get('roster')
+        photos_file = request.files.get('photos')
+        if not roster_file or not photos_file:
+            return UserController._invalid_import('Vui lòng gửi danh sách (roster) và tệp ảnh zip (photos)!')
+        
+        rows, error = UserImportService.read_roster(roster_file.read().decode('utf-8'))
+        if error:
+            return UserController._invalid_import(error)
+        
+        max_rows = current_app.config.get('USER_IMPORT_MAX_ROWS', 2000)
+        if len(rows) > max_rows:
+            return UserController._invalid_import(f'Tối đa {max_rows} dòng mỗi lần nhập!', 413)
+        
+        try:
+            photos = PhotoSource(photos_file.stream, current_app.config.get('USER_IMPORT_MAX_PHOTO_BYTES', 10 * 1024 * 1024))
+        except Exception:
+            return UserController._invalid_import('Tệp ảnh zip không hợp lệ!')
+        return rows, photos, None
+    
+    @staticmethod
+    def import_users():
+        """
+        Enroll many users from a roster CSV (file part 'roster') and a zip of
+        photos (file part 'photos'); photos are matched by the roster 'photo'
+        column or named <employee_id>.jpg
+        """
+        if current_app.config.get('EDGE_MODE'):
+            return UserController._edge_read_only()
+        
+        try:
+            rows, photos, error_response = UserController._read_import_upload()
+            if error_response:
+                return error_response
+            
+            try:
+                report = UserImportService.import_users(rows, photos, current_app.config.get('USER_IMPORT_CHUNK_SIZE', 64))
+            finally:
+                photos.close()
+            
+            created = len([entry for entry in report if entry['success']])
+            return jsonify({
+                'success': True,
+                'message': f'Đã đăng ký {created}/{len(report)} người dùng',
+                'total': len(report),
+                'created': created,
+                'failed': len(report) - created,
+                'results': report
             })
             
         except Exception as e:
@@ -62,9 +156,15 @@ class UserController:
     
     @staticmethod
     def history():
-        """Get all users for history selection"""
+        """Get one page of users for history selection (?q=&limit=&cursor=)"""
         try:
-            users = UserService.get_all_users()
+            search = (request.args.get('q') or '').strip()
+            default_limit = current_app.config.get('USER_PAGE_SIZE', 100)
+            max_limit = current_app.config.get('USER_MAX_PAGE_SIZE', 1000)
+            limit = min(max(request.args.get('limit', default_limit, type=int), 1), max_limit)
+            after_id = request.args.get('cursor', None, type=int)
+            
+            users, next_cursor, total = UserService.list_users(search, limit, after_id)
             users_data = []
             
             for user in users:
@@ -73,15 +173,44 @@ class UserController:
                     'name': user.name,
                     'email': user.email,
                     'employee_id': user.employee_id,
+                    'department': user.department,
                     'created_at': user.created_at.isoformat() if user.created_at else None
                 })
             
             return jsonify({
                 'success': True,
                 'users': users_data,
-                'total': len(users_data)
+                'total': total,
+                'limit': limit,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
             })
             
+        except Exception as e:
+            return jsonify({
+                'success': False,
+                'message': f'Lỗi server: {str(e)}'
+            }), 500
+    
+    @staticmethod
+    def thumbnail(user_id):
+        """Serve a user's registration photo thumbnail with ETag caching"""
+        try:
+            thumbnail = UserService.get_user_thumbnail(user_id)
+            
+            if not thumbnail:
+                return jsonify({
+                    'success': False,
+                    'message': 'Không tìm thấy ảnh!'
+                }), 404
+            
+            response = make_response(thumbnail.data)
+            response.mimetype = 'image/jpeg'
+            response.set_etag(thumbnail.version)
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config.get('THUMBNAIL_MAX_AGE', 86400)
+            return response.make_conditional(request)
+            
         except Exception as e:
             return jsonify({
                 'success': False,
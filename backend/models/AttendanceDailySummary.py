@@ -0,0 +1,26 @@
+"""
+Database Models
+"""
+from datetime import datetime
+from config.database import db
+
+class AttendanceDailySummary(db.Model):
+    __tablename__ = 'attendance_daily_summary'
+    
+    date = db.Column(db.Date, primary_key=True)
+    present_users = db.Column(db.Integer, nullable=False, default=0)
+    complete_users = db.Column(db.Integer, nullable=False, default=0)
+    worked_seconds = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<AttendanceDailySummary {self.date}>'
+    
+    def to_dict(self):
+        """Convert daily summary object to dictionary"""
+        return {
+            'date': self.date.isoformat() if self.date else None,
+            'present_users': self.present_users,
+            'complete_users': self.complete_users,
+            'worked_seconds': self.worked_seconds
+        }
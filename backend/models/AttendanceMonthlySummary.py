@@ -0,0 +1,32 @@
+"""
+Database Models
+"""
+from datetime import datetime
+from config.database import db
+
+class AttendanceMonthlySummary(db.Model):
+    __tablename__ = 'attendance_monthly_summary'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False, index=True)  # Ngày đầu tháng
+    days = db.Column(db.Integer, nullable=False, default=0)
+    complete_days = db.Column(db.Integer, nullable=False, default=0)
+    worked_seconds = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Mỗi user chỉ có 1 bản ghi tổng hợp mỗi tháng
+    __table_args__ = (db.UniqueConstraint('user_id', 'month', name='unique_user_month'),)
+    
+    def __repr__(self):
+        return f'<AttendanceMonthlySummary user {self.user_id} for {self.month}>'
+    
+    def to_dict(self):
+        """Convert monthly summary object to dictionary"""
+        return {
+            'user_id': self.user_id,
+            'month': self.month.isoformat() if self.month else None,
+            'days': self.days,
+            'complete_days': self.complete_days,
+            'worked_seconds': self.worked_seconds
+        }
@@ -0,0 +1,26 @@
+"""
+Database Models
+"""
+from datetime import datetime
+from config.database import db
+
+class FaceTemplate(db.Model):
+    __tablename__ = 'face_templates'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    encoding = db.Column(db.LargeBinary, nullable=False)  # Face encoding dạng float32 packed (512 bytes)
+    source = db.Column(db.String(20), nullable=False, default='checkin')  # 'registration' hoặc 'checkin'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FaceTemplate {self.id} of user {self.user_id} ({self.source})>'
+    
+    def to_dict(self):
+        """Convert face template object to dictionary"""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'source': self.source,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
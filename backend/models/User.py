@@ -11,12 +11,14 @@ class User(db.Model):
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(100), unique=True, nullable=False, index=True)
     employee_id = db.Column(db.String(50), unique=True, nullable=False, index=True)
-    face_encoding = db.Column(db.Text, nullable=False)  # Lưu face encoding dưới dạng string
+    department = db.Column(db.String(100), nullable=True, index=True)
+    face_encoding = db.deferred(db.Column(db.LargeBinary, nullable=False))  # Face encoding dạng float32 packed (512 bytes), loaded on access
     image_path = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     attendances = db.relationship('Attendance', backref='user', lazy=True, cascade='all, delete-orphan')
+    face_templates = db.relationship('FaceTemplate', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<User {self.name} ({self.employee_id})>'
@@ -28,6 +30,7 @@ class User(db.Model):
             'name': self.name,
             'email': self.email,
             'employee_id': self.employee_id,
+            'department': self.department,
             'image_path': self.image_path,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
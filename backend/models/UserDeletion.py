@@ -0,0 +1,15 @@
+"""
+Database Models
+"""
+from datetime import datetime
+from config.database import db
+
+class UserDeletion(db.Model):
+    """Tombstone of a deleted user, so gallery refreshes drop it without scanning every user id"""
+    __tablename__ = 'user_deletions'
+    
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<UserDeletion {self.user_id} at {self.deleted_at}>'
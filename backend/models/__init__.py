@@ -3,5 +3,9 @@ Models package
 """
 from .User import User
 from .Attendance import Attendance
+from .FaceTemplate import FaceTemplate
+from .AttendanceMonthlySummary import AttendanceMonthlySummary
+from .AttendanceDailySummary import AttendanceDailySummary
+from .UserDeletion import UserDeletion
 
-__all__ = ['User', 'Attendance']
\ No newline at end of file
+__all__ = ['User', 'Attendance', 'FaceTemplate', 'AttendanceMonthlySummary', 'AttendanceDailySummary', 'UserDeletion']
\ No newline at end of file
@@ -0,0 +1,27 @@
+"""
+Add the users.department column used by department attendance reports
+
+Run from the backend directory: python3 -m scripts.add_user_department
+"""
+from sqlalchemy import inspect, text
+from app import create_app
+from config.database import db
+
+def add_department_column():
+    """Add the nullable, indexed column when the table predates it"""
+    columns = {column['name'] for column in inspect(db.engine).get_columns('users')}
+    if 'department' in columns:
+        print("✅ Column users.department already exists")
+        return
+    db.session.execute(text("ALTER TABLE users ADD COLUMN department VARCHAR(100) NULL"))
+    db.session.execute(text("CREATE INDEX ix_users_department ON users (department)"))
+    db.session.commit()
+    print("✅ Column users.department added")
+
+def main():
+    app = create_app(services=False)
+    with app.app_context():
+        add_department_column()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Recall/latency report of IVF search against brute force on synthetic galleries
+
+Run from the backend directory: python3 -m scripts.ann_report --sizes 1000 10000 50000
+"""
+import argparse
+import json
+import numpy as np
+from utils.helpers import FACE_ENCODING_DTYPE
+from utils.ivf_index import IVFIndex, recall_report
+
+def synthetic_gallery(size, rng):
+    """Random unit-scale 128-d encodings spread like real face embeddings"""
+    encodings = rng.normal(0, 0.1, (size, 128)).astype(FACE_ENCODING_DTYPE)
+    return encodings, np.einsum('ij,ij->i', encodings, encodings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--probes', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--lists', type=int, default=0, help='0 = sqrt(gallery size)')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--noise', type=float, default=0.03)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for size in args.sizes:
+        encodings, sq_norms = synthetic_gallery(size, rng)
+        index = IVFIndex.train(encodings, n_lists=args.lists)
+        picks = rng.choice(size, min(args.queries, size), replace=False)
+        queries = encodings[picks] + rng.normal(0, args.noise, (len(picks), 128)).astype(FACE_ENCODING_DTYPE)
+        for n_probe in args.probes:
+            print(json.dumps(recall_report(index, encodings, sq_norms, queries, n_probe=n_probe)))
+
+if __name__ == '__main__':
+    main()
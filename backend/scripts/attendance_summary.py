@@ -0,0 +1,40 @@
+"""
+Rebuild or check the attendance summary tables
+
+Run from the backend directory:
+    python3 -m scripts.attendance_summary rebuild [--since YYYY-MM-DD]
+    python3 -m scripts.attendance_summary check [--since YYYY-MM-DD]
+--since limits the work to the months from that date on. check exits with
+status 1 when the summaries drifted from the attendance table.
+"""
+import argparse
+from datetime import date
+from app import create_app
+from services.attendance_summary_service import AttendanceSummaryService
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    parser.add_argument('--since', type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    app = create_app(services=False)
+    with app.app_context():
+        if args.command == 'rebuild':
+            counts, error = AttendanceSummaryService.rebuild(args.since)
+            if error:
+                print(f"❌ {error}")
+                raise SystemExit(1)
+            print(f"✅ Rebuilt {counts['monthly_rows']} monthly and {counts['daily_rows']} daily summary rows")
+            return
+
+        mismatches = AttendanceSummaryService.check(args.since)
+        for mismatch in mismatches[:20]:
+            print(f"❌ {mismatch['table']} {mismatch['key']}: expected {mismatch['expected']}, found {mismatch['actual']}")
+        if mismatches:
+            print(f"❌ {len(mismatches)} summary rows differ from attendance, run rebuild")
+            raise SystemExit(1)
+        print("✅ Attendance summaries are consistent")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+"""
+Create missing database tables
+
+Production skips db.create_all() at startup (AUTO_CREATE_TABLES=false), so
+run this once per deployment from the backend directory:
+    python3 -m scripts.create_tables
+"""
+from app import create_app
+from config.database import create_tables
+
+def main():
+    app = create_app(services=False)
+    create_tables(app)
+
+if __name__ == '__main__':
+    main()
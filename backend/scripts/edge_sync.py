@@ -0,0 +1,39 @@
+"""
+Run one edge sync round: upload queued attendance and pull the gallery
+
+Run from the backend directory of an edge device (EDGE_MODE=true):
+    python3 -m scripts.edge_sync [--no-pull]
+Exits with status 1 when rows are still queued afterwards, e.g. because the
+central database is unreachable.
+"""
+import argparse
+from app import create_app
+from services.edge_sync_service import EdgeSyncService
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--no-pull', action='store_true', help='only upload queued attendance')
+    args = parser.parse_args()
+
+    app = create_app(services=False)
+    EdgeSyncService.init_app(app, start=False)
+    if not EdgeSyncService.enabled():
+        print("❌ EDGE_MODE is not enabled")
+        raise SystemExit(1)
+
+    pushed = EdgeSyncService.push_pending()
+    if not args.no_pull:
+        # Running app processes pick the changes up on their next gallery refresh
+        EdgeSyncService.pull_gallery(reload=False)
+
+    stats = EdgeSyncService.stats()
+    print(f"✅ Uploaded {pushed} attendance rows ({stats['dropped_rows']} dropped for deleted users)")
+    if stats['last_error']:
+        print(f"❌ {stats['last_error']}")
+    if stats['pending_rows']:
+        print(f"❌ {stats['pending_rows']} rows still queued, sync lag {stats['sync_lag_seconds']}s")
+        raise SystemExit(1)
+    print("✅ Edge store in sync")
+
+if __name__ == '__main__':
+    main()
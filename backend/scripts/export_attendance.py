@@ -0,0 +1,41 @@
+"""
+Export attendance with user details for a date range as CSV or NDJSON
+
+Run from the backend directory:
+    python3 -m scripts.export_attendance --start 2024-01-01 --end 2024-01-31 [--format ndjson] [--output file]
+Rows are streamed from a server-side cursor, so memory stays flat for any range.
+Writes to stdout when --output is not given.
+"""
+import argparse
+import sys
+from datetime import date
+from app import create_app
+from services.attendance_export_service import AttendanceExportService, EXPORT_FORMATS
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--start', type=date.fromisoformat, required=True)
+    parser.add_argument('--end', type=date.fromisoformat, required=True)
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--batch-size', type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app(services=False)
+    batch_size = args.batch_size or app.config.get('EXPORT_BATCH_SIZE', 1000)
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        with app.app_context():
+            rows = 0
+            for line in AttendanceExportService.iter_export(args.start, args.end, args.format, batch_size):
+                output.write(line)
+                rows += 1
+    finally:
+        if args.output:
+            output.close()
+    if args.output:
+        # The CSV header is one of the lines
+        print(f"✅ Exported {rows - (args.format == 'csv')} rows to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Enroll many users from a roster CSV plus a directory or zip of photos
+
+Run from the backend directory:
+    python3 -m scripts.import_users --roster cohort.csv --photos photos/ [--report report.json]
+The roster needs name, email and employee_id columns; department and photo are
+optional (without photo, <employee_id>.jpg/.jpeg/.png/.webp is looked up).
+Faces are encoded across RECOGNITION_WORKERS processes when the pool is enabled.
+"""
+import argparse
+import json
+from app import create_app
+from services.image_store_service import ImageStoreService
+from services.recognition_executor_service import RecognitionExecutorService
+from services.user_import_service import UserImportService, PhotoSource
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--roster', required=True)
+    parser.add_argument('--photos', required=True, help='directory or zip archive')
+    parser.add_argument('--report', default=None, help='write the per-row report as JSON')
+    parser.add_argument('--chunk-size', type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app(services=False)
+    # Only the photo writer and encode-only workers; running apps pick new users up on refresh
+    ImageStoreService.init_app(app)
+    RecognitionExecutorService.init_app(app, gallery=False)
+    with open(args.roster, encoding='utf-8') as roster_file:
+        rows, error = UserImportService.read_roster(roster_file.read())
+    if error:
+        print(f"❌ {error}")
+        raise SystemExit(1)
+
+    photos = PhotoSource(args.photos, app.config.get('USER_IMPORT_MAX_PHOTO_BYTES', 10 * 1024 * 1024))
+    try:
+        with app.app_context():
+            report = UserImportService.import_users(
+                rows, photos, args.chunk_size or app.config.get('USER_IMPORT_CHUNK_SIZE', 64)
+            )
+    finally:
+        photos.close()
+
+    for entry in report:
+        if not entry['success']:
+            print(f"❌ Row {entry['row']} ({entry['employee_id']}): {entry['message']}")
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as report_file:
+            json.dump(report, report_file, ensure_ascii=False, indent=2)
+    created = len([entry for entry in report if entry['success']])
+    print(f"✅ Enrolled {created} of {len(report)} roster rows")
+
+if __name__ == '__main__':
+    main()
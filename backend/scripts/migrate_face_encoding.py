@@ -0,0 +1,65 @@
+"""
+Migrate users.face_encoding from comma-separated text to packed float32 binary
+
+Run from the backend directory: python3 -m scripts.migrate_face_encoding
+"""
+from sqlalchemy import text
+from app import create_app
+from config.database import db
+from utils.helpers import pack_face_encoding, unpack_face_encoding, is_packed_face_encoding
+
+BATCH_SIZE = 500
+
+def alter_column_type():
+    """Switch the MySQL column from TEXT to BLOB (SQLite columns are untyped)"""
+    if db.engine.dialect.name != 'mysql':
+        return
+    column_type = db.session.execute(text(
+        "SELECT DATA_TYPE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users' AND COLUMN_NAME = 'face_encoding'"
+    )).scalar()
+    if column_type and column_type.lower() != 'blob':
+        # Existing text is kept byte-for-byte, the rows are converted below
+        db.session.execute(text("ALTER TABLE users MODIFY face_encoding BLOB NOT NULL"))
+        db.session.commit()
+        print(f"✅ Column users.face_encoding changed from {column_type} to BLOB")
+
+def convert_rows():
+    """Rewrite legacy text encodings as packed binary, in id-ordered batches"""
+    last_id = 0
+    converted = 0
+    failed = 0
+    while True:
+        rows = db.session.execute(
+            text("SELECT id, face_encoding FROM users WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {'last_id': last_id, 'limit': BATCH_SIZE}
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        updates = []
+        for row in rows:
+            if is_packed_face_encoding(row.face_encoding):
+                continue
+            try:
+                updates.append({'id': row.id, 'face_encoding': pack_face_encoding(unpack_face_encoding(row.face_encoding))})
+            except Exception as e:
+                failed += 1
+                print(f"❌ User {row.id}: {str(e)}")
+
+        if updates:
+            db.session.execute(text("UPDATE users SET face_encoding = :face_encoding WHERE id = :id"), updates)
+            db.session.commit()
+            converted += len(updates)
+    return converted, failed
+
+def main():
+    app = create_app(services=False)
+    with app.app_context():
+        alter_column_type()
+        converted, failed = convert_rows()
+        print(f"✅ Converted {converted} face encodings ({failed} failed)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Attendance export service
+"""
+import csv
+import json
+from models import User, Attendance
+from config.database import db
+from utils.sql_helpers import duration_seconds, format_duration
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORT_COLUMNS = [
+    'date', 'user_id', 'employee_id', 'name', 'email', 'department',
+    'check_in', 'check_out', 'duration_seconds', 'duration'
+]
+
+class _LineWriter:
+    """File-like target that hands each CSV line back instead of buffering it"""
+    
+    def write(self, line):
+        return line
+
+class AttendanceExportService:
+    """
+    Streams attendance joined to users for payroll exports
+    Rows are fetched in yield_per batches over a server-side cursor and
+    formatted one line at a time, so memory stays constant with the row count
+    """
+    
+    @staticmethod
+    def iter_rows(start_date, end_date, batch_size=1000):
+        """
+        Attendance rows of a date range with user details, oldest first
+        Returns: generator of dicts keyed by EXPORT_COLUMNS
+        """
+        duration = duration_seconds(Attendance.check_in, Attendance.check_out, db.engine.dialect.name)
+        columns = [
+            Attendance.date, Attendance.user_id, User.employee_id, User.name, User.email, User.department,
+            Attendance.check_in, Attendance.check_out
+        ]
+        if duration is not None:
+            columns.append(duration.label('duration_seconds'))
+        
+        query = db.session.query(*columns).join(User, User.id == Attendance.user_id).filter(
+            Attendance.date >= start_date, Attendance.date <= end_date
+        ).order_by(Attendance.date, Attendance.user_id).yield_per(batch_size)
+        
+        for row in query:
+            if not (row.check_in and row.check_out):
+                seconds = None
+            elif duration is not None:
+                seconds = row.duration_seconds
+            else:
+                seconds = int((row.check_out - row.check_in).total_seconds())
+            yield {
+                'date': row.date.isoformat(),
+                'user_id': row.user_id,
+                'employee_id': row.employee_id,
+                'name': row.name,
+                'email': row.email,
+                'department': row.department,
+                'check_in': row.check_in.isoformat() if row.check_in else None,
+                'check_out': row.check_out.isoformat() if row.check_out else None,
+                'duration_seconds': seconds,
+                'duration': format_duration(seconds)
+            }
+    
+    @staticmethod
+    def iter_csv(rows):
+        """CSV lines (header first) of export rows"""
+        writer = csv.writer(_LineWriter())
+        yield writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            yield writer.writerow(['' if row[column] is None else row[column] for column in EXPORT_COLUMNS])
+    
+    @staticmethod
+    def iter_ndjson(rows):
+        """One JSON object per line of export rows"""
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + '\n'
+    
+    @staticmethod
+    def iter_export(start_date, end_date, export_format='csv', batch_size=1000):
+        """
+        Formatted export lines of a date range
+        Raises ValueError for unknown formats
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f'Unknown export format: {export_format}')
+        rows = AttendanceExportService.iter_rows(start_date, end_date, batch_size)
+        if export_format == 'csv':
+            return AttendanceExportService.iter_csv(rows)
+        return AttendanceExportService.iter_ndjson(rows)
@@ -1,86 +1,266 @@
 """
 Attendance service
 """
-import base64
-import os
-from datetime import datetime, date
-from models import Attendance
+from collections import namedtuple
+from datetime import datetime, date, timedelta
+from flask import url_for
+from sqlalchemy import text, bindparam, func, or_, and_, case, null, Date, DateTime
+from models import Attendance, User
 from config.database import db
+from services.face_gallery_service import FaceGalleryService
+from services.recognition_executor_service import RecognitionExecutorService
+from services.checkout_buffer_service import CheckoutBufferService
+from services.thumbnail_service import ThumbnailService
+from services.attendance_summary_service import AttendanceSummaryService, AttendanceChange
+from services.edge_sync_service import EdgeSyncService
+from utils.sql_helpers import duration_seconds, format_duration, encode_keyset_cursor, period_start
+from utils.metrics import STAGE_SECONDS, ATTENDANCE_EVENTS, RECOGNITIONS
+
+# First statement of every check-in transaction: inserts today's row (check-in)
+# or leaves the existing one alone, and in both cases holds its write lock until
+# commit, so the following read and update of a check-out see no concurrent writer.
+# MySQL reports the new id as lastrowid, or 0 (LAST_INSERT_ID(0)) when the row existed
+INSERT_ATTENDANCE_MYSQL = text(
+    "INSERT INTO attendance (user_id, date, check_in, created_at, updated_at) "
+    "VALUES (:user_id, :date, :now, :utc_now, :utc_now) "
+    "ON DUPLICATE KEY UPDATE id = id + LAST_INSERT_ID(0)"
+).bindparams(bindparam('date', type_=Date), bindparam('now', type_=DateTime), bindparam('utc_now', type_=DateTime))
+# SQLite returns a row only when it inserted
+INSERT_ATTENDANCE_SQLITE = text(
+    "INSERT INTO attendance (user_id, date, check_in, created_at, updated_at) "
+    "VALUES (:user_id, :date, :now, :utc_now, :utc_now) "
+    "ON CONFLICT (user_id, date) DO NOTHING RETURNING id"
+).bindparams(bindparam('date', type_=Date), bindparam('now', type_=DateTime), bindparam('utc_now', type_=DateTime))
+
+REPORT_GROUPS = ('user', 'department')
+AggregateRow = namedtuple('AggregateRow', ['total_days', 'complete_days', 'worked_seconds', 'average_seconds'])
+EMPTY_STATS_ROW = AggregateRow(0, 0, 0, None)
 
 class AttendanceService:
     """Service for attendance operations"""
     
     @staticmethod
-    def _get_user_image_base64(image_path):
-        """Convert user image to base64 string"""
-        try:
-            if image_path and os.path.exists(image_path):
-                with open(image_path, 'rb') as image_file:
-                    image_data = image_file.read()
-                    return base64.b64encode(image_data).decode('utf-8')
-        except Exception as e:
-            print(f"Error reading image {image_path}: {e}")
-        return None
+    def _user_image_fields(user, image_mode):
+        """
+        Registration photo fields of a check-in response
+        image_mode: 'inline' (base64 thumbnail), 'url' (cacheable thumbnail URL) or 'none'
+        """
+        if image_mode == 'url':
+            with STAGE_SECONDS.time(stage='thumbnail'):
+                thumbnail = ThumbnailService.get_thumbnail(user.id, user.image_path)
+            return {
+                'user_image': None,
+                'user_image_url': url_for('user.thumbnail', user_id=user.id, v=thumbnail.version) if thumbnail else None
+            }
+        if image_mode == 'inline':
+            with STAGE_SECONDS.time(stage='thumbnail'):
+                return {'user_image': ThumbnailService.get_thumbnail_base64(user.id, user.image_path)}
+        return {'user_image': None}
+    
+    @staticmethod
+    def _format_time(value):
+        """Format a check-in/check-out time for messages"""
+        return value.strftime("%H:%M:%S") if value else None
+    
+    @staticmethod
+    def _insert_attendance(user_id, today, now):
+        """
+        Insert today's row unless it exists, locking it either way
+        Returns: whether the row was inserted (a check-in)
+        """
+        params = {'user_id': user_id, 'date': today, 'now': now, 'utc_now': datetime.utcnow()}
+        if db.engine.dialect.name == 'mysql':
+            return db.session.execute(INSERT_ATTENDANCE_MYSQL, params).lastrowid > 0
+        return db.session.execute(INSERT_ATTENDANCE_SQLITE, params).first() is not None
+    
+    @staticmethod
+    def _upsert_attendance_locked(user_id, today, now):
+        """
+        Check-in or check-out in one transaction (MySQL and SQLite): the insert
+        takes the row lock, then a check-out reads the previous check-out
+        (SELECT ... FOR UPDATE) and moves it to now
+        Returns: (check_in, previous_check_out, is_check_in)
+        """
+        if AttendanceService._insert_attendance(user_id, today, now):
+            return now, None, True
+        
+        row = db.session.query(Attendance.check_in, Attendance.check_out).filter_by(
+            user_id=user_id, date=today
+        ).with_for_update().one()
+        Attendance.query.filter_by(user_id=user_id, date=today).update(
+            {'check_out': now, 'updated_at': now}, synchronize_session=False
+        )
+        return row.check_in, row.check_out, False
+    
+    @staticmethod
+    def _upsert_attendance_orm(user_id, today, now):
+        """
+        Check-in or check-out with a SELECT then INSERT or UPDATE (other dialects)
+        Returns: (check_in, previous_check_out, is_check_in)
+        """
+        attendance = Attendance.query.filter_by(user_id=user_id, date=today).first()
+        
+        if not attendance:
+            # First time today - Check-in
+            db.session.add(Attendance(user_id=user_id, date=today, check_in=now))
+            return now, None, True
+        
+        # Second time onwards - Update check-out (overwrite previous)
+        previous = attendance.check_out
+        attendance.check_out = now
+        attendance.updated_at = now
+        return attendance.check_in, previous, False
+    
+    @staticmethod
+    def _record_checkin(user):
+        """
+        Apply check-in/check-out for a user in the current session without committing
+        Check-outs of rows already seen today go to the write-behind buffer,
+        anything else is written under the unique_user_date row lock
+        Times are whole seconds so summary durations match the stored values
+        Returns: ((check_time, old_checkout, is_check_in), AttendanceChange or None when buffered)
+        """
+        today = date.today()
+        now = datetime.now().replace(microsecond=0)
+        buffered, previous_checkout = CheckoutBufferService.record_checkout(user.id, today, now)
+        if buffered:
+            return (now, AttendanceService._format_time(previous_checkout), False), None
+        
+        upsert = (AttendanceService._upsert_attendance_locked if db.engine.dialect.name in ('mysql', 'sqlite')
+                  else AttendanceService._upsert_attendance_orm)
+        check_in, previous_checkout, is_check_in = upsert(user.id, today, now)
+        change = AttendanceChange(user.id, today, check_in, previous_checkout, None if is_check_in else now, is_check_in)
+        return (now, AttendanceService._format_time(previous_checkout), is_check_in), change
+    
+    @staticmethod
+    def _remember_checkins(changes):
+        """Let the write-behind buffer know about rows written by a committed transaction"""
+        for change in changes:
+            if change:
+                CheckoutBufferService.remember(change.user_id, change.date, change.check_out)
     
     @staticmethod
-    def process_checkin(user):
+    def _count_events(records):
+        """Count committed check-ins and check-outs for /metrics"""
+        for _, _, is_check_in in records:
+            ATTENDANCE_EVENTS.inc(type='check_in' if is_check_in else 'check_out')
+    
+    @staticmethod
+    def _build_checkin_result(user, check_time, old_checkout, is_check_in, image_mode='inline'):
+        """Build the check-in/check-out response for a recorded attendance"""
+        image_fields = AttendanceService._user_image_fields(user, image_mode)
+        
+        if is_check_in:
+            return {
+                'success': True,
+                'message': f'Chào {user.name}! Check-in thành công lúc {check_time.strftime("%H:%M:%S")}',
+                'type': 'check_in',
+                'user': user.name,
+                **image_fields,
+                'employee_id': user.employee_id,
+                'time': check_time.strftime("%H:%M:%S")
+            }
+        
+        # Different message for first check-out vs update
+        if old_checkout:
+            message = f'Cập nhật check-out cho {user.name}! Thời gian mới: {check_time.strftime("%H:%M:%S")} (trước đó: {old_checkout})'
+        else:
+            message = f'Tạm biệt {user.name}! Check-out thành công lúc {check_time.strftime("%H:%M:%S")}'
+        
+        return {
+            'success': True,
+            'message': message,
+            'type': 'check_out',
+            'user': user.name,
+            **image_fields,
+            'employee_id': user.employee_id,
+            'time': check_time.strftime("%H:%M:%S"),
+            'is_update': old_checkout is not None
+        }
+    
+    @staticmethod
+    def process_checkin(user, image_mode='inline'):
         """
         Process check-in/check-out for a user
         Returns: (result_dict, error_message)
         """
         try:
-            today = date.today()
-            attendance = Attendance.query.filter_by(user_id=user.id, date=today).first()
-            
-            if not attendance:
-                # First time today - Check-in
-                attendance = Attendance(
-                    user_id=user.id,
-                    date=today,
-                    check_in=datetime.now()
-                )
-                db.session.add(attendance)
+            with STAGE_SECONDS.time(stage='attendance_commit'):
+                record, change = AttendanceService._record_checkin(user)
+                AttendanceSummaryService.apply_changes([change])
+                EdgeSyncService.enqueue([change])
                 db.session.commit()
-                user_image_base64 = AttendanceService._get_user_image_base64(user.image_path)
+            AttendanceService._remember_checkins([change])
+            AttendanceService._count_events([record])
+            return AttendanceService._build_checkin_result(user, *record, image_mode=image_mode), None
                 
-                return {
-                    'success': True,
-                    'message': f'Chào {user.name}! Check-in thành công lúc {attendance.check_in.strftime("%H:%M:%S")}',
-                    'type': 'check_in',
-                    'user': user.name,
-                    'user_image': user_image_base64,
-                    'employee_id': user.employee_id,
-                    'time': attendance.check_in.strftime("%H:%M:%S")
-                }, None
-            
-            else:
-                # Second time onwards - Update check-out (overwrite previous)
-                old_checkout = attendance.check_out.strftime("%H:%M:%S") if attendance.check_out else None
-                attendance.check_out = datetime.now()
-                attendance.updated_at = datetime.now()
+        except Exception as e:
+            db.session.rollback()
+            return None, f"Lỗi xử lý Checkin: {str(e)}"
+    
+    @staticmethod
+    def process_checkins(users):
+        """
+        Process check-in/check-out for many recognitions in a single transaction
+        Repeated users are applied in order (check-in, then check-out updates)
+        Returns: (list of result_dict, error_message)
+        """
+        try:
+            with STAGE_SECONDS.time(stage='attendance_commit'):
+                recorded = [AttendanceService._record_checkin(user) for user in users]
+                changes = [change for _, change in recorded]
+                AttendanceSummaryService.apply_changes(changes)
+                EdgeSyncService.enqueue(changes)
                 db.session.commit()
-                
-                # Different message for first check-out vs update
-                if old_checkout:
-                    message = f'Cập nhật check-out cho {user.name}! Thời gian mới: {attendance.check_out.strftime("%H:%M:%S")} (trước đó: {old_checkout})'
-                else:
-                    message = f'Tạm biệt {user.name}! Check-out thành công lúc {attendance.check_out.strftime("%H:%M:%S")}'
-                
-                user_image_base64 = AttendanceService._get_user_image_base64(user.image_path)
-                return {
-                    'success': True,
-                    'message': message,
-                    'type': 'check_out',
-                    'user': user.name,
-                    'user_image': user_image_base64,
-                    'employee_id': user.employee_id,
-                    'time': attendance.check_out.strftime("%H:%M:%S"),
-                    'is_update': old_checkout is not None
-                }, None
-                
+            AttendanceService._remember_checkins(changes)
+            AttendanceService._count_events([record for record, _ in recorded])
+            return [
+                AttendanceService._build_checkin_result(user, *record, image_mode='none')
+                for user, (record, _) in zip(users, recorded)
+            ], None
+            
         except Exception as e:
+            db.session.rollback()
             return None, f"Lỗi xử lý Checkin: {str(e)}"
     
+    @staticmethod
+    def process_checkin_batch(images):
+        """
+        Recognize many frames and record their attendance in one transaction
+        Frames are encoded in parallel and matched with one (faces x users) distance computation
+        Raises RecognitionBusyError when the recognition pool is saturated
+        Returns: (per-image result list, error_message)
+        """
+        results = [{'index': i, 'success': False, 'message': 'Không có dữ liệu ảnh!'} for i in range(len(images))]
+        
+        # Decode and encode all frames in parallel
+        valid = [i for i, image_bytes in enumerate(images) if image_bytes]
+        encoded = RecognitionExecutorService.encode_batch([images[i] for i in valid])
+        
+        face_encodings = []
+        face_images = []
+        for i, (encodings, error) in zip(valid, encoded):
+            results[i]['message'] = error or 'Không nhận diện được khuôn mặt! Vui lòng đăng ký trước.'
+            face_encodings.extend(encodings)
+            face_images.extend([i] * len(encodings))
+        
+        # Best match per image from a single distance matrix
+        matches = FaceGalleryService.match_groups(face_encodings, face_images, tolerance=0.6)
+        recognized = [(i, user, distance) for i, (user, distance) in sorted(matches.items()) if user]
+        for i in valid:
+            user = matches.get(i, (None, None))[0]
+            RECOGNITIONS.inc(result='match' if user else ('no_match' if i in face_images else 'no_face'))
+        
+        # Record all attendance updates in a single transaction
+        checkins, error = AttendanceService.process_checkins([user for _, user, _ in recognized])
+        if error:
+            return None, error
+        
+        for (i, _, distance), checkin in zip(recognized, checkins):
+            confidence = max(0, (1 - distance) * 100)  # Convert to percentage
+            results[i] = {'index': i, 'confidence': round(confidence, 1), **checkin}
+        return results, None
+    
     @staticmethod
     def get_user_attendances(user_id, limit=None):
         """Get attendance records for a specific user"""
@@ -89,31 +269,199 @@ class AttendanceService:
             query = query.limit(limit)
         return query.all()
     
+    @staticmethod
+    def get_user_history_page(user_id, limit, cursor=None):
+        """
+        One page of a user's attendance history, newest first
+        Keyset pagination on (date, id) served by the unique (user_id, date) index;
+        only the listed columns are fetched and durations are computed in SQL
+        cursor: (date, id) of the last row of the previous page
+        Returns: (list of row dicts, next_cursor or None)
+        """
+        duration = duration_seconds(Attendance.check_in, Attendance.check_out, db.engine.dialect.name)
+        columns = [Attendance.id, Attendance.date, Attendance.check_in, Attendance.check_out]
+        if duration is not None:
+            columns.append(duration.label('duration_seconds'))
+        
+        query = db.session.query(*columns).filter(Attendance.user_id == user_id)
+        if cursor:
+            cursor_date, cursor_id = cursor
+            query = query.filter(or_(
+                Attendance.date < cursor_date,
+                and_(Attendance.date == cursor_date, Attendance.id < cursor_id)
+            ))
+        # One extra row tells whether another page exists
+        rows = query.order_by(Attendance.date.desc(), Attendance.id.desc()).limit(limit + 1).all()
+        
+        next_cursor = encode_keyset_cursor(rows[limit - 1].date, rows[limit - 1].id) if len(rows) > limit else None
+        return [AttendanceService._history_row(row) for row in rows[:limit]], next_cursor
+    
+    @staticmethod
+    def _history_row(row):
+        """JSON fields of one history row"""
+        if not (row.check_in and row.check_out):
+            seconds = None
+        elif 'duration_seconds' in row._fields:
+            seconds = row.duration_seconds
+        else:
+            seconds = (row.check_out - row.check_in).total_seconds()
+        return {
+            'id': row.id,
+            'checkin_time': row.check_in.isoformat() if row.check_in else None,
+            'checkout_time': row.check_out.isoformat() if row.check_out else None,
+            'date': row.date.isoformat() if row.date else None,
+            'duration': format_duration(seconds)
+        }
+    
+    @staticmethod
+    def get_user_history_summary(user_id):
+        """
+        Day counts of a user's history from one aggregate query
+        Returns: dict with total, complete and incomplete days
+        """
+        total, complete = db.session.query(
+            func.count(Attendance.id), func.count(Attendance.check_out)
+        ).filter(Attendance.user_id == user_id).one()
+        return {
+            'total': total,
+            'complete_days': complete,
+            'incomplete_days': total - complete
+        }
+    
     @staticmethod
     def get_attendance_by_date(attendance_date):
         """Get all attendance records for a specific date"""
         return Attendance.query.filter_by(date=attendance_date).all()
     
+    @staticmethod
+    def _aggregate_columns(dialect_name):
+        """Day count, complete day count and worked seconds aggregates over attendance rows"""
+        seconds = duration_seconds(Attendance.check_in, Attendance.check_out, dialect_name)
+        if seconds is None:
+            seconds = null()
+        return (
+            func.count(Attendance.id).label('total_days'),
+            func.sum(case((Attendance.check_out.isnot(None), 1), else_=0)).label('complete_days'),
+            func.sum(seconds).label('worked_seconds'),
+            func.avg(seconds).label('average_seconds'),
+        )
+    
+    @staticmethod
+    def _stats_from_row(row):
+        """Statistics dict from a row of _aggregate_columns"""
+        total_days = row.total_days or 0
+        complete_days = int(row.complete_days or 0)
+        completion_rate = (complete_days / total_days * 100) if total_days > 0 else 0
+        average_seconds = int(round(row.average_seconds)) if row.average_seconds is not None else None
+        return {
+            'total_days': total_days,
+            'complete_days': complete_days,
+            'incomplete_days': total_days - complete_days,
+            'completion_rate': round(completion_rate, 1),
+            'worked_seconds': int(row.worked_seconds or 0),
+            'average_seconds': average_seconds,
+            'average_duration': format_duration(average_seconds)
+        }
+    
     @staticmethod
     def get_attendance_stats(user_id, start_date=None, end_date=None):
         """Get attendance statistics for a user"""
-        query = Attendance.query.filter_by(user_id=user_id)
+        return AttendanceService.get_attendance_stats_bulk([user_id], start_date, end_date)[user_id]
+    
+    @staticmethod
+    def get_attendance_stats_bulk(user_ids, start_date=None, end_date=None):
+        """
+        Attendance statistics of many users from one GROUP BY query
+        Returns: dict of user_id -> statistics (zeros for users without attendance)
+        """
+        query = db.session.query(
+            Attendance.user_id, *AttendanceService._aggregate_columns(db.engine.dialect.name)
+        ).filter(Attendance.user_id.in_(user_ids))
         
         if start_date:
             query = query.filter(Attendance.date >= start_date)
         if end_date:
             query = query.filter(Attendance.date <= end_date)
         
-        attendances = query.all()
+        stats = {row.user_id: AttendanceService._stats_from_row(row) for row in query.group_by(Attendance.user_id)}
+        return {
+            user_id: stats.get(user_id) or AttendanceService._stats_from_row(EMPTY_STATS_ROW)
+            for user_id in user_ids
+        }
+    
+    @staticmethod
+    def get_attendance_report(start_date, end_date, period='day', group_by='user'):
+        """
+        Org-wide totals per period (day/week/month) and per user or department,
+        computed in one aggregate query
+        Raises ValueError for unknown periods or groupings
+        Returns: list of report rows ordered by period then group
+        """
+        if group_by not in REPORT_GROUPS:
+            raise ValueError(f'Unknown grouping: {group_by}')
+        dialect_name = db.engine.dialect.name
+        bucket = period_start(Attendance.date, period, dialect_name).label('period_start')
         
-        total_days = len(attendances)
-        complete_days = len([a for a in attendances if a.check_out])
-        incomplete_days = total_days - complete_days
-        completion_rate = (complete_days / total_days * 100) if total_days > 0 else 0
+        if group_by == 'department':
+            keys = (User.department,)
+        else:
+            keys = (Attendance.user_id, User.name, User.employee_id, User.department)
+        
+        rows = db.session.query(
+            bucket, *keys,
+            func.count(func.distinct(Attendance.user_id)).label('users'),
+            *AttendanceService._aggregate_columns(dialect_name)
+        ).join(User, User.id == Attendance.user_id).filter(
+            Attendance.date >= start_date, Attendance.date <= end_date
+        ).group_by(bucket, *keys).order_by(bucket, *keys).all()
+        
+        report = []
+        for row in rows:
+            item = {'period_start': row.period_start.isoformat()}
+            if group_by == 'user':
+                item.update({
+                    'user_id': row.user_id,
+                    'name': row.name,
+                    'employee_id': row.employee_id
+                })
+            item['department'] = row.department
+            item['users'] = row.users
+            item.update(AttendanceService._stats_from_row(row))
+            report.append(item)
+        return report
+    
+    @staticmethod
+    def _stats_from_totals(total_days, complete_days, worked_seconds):
+        """Statistics dict from summary table counters"""
+        average_seconds = worked_seconds / complete_days if complete_days else None
+        return AttendanceService._stats_from_row(AggregateRow(total_days, complete_days, worked_seconds, average_seconds))
+    
+    @staticmethod
+    def get_dashboard(month):
+        """
+        Monthly dashboard read from the summary tables: one row per user plus one per day
+        month: first day of the month
+        Returns: dict with totals, users and days
+        """
+        users = [{
+            'user_id': summary.user_id,
+            'name': name,
+            'employee_id': employee_id,
+            'department': department,
+            **AttendanceService._stats_from_totals(summary.days, summary.complete_days, summary.worked_seconds)
+        } for summary, name, employee_id, department in AttendanceSummaryService.get_monthly(month)]
         
+        month_end = (month.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        days = [summary.to_dict() for summary in AttendanceSummaryService.get_daily(month, month_end)]
+        
+        totals = AttendanceService._stats_from_totals(
+            sum(user['total_days'] for user in users),
+            sum(user['complete_days'] for user in users),
+            sum(user['worked_seconds'] for user in users)
+        )
         return {
-            'total_days': total_days,
-            'complete_days': complete_days,
-            'incomplete_days': incomplete_days,
-            'completion_rate': round(completion_rate, 1)
+            'month': month.isoformat(),
+            'totals': {**totals, 'users': len(users)},
+            'users': users,
+            'days': days
         }
\ No newline at end of file
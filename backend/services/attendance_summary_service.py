@@ -0,0 +1,250 @@
+"""
+Attendance summary service
+"""
+from collections import defaultdict, namedtuple
+from datetime import datetime, date
+from sqlalchemy import text, bindparam, func, case, insert, literal, Date, DateTime
+from models import User, Attendance, AttendanceMonthlySummary, AttendanceDailySummary
+from config.database import db
+from utils.sql_helpers import duration_seconds, period_start
+
+# One attendance row moving from previous_check_out to check_out (created: the check-in itself);
+# previous_check_in is only set when a merge moved the check-in as well
+AttendanceChange = namedtuple(
+    'AttendanceChange',
+    ['user_id', 'date', 'check_in', 'previous_check_out', 'check_out', 'created', 'previous_check_in'],
+    defaults=(None,)
+)
+
+MONTHLY_COUNTERS = ('days', 'complete_days', 'worked_seconds')
+DAILY_COUNTERS = ('present_users', 'complete_users', 'worked_seconds')
+
+def _increment_sql(dialect_name, table, keys, counters):
+    """
+    Upsert adding to the counters of one summary row
+    Returns None for dialects without an upsert (the ORM is used instead)
+    """
+    columns = keys + counters + ('updated_at',)
+    statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(':' + column for column in columns)}) "
+    if dialect_name == 'mysql':
+        # Row alias (MySQL >= 8.0.19) instead of the deprecated VALUES(col)
+        updates = [f"{counter} = {table}.{counter} + new.{counter}" for counter in counters]
+        statement += "AS new ON DUPLICATE KEY UPDATE " + ', '.join(updates + ['updated_at = new.updated_at'])
+    elif dialect_name in ('sqlite', 'postgresql'):
+        updates = [f"{counter} = {table}.{counter} + excluded.{counter}" for counter in counters]
+        statement += f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET " + ', '.join(updates + ['updated_at = excluded.updated_at'])
+    else:
+        return None
+    return text(statement).bindparams(bindparam(keys[-1], type_=Date), bindparam('updated_at', type_=DateTime))
+
+class AttendanceSummaryService:
+    """
+    Per-user monthly and org-wide daily attendance totals, kept up to date
+    incrementally: every attendance write adds its delta to the summary rows
+    in the same transaction, so dashboards read O(users) rows instead of
+    scanning attendance. rebuild() recomputes them from attendance and
+    check() reports any drift.
+    """
+    
+    @staticmethod
+    def _contribution(check_in, check_out):
+        """(days, complete_days, worked_seconds) one attendance row adds to its summaries"""
+        if check_out is None:
+            return 1, 0, 0
+        worked = round((check_out - check_in).total_seconds()) if check_in else 0
+        return 1, 1, worked
+    
+    @staticmethod
+    def _deltas(changes):
+        """Summed counter deltas per (user_id, month) and per date"""
+        monthly = defaultdict(lambda: [0, 0, 0])
+        daily = defaultdict(lambda: [0, 0, 0])
+        for change in changes:
+            after = AttendanceSummaryService._contribution(change.check_in, change.check_out)
+            if change.created:
+                before = (0, 0, 0)
+            else:
+                before = AttendanceSummaryService._contribution(
+                    change.previous_check_in or change.check_in, change.previous_check_out
+                )
+            delta = [new - old for new, old in zip(after, before)]
+            for totals in (monthly[(change.user_id, change.date.replace(day=1))], daily[change.date]):
+                for i, value in enumerate(delta):
+                    totals[i] += value
+        return monthly, daily
+    
+    @staticmethod
+    def apply_changes(changes, connection=None):
+        """
+        Add the deltas of attendance changes to the summaries without committing,
+        in the current session or on `connection` (another database, e.g. the central one in edge mode)
+        """
+        monthly, daily = AttendanceSummaryService._deltas(change for change in changes if change)
+        now = datetime.utcnow()
+        monthly_params = [
+            {'user_id': user_id, 'month': month, **dict(zip(MONTHLY_COUNTERS, delta)), 'updated_at': now}
+            for (user_id, month), delta in monthly.items() if any(delta)
+        ]
+        daily_params = [
+            {'date': day, **dict(zip(DAILY_COUNTERS, delta)), 'updated_at': now}
+            for day, delta in daily.items() if any(delta)
+        ]
+        
+        executor = connection if connection is not None else db.session
+        dialect_name = (connection if connection is not None else db.engine).dialect.name
+        for model, keys, counters, params in (
+            (AttendanceMonthlySummary, ('user_id', 'month'), MONTHLY_COUNTERS, monthly_params),
+            (AttendanceDailySummary, ('date',), DAILY_COUNTERS, daily_params),
+        ):
+            if not params:
+                continue
+            statement = _increment_sql(dialect_name, model.__tablename__, keys, counters)
+            if statement is not None:
+                executor.execute(statement, params)
+            elif connection is not None:
+                raise ValueError(f'Unsupported dialect: {dialect_name}')
+            else:
+                AttendanceSummaryService._apply_orm(model, keys, counters, params)
+    
+    @staticmethod
+    def _apply_orm(model, keys, counters, params):
+        """Get-or-create then increment summary rows (dialects without an upsert)"""
+        for row_params in params:
+            row = model.query.filter_by(**{key: row_params[key] for key in keys}).first()
+            if row is None:
+                row = model(**{key: row_params[key] for key in keys}, **{counter: 0 for counter in counters})
+                db.session.add(row)
+            for counter in counters:
+                setattr(row, counter, getattr(row, counter) + row_params[counter])
+    
+    @staticmethod
+    def remove_user(user_id):
+        """
+        Take a user's attendance out of the summaries before the user is deleted,
+        in the current session without committing
+        """
+        rows = db.session.query(Attendance.date, Attendance.check_in, Attendance.check_out).filter(
+            Attendance.user_id == user_id
+        ).all()
+        _, daily = AttendanceSummaryService._deltas(
+            AttendanceChange(user_id, row.date, row.check_in, None, row.check_out, True) for row in rows
+        )
+        now = datetime.utcnow()
+        for day, delta in daily.items():
+            db.session.query(AttendanceDailySummary).filter(AttendanceDailySummary.date == day).update({
+                AttendanceDailySummary.present_users: AttendanceDailySummary.present_users - delta[0],
+                AttendanceDailySummary.complete_users: AttendanceDailySummary.complete_users - delta[1],
+                AttendanceDailySummary.worked_seconds: AttendanceDailySummary.worked_seconds - delta[2],
+                AttendanceDailySummary.updated_at: now
+            }, synchronize_session=False)
+        db.session.query(AttendanceMonthlySummary).filter(
+            AttendanceMonthlySummary.user_id == user_id
+        ).delete(synchronize_session=False)
+    
+    @staticmethod
+    def _aggregates(key_columns, since):
+        """Summary counters recomputed from attendance, grouped by key_columns"""
+        seconds = duration_seconds(Attendance.check_in, Attendance.check_out, db.engine.dialect.name)
+        if seconds is None:
+            raise ValueError(f'Unsupported dialect: {db.engine.dialect.name}')
+        query = db.session.query(
+            *key_columns,
+            func.count(Attendance.id),
+            func.sum(case((Attendance.check_out.isnot(None), 1), else_=0)),
+            func.coalesce(func.sum(seconds), 0),
+        )
+        if since:
+            query = query.filter(Attendance.date >= since)
+        return query.group_by(*key_columns)
+    
+    @staticmethod
+    def _month_column():
+        """First day of the month of each attendance row"""
+        return period_start(Attendance.date, 'month', db.engine.dialect.name).label('month')
+    
+    @staticmethod
+    def rebuild(since=None):
+        """
+        Recompute the summaries from attendance with two INSERT ... SELECT statements
+        since: first date to rebuild (rounded down to its month), None for everything
+        Returns: (dict with rebuilt row counts, error_message)
+        """
+        try:
+            month = AttendanceSummaryService._month_column()
+            since_month = since.replace(day=1) if since else None
+            monthly_query = db.session.query(AttendanceMonthlySummary)
+            daily_query = db.session.query(AttendanceDailySummary)
+            if since_month:
+                monthly_query = monthly_query.filter(AttendanceMonthlySummary.month >= since_month)
+                daily_query = daily_query.filter(AttendanceDailySummary.date >= since_month)
+            monthly_query.delete(synchronize_session=False)
+            daily_query.delete(synchronize_session=False)
+            
+            now = literal(datetime.utcnow(), DateTime)
+            monthly = AttendanceSummaryService._aggregates((Attendance.user_id, month), since_month).add_columns(now)
+            daily = AttendanceSummaryService._aggregates((Attendance.date,), since_month).add_columns(now)
+            monthly_count = db.session.execute(insert(AttendanceMonthlySummary).from_select(
+                ['user_id', 'month', *MONTHLY_COUNTERS, 'updated_at'], monthly.statement
+            )).rowcount
+            daily_count = db.session.execute(insert(AttendanceDailySummary).from_select(
+                ['date', *DAILY_COUNTERS, 'updated_at'], daily.statement
+            )).rowcount
+            db.session.commit()
+            return {'monthly_rows': monthly_count, 'daily_rows': daily_count}, None
+        
+        except Exception as e:
+            db.session.rollback()
+            return None, f"Error rebuilding attendance summaries: {str(e)}"
+    
+    @staticmethod
+    def check(since=None):
+        """
+        Compare the summaries with totals recomputed from attendance
+        Returns: list of mismatch dicts (empty when consistent)
+        """
+        month = AttendanceSummaryService._month_column()
+        since_month = since.replace(day=1) if since else None
+        mismatches = []
+        for name, model, keys, counters, aggregates in (
+            ('monthly', AttendanceMonthlySummary, ('user_id', 'month'), MONTHLY_COUNTERS,
+             AttendanceSummaryService._aggregates((Attendance.user_id, month), since_month)),
+            ('daily', AttendanceDailySummary, ('date',), DAILY_COUNTERS,
+             AttendanceSummaryService._aggregates((Attendance.date,), since_month)),
+        ):
+            expected = {tuple(row[:len(keys)]): tuple(int(value) for value in row[len(keys):]) for row in aggregates}
+            summary_query = db.session.query(*[getattr(model, column) for column in keys + counters])
+            if since_month:
+                summary_query = summary_query.filter(getattr(model, keys[-1]) >= since_month)
+            actual = {tuple(row[:len(keys)]): tuple(row[len(keys):]) for row in summary_query}
+            
+            for key in expected.keys() | actual.keys():
+                # Rows zeroed by deletions are equivalent to missing rows
+                expected_values = expected.get(key, (0,) * len(counters))
+                actual_values = actual.get(key, (0,) * len(counters))
+                if expected_values != actual_values:
+                    mismatches.append({
+                        'table': name,
+                        'key': [value.isoformat() if isinstance(value, date) else value for value in key],
+                        'expected': dict(zip(counters, expected_values)),
+                        'actual': dict(zip(counters, actual_values))
+                    })
+        return mismatches
+    
+    @staticmethod
+    def get_monthly(month):
+        """
+        Per-user summary rows of one month, with user details
+        Returns: list of (AttendanceMonthlySummary, name, employee_id, department)
+        """
+        return db.session.query(
+            AttendanceMonthlySummary, User.name, User.employee_id, User.department
+        ).join(User, User.id == AttendanceMonthlySummary.user_id).filter(
+            AttendanceMonthlySummary.month == month
+        ).order_by(User.name, User.id).all()
+    
+    @staticmethod
+    def get_daily(start_date, end_date):
+        """Org-wide summary rows of a date range, oldest first"""
+        return AttendanceDailySummary.query.filter(
+            AttendanceDailySummary.date >= start_date, AttendanceDailySummary.date <= end_date
+        ).order_by(AttendanceDailySummary.date).all()
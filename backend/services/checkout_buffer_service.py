@@ -0,0 +1,196 @@
+"""
+Check-out write-behind buffer service
+"""
+import atexit
+import os
+import signal
+import threading
+from datetime import date
+from sqlalchemy import text, bindparam, Date, DateTime
+from models import Attendance
+from config.database import db
+from services.attendance_summary_service import AttendanceSummaryService, AttendanceChange
+from services.edge_sync_service import EdgeSyncService
+
+# Longest wait for the final flush when SIGTERM arrives
+SHUTDOWN_FLUSH_TIMEOUT = 5.0
+
+# Only move check_out forward, so late or concurrent flushes never undo a newer time
+FLUSH_CHECKOUTS_SQL = text(
+    "UPDATE attendance SET check_out = :check_out, updated_at = :check_out "
+    "WHERE user_id = :user_id AND date = :date AND (check_out IS NULL OR check_out < :check_out)"
+).bindparams(bindparam('date', type_=Date), bindparam('check_out', type_=DateTime))
+
+class CheckoutBufferService:
+    """
+    Coalesces check-out updates per (user_id, date) in memory
+    After the first check-in of the day every recognition only moves check_out,
+    so the latest value is kept here and written in batched UPDATEs on an
+    interval, at a size threshold and at shutdown (atexit and SIGTERM),
+    together with their attendance summary deltas and edge sync entries.
+    Opt-in and lossy: every process buffers on its own, reads and summaries
+    lag by up to one interval, and updates buffered since the last flush are
+    lost when the process is killed (SIGKILL, OOM killer).
+    """
+    
+    _app = None
+    _interval = 0.0
+    _max_pending = 500
+    _lock = threading.Lock()
+    _rows = {}  # (user_id, date) -> latest check_out (None before the first check-out)
+    _pending = {}  # (user_id, date) -> check_out not yet written
+    _wakeup = threading.Event()
+    _thread = None
+    _flushed = 0
+    _flushes = 0
+    
+    @classmethod
+    def init_app(cls, app):
+        """Start the flush thread when CHECKOUT_BUFFER_INTERVAL > 0"""
+        cls._interval = app.config.get('CHECKOUT_BUFFER_INTERVAL', cls._interval)
+        cls._max_pending = app.config.get('CHECKOUT_BUFFER_MAX_PENDING', cls._max_pending)
+        if not cls.enabled() or cls._thread is not None:
+            return
+        
+        cls._app = app
+        cls._thread = threading.Thread(target=cls._run, name='checkout-buffer', daemon=True)
+        cls._thread.start()
+        atexit.register(cls.flush)
+        cls._flush_on_sigterm()
+        print(f"✅ Check-out buffer started: flush every {cls._interval}s or {cls._max_pending} updates")
+    
+    @classmethod
+    def _flush_on_sigterm(cls):
+        """
+        Flush when SIGTERM arrives, then hand the signal to the previous handler
+        (e.g. the WSGI server's graceful shutdown, or the default exit)
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        previous = signal.getsignal(signal.SIGTERM)
+        
+        def handle_sigterm(signum, frame):
+            # Flush from another thread: the interrupted thread may hold the buffer lock
+            flusher = threading.Thread(target=cls.flush, name='checkout-buffer-shutdown', daemon=True)
+            flusher.start()
+            flusher.join(SHUTDOWN_FLUSH_TIMEOUT)
+            if callable(previous):
+                previous(signum, frame)
+            elif previous != signal.SIG_IGN:
+                signal.signal(signum, signal.SIG_DFL)
+                os.kill(os.getpid(), signum)
+        
+        signal.signal(signal.SIGTERM, handle_sigterm)
+    
+    @classmethod
+    def enabled(cls):
+        """Whether check-outs are buffered instead of written per request"""
+        return cls._interval > 0
+    
+    @classmethod
+    def _run(cls):
+        """Flush loop of the background thread"""
+        while True:
+            cls._wakeup.wait(cls._interval)
+            cls._wakeup.clear()
+            cls.flush()
+    
+    @classmethod
+    def remember(cls, user_id, attendance_date, check_out):
+        """Record that an attendance row exists (call only once it is committed)"""
+        if not cls.enabled():
+            return
+        with cls._lock:
+            cls._rows.setdefault((user_id, attendance_date), check_out)
+    
+    @classmethod
+    def record_checkout(cls, user_id, attendance_date, check_out):
+        """
+        Buffer a check-out for a row known to exist
+        Returns: (buffered, previous_check_out)
+        """
+        if not cls.enabled():
+            return False, None
+        key = (user_id, attendance_date)
+        with cls._lock:
+            if key not in cls._rows:
+                return False, None
+            previous = cls._rows[key]
+            cls._rows[key] = check_out
+            cls._pending[key] = check_out
+            pending_count = len(cls._pending)
+        
+        if pending_count >= cls._max_pending:
+            cls._wakeup.set()
+        return True, previous
+    
+    @classmethod
+    def flush(cls):
+        """
+        Write every buffered check-out in one batched UPDATE, with its summary
+        deltas in the same transaction
+        Returns: number of check-outs written
+        """
+        with cls._lock:
+            if not cls._pending:
+                return 0
+            pending, cls._pending = cls._pending, {}
+            # Forget earlier days so the row cache stays small
+            today = date.today()
+            cls._rows = {key: value for key, value in cls._rows.items() if key[1] >= today}
+        
+        params = [
+            {'user_id': user_id, 'date': attendance_date, 'check_out': check_out}
+            for (user_id, attendance_date), check_out in pending.items()
+        ]
+        try:
+            with cls._app.app_context():
+                changes = cls._summary_changes(pending)
+                db.session.execute(FLUSH_CHECKOUTS_SQL, params)
+                AttendanceSummaryService.apply_changes(changes)
+                EdgeSyncService.enqueue(changes)
+                db.session.commit()
+        except Exception as e:
+            print(f"❌ Error flushing {len(params)} check-outs: {str(e)}")
+            # Put the batch back unless a newer check-out arrived meanwhile
+            with cls._lock:
+                for key, check_out in pending.items():
+                    cls._pending.setdefault(key, check_out)
+            return 0
+        
+        with cls._lock:
+            cls._flushed += len(params)
+            cls._flushes += 1
+        return len(params)
+    
+    @classmethod
+    def _summary_changes(cls, pending):
+        """
+        Changes the flush UPDATE will make, from the current rows locked until
+        commit, so rows moved on by another process or deleted add no delta
+        """
+        rows = db.session.query(Attendance.user_id, Attendance.date, Attendance.check_in, Attendance.check_out).filter(
+            Attendance.user_id.in_({user_id for user_id, _ in pending}),
+            Attendance.date.in_({attendance_date for _, attendance_date in pending})
+        ).with_for_update().all()
+        changes = []
+        for row in rows:
+            check_out = pending.get((row.user_id, row.date))
+            # Same forward-only rule as FLUSH_CHECKOUTS_SQL
+            if check_out is not None and (row.check_out is None or row.check_out < check_out):
+                changes.append(AttendanceChange(row.user_id, row.date, row.check_in, row.check_out, check_out, False))
+        return changes
+    
+    @classmethod
+    def stats(cls):
+        """Buffer counters for the debug endpoint"""
+        with cls._lock:
+            return {
+                'enabled': cls.enabled(),
+                'interval_seconds': cls._interval,
+                'max_pending': cls._max_pending,
+                'pending': len(cls._pending),
+                'known_rows': len(cls._rows),
+                'flushed': cls._flushed,
+                'flushes': cls._flushes,
+            }
@@ -0,0 +1,353 @@
+"""
+Edge sync service
+"""
+import atexit
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import (
+    create_engine, text, bindparam, select, delete, func, tuple_,
+    MetaData, Table, Column, Integer, Float, Date, DateTime
+)
+from models import User, Attendance, FaceTemplate
+from config.database import db
+from services.attendance_summary_service import AttendanceSummaryService, AttendanceChange
+from services.face_gallery_service import FaceGalleryService
+
+# Local-only table: (user_id, date) keys of attendance rows changed since their last upload
+EDGE_METADATA = MetaData()
+edge_sync_queue = Table(
+    'edge_sync_queue', EDGE_METADATA,
+    Column('user_id', Integer, primary_key=True),
+    Column('date', Date, primary_key=True),
+    Column('queued_at', Float, nullable=False),
+)
+
+ENQUEUE_SQL = text(
+    "INSERT INTO edge_sync_queue (user_id, date, queued_at) VALUES (:user_id, :date, :queued_at) "
+    "ON CONFLICT (user_id, date) DO UPDATE SET queued_at = excluded.queued_at"
+).bindparams(bindparam('date', type_=Date))
+
+# Central upsert on unique_user_date keeping the earliest check-in and the latest check-out
+# (MySQL >= 8.0.19 row alias; VALUES(col) is deprecated)
+MERGE_ATTENDANCE_SQL = {
+    'mysql': (
+        "INSERT INTO attendance (user_id, date, check_in, check_out, created_at, updated_at) "
+        "VALUES (:user_id, :date, :check_in, :check_out, :now, :now) AS new "
+        "ON DUPLICATE KEY UPDATE "
+        "check_in = LEAST(COALESCE(attendance.check_in, new.check_in), COALESCE(new.check_in, attendance.check_in)), "
+        "check_out = GREATEST(COALESCE(attendance.check_out, new.check_out), COALESCE(new.check_out, attendance.check_out)), "
+        "updated_at = new.updated_at"
+    ),
+    'postgresql': (
+        "INSERT INTO attendance (user_id, date, check_in, check_out, created_at, updated_at) "
+        "VALUES (:user_id, :date, :check_in, :check_out, :now, :now) "
+        "ON CONFLICT (user_id, date) DO UPDATE SET "
+        "check_in = LEAST(attendance.check_in, excluded.check_in), "
+        "check_out = GREATEST(attendance.check_out, excluded.check_out), "
+        "updated_at = excluded.updated_at"
+    ),
+    'sqlite': (
+        "INSERT INTO attendance (user_id, date, check_in, check_out, created_at, updated_at) "
+        "VALUES (:user_id, :date, :check_in, :check_out, :now, :now) "
+        "ON CONFLICT (user_id, date) DO UPDATE SET "
+        "check_in = min(coalesce(attendance.check_in, excluded.check_in), coalesce(excluded.check_in, attendance.check_in)), "
+        "check_out = max(coalesce(attendance.check_out, excluded.check_out), coalesce(excluded.check_out, attendance.check_out)), "
+        "updated_at = excluded.updated_at"
+    ),
+}
+
+USER_COLUMNS = ('id', 'name', 'email', 'employee_id', 'department', 'face_encoding', 'image_path', 'created_at', 'updated_at')
+
+class EdgeSyncService:
+    """
+    Edge deployment: check-ins are written to the local SQLite store and
+    queued; a background thread uploads queued rows to the central database in
+    batches and pulls users and face templates so the gallery keeps working
+    while the central database is unreachable
+    """
+    
+    _app = None
+    _central = None
+    _lock = threading.Lock()
+    _thread = None
+    _wakeup = threading.Event()
+    _interval = 10.0
+    _batch_size = 500
+    _gallery_refresh = 300.0
+    _last_push = None
+    _last_pull = None
+    _last_error = None
+    _pushed = 0
+    _dropped = 0
+    
+    @classmethod
+    def init_app(cls, app, start=True):
+        """
+        Create the sync queue, seed an empty local gallery and start the sync
+        thread in edge mode (start=False for one-off rounds run by a script)
+        """
+        if not app.config.get('EDGE_MODE') or cls._thread is not None:
+            return
+        cls._app = app
+        cls._interval = app.config.get('EDGE_SYNC_INTERVAL', cls._interval)
+        cls._batch_size = app.config.get('EDGE_SYNC_BATCH_SIZE', cls._batch_size)
+        cls._gallery_refresh = app.config.get('EDGE_GALLERY_REFRESH', cls._gallery_refresh)
+        cls._central = create_engine(app.config['CENTRAL_DATABASE_URI'], pool_pre_ping=True, pool_recycle=300)
+        
+        with app.app_context():
+            EDGE_METADATA.create_all(db.engine)
+            # First start: the gallery has to come from the central database once
+            if db.session.query(User.id).first() is None:
+                cls.pull_gallery(reload=False)
+        
+        if not start:
+            return
+        cls._thread = threading.Thread(target=cls._run, name='edge-sync', daemon=True)
+        cls._thread.start()
+        atexit.register(cls.push_pending)
+        print(f"✅ Edge mode: local store {app.config['SQLALCHEMY_DATABASE_URI']}, sync every {cls._interval}s")
+    
+    @classmethod
+    def enabled(cls):
+        """Whether the app runs in edge mode"""
+        return cls._central is not None
+    
+    @classmethod
+    def enqueue(cls, changes):
+        """Queue changed attendance rows for upload, in the current session without committing"""
+        if not cls.enabled():
+            return
+        queued_at = time.time()
+        params = [
+            {'user_id': change.user_id, 'date': change.date, 'queued_at': queued_at}
+            for change in changes if change
+        ]
+        if params:
+            db.session.execute(ENQUEUE_SQL, params)
+    
+    @classmethod
+    def _run(cls):
+        """Sync loop: upload queued attendance, pull the gallery every EDGE_GALLERY_REFRESH seconds"""
+        next_pull = time.monotonic() + cls._gallery_refresh
+        while True:
+            cls._wakeup.wait(cls._interval)
+            cls._wakeup.clear()
+            cls.push_pending()
+            if time.monotonic() >= next_pull:
+                cls.pull_gallery()
+                next_pull = time.monotonic() + cls._gallery_refresh
+    
+    @classmethod
+    def push_pending(cls):
+        """
+        Upload queued attendance rows in batches until the queue is empty
+        Returns: number of rows uploaded
+        """
+        if not cls.enabled():
+            return 0
+        pushed = 0
+        try:
+            with cls._app.app_context():
+                while True:
+                    count = cls._push_batch()
+                    pushed += count
+                    if count < cls._batch_size:
+                        break
+            with cls._lock:
+                cls._last_push = datetime.utcnow()
+                cls._last_error = None
+        except Exception as e:
+            with cls._lock:
+                cls._last_error = f"{type(e).__name__}: {str(e)}"
+            print(f"❌ Edge sync upload failed: {str(e)}")
+        return pushed
+    
+    @classmethod
+    def _push_batch(cls):
+        """Upload one batch of queued rows and merge them into the central attendance and summaries"""
+        rows = cls._queued_rows()
+        if not rows:
+            return 0
+        
+        with cls._central.begin() as connection:
+            merged = cls._merge_into_central(connection, rows)
+        
+        # Rows queued again during the upload keep their newer queued_at and stay queued
+        for row in rows:
+            db.session.execute(delete(edge_sync_queue).where(
+                edge_sync_queue.c.user_id == row.user_id, edge_sync_queue.c.date == row.date,
+                edge_sync_queue.c.queued_at <= row.queued_at
+            ))
+        db.session.commit()
+        
+        with cls._lock:
+            cls._pushed += merged
+            cls._dropped += len(rows) - merged
+        return len(rows)
+    
+    @classmethod
+    def _queued_rows(cls):
+        """Oldest queued keys with their local attendance times (None when the row is gone)"""
+        rows = db.session.execute(
+            select(
+                edge_sync_queue.c.user_id, edge_sync_queue.c.date, edge_sync_queue.c.queued_at,
+                Attendance.check_in, Attendance.check_out
+            ).select_from(edge_sync_queue).outerjoin(Attendance, (Attendance.user_id == edge_sync_queue.c.user_id)
+                                                     & (Attendance.date == edge_sync_queue.c.date))
+            .order_by(edge_sync_queue.c.queued_at).limit(cls._batch_size)
+        ).all()
+        db.session.rollback()
+        return rows
+    
+    @classmethod
+    def _merge_into_central(cls, connection, rows):
+        """
+        Merge local rows into the central attendance and summaries, in the caller's transaction
+        Returns: number of rows merged
+        """
+        known_users = set(connection.execute(
+            select(User.__table__.c.id).where(User.__table__.c.id.in_({row.user_id for row in rows}))
+        ).scalars())
+        current = cls._central_rows(connection, [(row.user_id, row.date) for row in rows])
+        
+        now = datetime.utcnow()
+        params = []
+        changes = []
+        for row in rows:
+            # Users deleted centrally, or rows gone locally, cannot be uploaded
+            if row.user_id not in known_users or row.check_in is None:
+                continue
+            params.append({
+                'user_id': row.user_id, 'date': row.date,
+                'check_in': row.check_in, 'check_out': row.check_out, 'now': now
+            })
+            changes.append(cls._merge_change(row, current.get((row.user_id, row.date))))
+        
+        if params:
+            statement = text(MERGE_ATTENDANCE_SQL[connection.dialect.name]).bindparams(
+                bindparam('date', type_=Date), bindparam('check_in', type_=DateTime),
+                bindparam('check_out', type_=DateTime), bindparam('now', type_=DateTime)
+            )
+            connection.execute(statement, params)
+            AttendanceSummaryService.apply_changes(changes, connection)
+        return len(params)
+    
+    @staticmethod
+    def _central_rows(connection, keys):
+        """Current central rows by (user_id, date), locked so the summary deltas match the merge"""
+        attendance = Attendance.__table__
+        return {
+            (row.user_id, row.date): row for row in connection.execute(
+                select(attendance.c.user_id, attendance.c.date, attendance.c.check_in, attendance.c.check_out)
+                .where(tuple_(attendance.c.user_id, attendance.c.date).in_(keys)).with_for_update()
+            )
+        }
+    
+    @staticmethod
+    def _merge_change(local, central):
+        """Summary change of merging a local row into the central one (earliest check-in, latest check-out)"""
+        if central is None:
+            return AttendanceChange(local.user_id, local.date, local.check_in, None, local.check_out, True)
+        check_in = min(value for value in (central.check_in, local.check_in) if value is not None)
+        check_outs = [value for value in (central.check_out, local.check_out) if value is not None]
+        return AttendanceChange(
+            local.user_id, local.date, check_in, central.check_out, max(check_outs) if check_outs else None,
+            False, central.check_in
+        )
+    
+    @classmethod
+    def pull_gallery(cls, reload=True):
+        """
+        Mirror central users and face templates into the local store: users updated
+        since the newest local copy, templates and deletions by id difference
+        Returns: whether anything changed
+        """
+        if not cls.enabled():
+            return False
+        try:
+            with cls._app.app_context():
+                changed = cls._pull_users() | cls._pull_templates()
+                db.session.commit()
+                if changed and reload:
+                    FaceGalleryService.load()
+            with cls._lock:
+                cls._last_pull = datetime.utcnow()
+            if changed:
+                print("✅ Edge gallery pulled from the central database")
+            return changed
+        except Exception as e:
+            db.session.rollback()
+            with cls._lock:
+                cls._last_error = f"{type(e).__name__}: {str(e)}"
+            print(f"❌ Edge gallery pull failed: {str(e)}")
+            return False
+    
+    @classmethod
+    def _pull_users(cls):
+        """Upsert changed central users locally and drop users deleted centrally"""
+        users = User.__table__
+        watermark = db.session.query(func.max(User.updated_at)).scalar()
+        local_ids = set(db.session.execute(select(users.c.id)).scalars())
+        with cls._central.connect() as connection:
+            central_ids = set(connection.execute(select(users.c.id)).scalars())
+            query = select(*[users.c[column] for column in USER_COLUMNS])
+            if watermark is not None:
+                query = query.where(users.c.updated_at >= watermark)
+            changed = {row.id: row._asdict() for row in connection.execute(query)}
+            missing = central_ids - local_ids - set(changed)
+            if missing:
+                changed.update({row.id: row._asdict() for row in connection.execute(
+                    select(*[users.c[column] for column in USER_COLUMNS]).where(users.c.id.in_(missing))
+                )})
+        
+        removed = local_ids - central_ids
+        if removed or changed:
+            db.session.execute(delete(users).where(users.c.id.in_(removed | set(changed))))
+        # Other local processes drop removed users on their next gallery refresh
+        FaceGalleryService.record_deletions(removed)
+        if changed:
+            db.session.execute(users.insert(), list(changed.values()))
+        return bool(removed or changed)
+    
+    @classmethod
+    def _pull_templates(cls):
+        """Copy new central face templates and drop removed ones"""
+        templates = FaceTemplate.__table__
+        local_ids = set(db.session.execute(select(templates.c.id)).scalars())
+        with cls._central.connect() as connection:
+            central_ids = set(connection.execute(select(templates.c.id)).scalars())
+            new_ids = central_ids - local_ids
+            new_rows = [row._asdict() for row in connection.execute(
+                select(templates).where(templates.c.id.in_(new_ids))
+            )] if new_ids else []
+        
+        removed = local_ids - central_ids
+        if removed:
+            db.session.execute(delete(templates).where(templates.c.id.in_(removed)))
+        if new_rows:
+            db.session.execute(templates.insert(), new_rows)
+        return bool(removed or new_rows)
+    
+    @classmethod
+    def stats(cls):
+        """Sync lag and counters for the debug endpoint"""
+        if not cls.enabled():
+            return {'enabled': False}
+        with cls._app.app_context():
+            pending, oldest = db.session.execute(
+                select(func.count(), func.min(edge_sync_queue.c.queued_at))
+            ).one()
+            db.session.rollback()
+        with cls._lock:
+            return {
+                'enabled': True,
+                'pending_rows': pending,
+                'sync_lag_seconds': round(time.time() - oldest, 1) if oldest else 0,
+                'last_push': cls._last_push.isoformat() if cls._last_push else None,
+                'last_gallery_pull': cls._last_pull.isoformat() if cls._last_pull else None,
+                'last_error': cls._last_error,
+                'pushed_rows': cls._pushed,
+                'dropped_rows': cls._dropped,
+                'interval_seconds': cls._interval,
+            }
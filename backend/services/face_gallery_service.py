@@ -0,0 +1,633 @@
+"""
+Face gallery service
+"""
+import threading
+import time
+import uuid
+from collections import namedtuple, defaultdict
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import select, func, or_
+from models import User, FaceTemplate, UserDeletion
+from config.database import db
+from utils.helpers import unpack_face_encoding, FACE_ENCODING_DTYPE
+from utils.ivf_index import IVFIndex, squared_distances, recall_report
+from utils.gallery_snapshot import current_generation, read_snapshot, write_snapshot, reader_lock, writer_lock
+from utils.metrics import STAGE_SECONDS
+
+ENCODING_SIZE = 128
+GALLERY_DTYPE = FACE_ENCODING_DTYPE
+
+# Lightweight user record kept in the gallery instead of detached ORM objects
+GalleryEntry = namedtuple('GalleryEntry', ['id', 'name', 'email', 'employee_id', 'image_path'])
+
+# Immutable snapshot published as one object so readers never lock
+# encodings/sq_norms/ids: search rows sorted by owner user id (templates, or one centroid per user)
+# user_ids/starts: distinct owners and the first row of each owner's group
+GalleryMatrix = namedtuple('GalleryMatrix', ['encodings', 'sq_norms', 'ids', 'user_ids', 'starts', 'ann'])
+
+# All enrollment templates sorted by owner, kept to rebuild search rows after changes
+TemplateMatrix = namedtuple('TemplateMatrix', ['encodings', 'ids'])
+
+# Delta refreshes look this far behind the watermark, for rows committed out of timestamp order
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+class FaceGalleryService:
+    """Process-wide in-memory index of enrolled face templates"""
+
+    _lock = threading.RLock()
+    _loaded = False
+    _matrix = GalleryMatrix(
+        np.empty((0, ENCODING_SIZE), dtype=GALLERY_DTYPE),
+        np.empty(0, dtype=GALLERY_DTYPE),
+        np.empty(0, dtype=np.int64),
+        np.empty(0, dtype=np.int64),
+        np.empty(0, dtype=np.int64),
+        None,
+    )
+    _templates = TemplateMatrix(np.empty((0, ENCODING_SIZE), dtype=GALLERY_DTYPE), np.empty(0, dtype=np.int64))
+    _entries = {}
+    _version = uuid.uuid4().hex
+    _ann_settings = {'enabled': False, 'min_gallery': 5000, 'lists': 0, 'probes': 8}
+    _reduction = 'min'
+    _app = None
+    _snapshot_dir = None
+    _generation = None  # snapshot generation the templates are mapped from
+    _watermark = None  # newest users.updated_at / face_templates.created_at / user_deletions.deleted_at reflected
+    _dirty = False  # changed in this process since the last snapshot
+    _refresh_interval = 30.0
+    _refresher = None
+
+    @staticmethod
+    def _parse_encoding(face_encoding):
+        """Parse a stored face encoding into a 128-d vector"""
+        encoding = unpack_face_encoding(face_encoding)
+        if encoding.shape != (ENCODING_SIZE,):
+            raise ValueError(f"invalid encoding length {encoding.size}")
+        return encoding
+
+    @staticmethod
+    def _make_entry(user):
+        """Build a gallery entry from a user row"""
+        return GalleryEntry(user.id, user.name, user.email, user.employee_id, user.image_path)
+
+    @classmethod
+    def _search_rows(cls, encodings, ids):
+        """
+        Rows matched against queries for templates sorted by owner
+        'min' searches every template, 'centroid' one mean template per user
+        """
+        if cls._reduction != 'centroid' or len(ids) == 0:
+            return encodings, ids
+        user_ids, starts, counts = np.unique(ids, return_index=True, return_counts=True)
+        centroids = np.add.reduceat(encodings, starts, axis=0) / counts[:, None]
+        return centroids.astype(GALLERY_DTYPE), user_ids
+
+    @classmethod
+    def _build_ann(cls, encodings, ann=None):
+        """Train, keep or drop the IVF index for a gallery of this size"""
+        settings = cls._ann_settings
+        if not settings['enabled'] or len(encodings) < settings['min_gallery']:
+            return None
+        # Retrain once the gallery has doubled since the partitions were learnt
+        if ann is not None and len(encodings) < 2 * ann.trained_size:
+            return ann
+        return IVFIndex.train(encodings, n_lists=settings['lists'], n_probe=settings['probes'])
+
+    @classmethod
+    def _swap(cls, encodings, ids, ann=None):
+        """Publish new search rows (already sorted by owner id)"""
+        encodings = np.ascontiguousarray(encodings, dtype=GALLERY_DTYPE).reshape(-1, ENCODING_SIZE)
+        ids = np.asarray(ids, dtype=np.int64)
+        sq_norms = np.einsum('ij,ij->i', encodings, encodings)
+        user_ids, starts = np.unique(ids, return_index=True)
+        cls._matrix = GalleryMatrix(encodings, sq_norms, ids, user_ids, starts, cls._build_ann(encodings, ann))
+        cls._version = uuid.uuid4().hex
+
+    @classmethod
+    def _publish_templates(cls, encodings, ids):
+        """Replace every template and rebuild the search rows from scratch"""
+        encodings = np.asarray(encodings, dtype=GALLERY_DTYPE).reshape(-1, ENCODING_SIZE)
+        ids = np.asarray(ids, dtype=np.int64)
+        # Snapshots are stored sorted; keep their mapped pages instead of copying them
+        if len(ids) > 1 and np.any(ids[1:] < ids[:-1]):
+            order = np.argsort(ids, kind='stable')
+            encodings, ids = encodings[order], ids[order]
+        cls._templates = TemplateMatrix(encodings, ids)
+        cls._swap(*cls._search_rows(encodings, ids))
+
+    @classmethod
+    def install(cls, encodings, ids, entries, ann_settings=None):
+        """
+        Replace the whole gallery with the given templates (one row of encodings
+        per owner id) and entries; ann_settings overrides the IVF settings first
+        """
+        with cls._lock:
+            if ann_settings is not None:
+                cls._ann_settings = {**cls._ann_settings, **ann_settings}
+            cls._publish_templates(encodings, ids)
+            cls._entries = {entry[0]: GalleryEntry(*entry) for entry in entries}
+            cls._loaded = True
+
+    @classmethod
+    def init_app(cls, app, refresher=True, load=True):
+        """
+        Build the gallery once at application startup (load=False leaves it to
+        the warm-up step), from the shared snapshot when FACE_GALLERY_SNAPSHOT_DIR
+        is set, and start the delta refresher
+        """
+        cls._ann_settings = {
+            'enabled': app.config.get('FACE_ANN_ENABLED', False),
+            'min_gallery': app.config.get('FACE_ANN_MIN_GALLERY', 5000),
+            'lists': app.config.get('FACE_ANN_LISTS', 0),
+            'probes': app.config.get('FACE_ANN_PROBES', 8),
+        }
+        cls._reduction = app.config.get('FACE_TEMPLATE_REDUCTION', 'min')
+        cls._snapshot_dir = app.config.get('FACE_GALLERY_SNAPSHOT_DIR') or None
+        cls._refresh_interval = app.config.get('FACE_GALLERY_REFRESH_INTERVAL', cls._refresh_interval)
+        cls._app = app
+        if load:
+            try:
+                with app.app_context():
+                    cls.refresh()
+                source = f"snapshot {cls._generation}" if cls._generation else "database"
+                print(f"✅ Face gallery loaded from {source}: {cls.size()} users, {cls.template_count()} templates")
+            except Exception as e:
+                print(f"❌ Error loading face gallery: {str(e)}")
+
+        if refresher and cls._refresh_interval > 0 and cls._refresher is None:
+            cls._refresher = threading.Thread(target=cls._run, name='face-gallery-refresher', daemon=True)
+            cls._refresher.start()
+
+    @classmethod
+    def _run(cls):
+        """Refresher loop: pick up other processes' snapshots and database changes"""
+        while True:
+            time.sleep(cls._refresh_interval)
+            try:
+                with cls._app.app_context():
+                    cls.refresh()
+            except Exception as e:
+                print(f"❌ Error refreshing face gallery: {str(e)}")
+
+    @classmethod
+    def _user_templates(cls, user, extra_templates):
+        """Registration encoding followed by the user's extra templates"""
+        templates = [cls._parse_encoding(user.face_encoding)]
+        for encoding in extra_templates:
+            try:
+                templates.append(cls._parse_encoding(encoding))
+            except Exception as e:
+                print(f"Error processing template of user {user.name}: {str(e)}")
+        return templates
+
+    @staticmethod
+    def _database_watermark():
+        """Newest user update, template creation or user deletion in the database"""
+        user_time = db.session.query(func.max(User.updated_at)).scalar()
+        template_time = db.session.query(func.max(FaceTemplate.created_at)).scalar()
+        deletion_time = db.session.query(func.max(UserDeletion.deleted_at)).scalar()
+        times = [value for value in (user_time, template_time, deletion_time) if value is not None]
+        return max(times) if times else None
+    
+    @staticmethod
+    def record_deletions(user_ids):
+        """Tombstone deleted users for other processes' refreshes, in the current session without committing"""
+        deleted_at = datetime.utcnow()
+        for user_id in user_ids:
+            db.session.merge(UserDeletion(user_id=user_id, deleted_at=deleted_at))
+
+    @staticmethod
+    def _user_rows(criterion=None):
+        """Gallery columns of every user (or those matching criterion), with their extra templates by user id"""
+        query = User.query if criterion is None else User.query.filter(criterion)
+        rows = query.with_entities(
+            User.id, User.name, User.email, User.employee_id, User.image_path, User.face_encoding
+        ).all()
+        extra_templates = defaultdict(list)
+        if not rows:
+            return rows, extra_templates
+        templates = FaceTemplate.query.with_entities(FaceTemplate.user_id, FaceTemplate.encoding)
+        if criterion is not None:
+            templates = templates.filter(FaceTemplate.user_id.in_([row.id for row in rows]))
+        for template in templates.order_by(FaceTemplate.id):
+            extra_templates[template.user_id].append(template.encoding)
+        return rows, extra_templates
+
+    @classmethod
+    def load(cls):
+        """
+        (Re)build the gallery from the users and face_templates tables
+        With a snapshot directory the result is written as the new snapshot and mapped back
+        """
+        started = time.perf_counter()
+        watermark = cls._database_watermark()
+        rows, extra_templates = cls._user_rows()
+
+        encodings = []
+        ids = []
+        entries = {}
+        for row in rows:
+            try:
+                templates = cls._user_templates(row, extra_templates.get(row.id, []))
+            except Exception as e:
+                print(f"Error processing user {row.name}: {str(e)}")
+                continue
+            encodings.extend(templates)
+            ids.extend([row.id] * len(templates))
+            entries[row.id] = cls._make_entry(row)
+
+        with cls._lock:
+            cls.install(encodings, ids, entries.values())
+            cls._watermark = watermark
+            cls._generation = None
+            cls._dirty = True
+            if cls._snapshot_dir:
+                with writer_lock(cls._snapshot_dir):
+                    cls._write_snapshot()
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage='gallery_load')
+
+    @classmethod
+    def _write_snapshot(cls):
+        """Publish the current gallery as the live snapshot and map it back (call under writer_lock)"""
+        templates = cls._templates
+        generation = write_snapshot(cls._snapshot_dir, templates.encodings, templates.ids,
+                                    cls._entries.values(), cls._watermark)
+        cls._map_snapshot(generation)
+
+    @classmethod
+    def _map_snapshot(cls, generation):
+        """Replace the gallery with a memory-mapped snapshot generation"""
+        encodings, ids, entries, watermark = read_snapshot(cls._snapshot_dir, generation)
+        cls.install(encodings, ids, entries)
+        cls._watermark = watermark
+        cls._generation = generation
+        cls._dirty = False
+
+    @classmethod
+    def refresh(cls):
+        """
+        Bring the gallery up to date: map a newer snapshot written by another
+        process, then apply users changed since the watermark and users deleted
+        meanwhile; when that changed anything the snapshot is rewritten
+        Returns: whether the gallery changed
+        """
+        with cls._lock:
+            if cls._snapshot_dir is not None:
+                return cls._refresh_from_snapshot()
+            if not cls._loaded:
+                cls.load()
+                return True
+            return cls._apply_deltas()
+
+    @classmethod
+    def _refresh_from_snapshot(cls):
+        """refresh() with a snapshot directory (call under _lock)"""
+        generation, changed = cls._map_live_generation()
+        if generation is None:
+            cls.load()
+            return True
+        cls._apply_deltas()
+        if not cls._dirty:
+            return changed
+
+        with writer_lock(cls._snapshot_dir):
+            # Another process may have published a snapshot in the meantime
+            _, remapped = cls._map_live_generation()
+            if remapped and not cls._apply_deltas():
+                return True
+            cls._write_snapshot()
+        return True
+
+    @classmethod
+    def _map_live_generation(cls):
+        """
+        Map the live snapshot generation unless it is mapped already; the reader
+        lock keeps writers from deleting it between reading CURRENT and mapping
+        Returns: (live generation or None, whether it was mapped now)
+        """
+        with reader_lock(cls._snapshot_dir):
+            generation = current_generation(cls._snapshot_dir)
+            if generation is None or generation == cls._generation:
+                return generation, False
+            cls._map_snapshot(generation)
+            return generation, True
+
+    @classmethod
+    def _apply_deltas(cls):
+        """
+        Reload users updated (or given templates) since the watermark and drop
+        deleted users; rows that match the gallery already are skipped
+        Returns: whether the gallery changed
+        """
+        started = time.perf_counter()
+        watermark = cls._database_watermark()
+        since = cls._watermark - REFRESH_OVERLAP if cls._watermark else None
+        criterion = None
+        if since is not None:
+            criterion = or_(
+                User.updated_at >= since,
+                User.id.in_(select(FaceTemplate.user_id).where(FaceTemplate.created_at >= since))
+            )
+        rows, extra_templates = cls._user_rows(criterion)
+        changed_ids, new_templates, new_entries = cls._changed_users(rows, extra_templates)
+        removed_ids = cls._removed_user_ids(since, {row.id for row in rows})
+        if watermark is not None and (cls._watermark is None or watermark > cls._watermark):
+            cls._watermark = watermark
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage='gallery_refresh')
+        if not changed_ids and not removed_ids:
+            return False
+
+        templates = np.vstack(new_templates) if new_templates else np.empty((0, ENCODING_SIZE), dtype=GALLERY_DTYPE)
+        ids = np.concatenate([np.full(len(user_templates), user_id, dtype=np.int64)
+                              for user_id, user_templates in zip(changed_ids, new_templates)]) if new_templates else []
+        cls._replace_templates(changed_ids + removed_ids, templates, ids)
+        entries = {user_id: entry for user_id, entry in cls._entries.items() if user_id not in removed_ids}
+        entries.update(new_entries)
+        cls._entries = entries
+        cls._dirty = True
+        return True
+
+    @classmethod
+    def _changed_users(cls, rows, extra_templates):
+        """
+        Users whose entry or templates differ from the gallery
+        Returns: (user ids, template arrays, entries by user id)
+        """
+        current = cls._templates
+        changed_ids = []
+        new_templates = []
+        new_entries = {}
+        for row in rows:
+            try:
+                templates = np.asarray(cls._user_templates(row, extra_templates.get(row.id, [])), dtype=GALLERY_DTYPE)
+            except Exception as e:
+                print(f"Error processing user {row.name}: {str(e)}")
+                continue
+            entry = cls._make_entry(row)
+            if cls._entries.get(row.id) == entry and np.array_equal(current.encodings[current.ids == row.id], templates):
+                continue
+            changed_ids.append(row.id)
+            new_templates.append(templates)
+            new_entries[row.id] = entry
+        return changed_ids, new_templates, new_entries
+
+    @classmethod
+    def _removed_user_ids(cls, since, present_ids):
+        """
+        Gallery users tombstoned since the watermark, read from user_deletions
+        instead of comparing every user id; present_ids (rows just reloaded)
+        guards against a deleted id being reused by a new user
+        """
+        query = select(UserDeletion.user_id)
+        if since is not None:
+            query = query.where(UserDeletion.deleted_at >= since)
+        return [user_id for user_id in db.session.execute(query).scalars()
+                if user_id in cls._entries and user_id not in present_ids]
+
+    @classmethod
+    def ensure_loaded(cls):
+        """Load the gallery lazily if startup loading did not happen"""
+        if not cls._loaded:
+            with cls._lock:
+                if not cls._loaded:
+                    cls.refresh()
+
+    @staticmethod
+    def _merge_rows(encodings, ids, user_ids, new_encodings, new_ids):
+        """
+        Drop user_ids' rows and append new ones
+        Returns: (keep mask of the old rows, merged encodings, merged ids, sort order of the merge)
+        """
+        keep = ~np.isin(ids, user_ids)
+        merged = np.vstack([encodings[keep], new_encodings])
+        merged_ids = np.append(ids[keep], new_ids)
+        return keep, merged, merged_ids, np.argsort(merged_ids, kind='stable')
+
+    @classmethod
+    def _replace_templates(cls, user_ids, new_templates, new_ids):
+        """Swap some users' templates and search rows, keeping other rows and IVF lists"""
+        new_templates = np.asarray(new_templates, dtype=GALLERY_DTYPE).reshape(-1, ENCODING_SIZE)
+        new_ids = np.asarray(new_ids, dtype=np.int64)
+        new_order = np.argsort(new_ids, kind='stable')
+        new_templates, new_ids = new_templates[new_order], new_ids[new_order]
+
+        templates = cls._templates
+        _, encodings, ids, order = cls._merge_rows(templates.encodings, templates.ids, user_ids, new_templates, new_ids)
+        cls._templates = TemplateMatrix(encodings[order], ids[order])
+
+        matrix = cls._matrix
+        new_rows, new_row_ids = cls._search_rows(new_templates, new_ids)
+        keep, rows, ids, order = cls._merge_rows(matrix.encodings, matrix.ids, user_ids, new_rows, new_row_ids)
+        # Incremental insert: existing rows keep their IVF lists, new rows are assigned
+        ann = matrix.ann.filtered(keep).appended(new_rows).reordered(order) if matrix.ann is not None else None
+        cls._swap(rows[order], ids[order], ann)
+
+    @classmethod
+    def _replace_user_templates(cls, user_id, new_templates):
+        """Swap one user's templates and search rows"""
+        new_templates = np.asarray(new_templates, dtype=GALLERY_DTYPE).reshape(-1, ENCODING_SIZE)
+        cls._replace_templates([user_id], new_templates, np.full(len(new_templates), user_id, dtype=np.int64))
+
+    @classmethod
+    def upsert_user(cls, user):
+        """Add or replace a user (registration encoding plus stored templates) in the gallery"""
+        if not cls._loaded:
+            return
+        try:
+            extra_templates = [template.encoding for template in
+                               FaceTemplate.query.with_entities(FaceTemplate.encoding).filter_by(user_id=user.id)]
+            templates = cls._user_templates(user, extra_templates)
+        except Exception as e:
+            print(f"Error processing user {user.name}: {str(e)}")
+            cls.remove_user(user.id)
+            return
+
+        with cls._lock:
+            cls._replace_user_templates(user.id, templates)
+            entries = dict(cls._entries)
+            entries[user.id] = cls._make_entry(user)
+            cls._entries = entries
+            cls._dirty = True
+
+    @classmethod
+    def add_users(cls, users):
+        """Add many newly enrolled users (registration encoding only) with one swap"""
+        if not cls._loaded or not users:
+            return
+        templates = []
+        ids = []
+        new_entries = {}
+        for user in users:
+            try:
+                templates.append(cls._parse_encoding(user.face_encoding))
+            except Exception as e:
+                print(f"Error processing user {user.name}: {str(e)}")
+                continue
+            ids.append(user.id)
+            new_entries[user.id] = cls._make_entry(user)
+
+        with cls._lock:
+            cls._replace_templates(ids, templates, ids)
+            entries = dict(cls._entries)
+            entries.update(new_entries)
+            cls._entries = entries
+            cls._dirty = True
+
+    @classmethod
+    def add_template(cls, user_id, encoding):
+        """Append one template to an enrolled user"""
+        if not cls._loaded or user_id not in cls._entries:
+            return
+        with cls._lock:
+            templates = cls._templates
+            current = templates.encodings[templates.ids == user_id]
+            cls._replace_user_templates(user_id, np.vstack([current, np.asarray(encoding, dtype=GALLERY_DTYPE)]))
+            cls._dirty = True
+
+    @classmethod
+    def template_distances(cls, user_id, face_encoding):
+        """
+        Distances from one encoding to each stored template of a user
+        Returns: array of distances, or None when the user is not in the gallery
+        """
+        templates = cls._templates
+        if user_id not in cls._entries:
+            return None
+        encodings = templates.encodings[templates.ids == user_id]
+        query = np.asarray(face_encoding, dtype=GALLERY_DTYPE).reshape(1, -1)
+        return np.sqrt(squared_distances(query, encodings))[0]
+
+    @classmethod
+    def remove_user(cls, user_id):
+        """Drop a user from the gallery"""
+        if not cls._loaded:
+            return
+        with cls._lock:
+            cls._replace_user_templates(user_id, [])
+            entries = dict(cls._entries)
+            entries.pop(user_id, None)
+            cls._entries = entries
+            cls._dirty = True
+
+    @classmethod
+    def size(cls):
+        """Number of enrolled users"""
+        return len(cls._matrix.user_ids)
+
+    @classmethod
+    def template_count(cls):
+        """Number of enrolled templates"""
+        return len(cls._templates.ids)
+
+    @classmethod
+    def version(cls):
+        """Token that changes whenever the gallery content changes"""
+        return cls._version
+
+    @classmethod
+    def get_entry(cls, user_id):
+        """Get the gallery entry for a user id"""
+        return cls._entries.get(user_id)
+
+    @staticmethod
+    def distances(face_encodings, encodings, sq_norms):
+        """
+        Euclidean distances between query faces and gallery rows
+        Returns: (faces x rows) distance matrix
+        """
+        faces = np.asarray(face_encodings, dtype=GALLERY_DTYPE).reshape(-1, ENCODING_SIZE)
+        return np.sqrt(squared_distances(faces, encodings, sq_norms))
+
+    @classmethod
+    def user_distances(cls, face_encodings, matrix=None):
+        """
+        Per-user distances via a grouped min over each user's rows
+        Returns: (faces x users) distance matrix, columns ordered like matrix.user_ids
+        """
+        if matrix is None:
+            matrix = cls._matrix
+        distances = cls.distances(face_encodings, matrix.encodings, matrix.sq_norms)
+        return np.minimum.reduceat(distances, matrix.starts, axis=1)
+
+    @classmethod
+    def nearest(cls, face_encodings, matrix=None):
+        """
+        Nearest enrolled user for each face, via IVF when enabled else brute force
+        Returns: (user_ids, distances)
+        """
+        if matrix is None:
+            matrix = cls._matrix
+        if matrix.ann is not None:
+            rows, distances = matrix.ann.search(face_encodings, matrix.encodings, matrix.sq_norms)
+            return matrix.ids[rows], distances
+        per_user = cls.user_distances(face_encodings, matrix)
+        best = np.argmin(per_user, axis=1)
+        return matrix.user_ids[best], per_user[np.arange(len(best)), best]
+
+    @classmethod
+    def match(cls, face_encodings, tolerance=0.6):
+        """
+        Find the closest enrolled user for any of the given faces
+        Returns: (gallery_entry, distance, face_index) or (None, None, None)
+        """
+        cls.ensure_loaded()
+        matrix = cls._matrix
+        if len(matrix.ids) == 0 or len(face_encodings) == 0:
+            return None, None, None
+
+        with STAGE_SECONDS.time(stage='match'):
+            user_ids, distances = cls.nearest(face_encodings, matrix)
+        best = int(np.argmin(distances))
+        best_distance = float(distances[best])
+
+        if best_distance >= tolerance:
+            return None, best_distance, best
+        return cls._entries.get(int(user_ids[best])), best_distance, best
+
+    @classmethod
+    def match_groups(cls, face_encodings, group_ids, tolerance=0.6):
+        """
+        Best match per group (e.g. per image) from one (faces x users) distance computation
+        group_ids gives the group of each face encoding
+        Returns: {group_id: (gallery_entry or None, distance or None)}
+        """
+        cls.ensure_loaded()
+        matrix = cls._matrix
+        if len(matrix.ids) == 0 or len(face_encodings) == 0:
+            return {}
+
+        with STAGE_SECONDS.time(stage='match'):
+            user_ids, distances = cls.nearest(face_encodings, matrix)
+        results = {}
+        for group_id, user_id, distance in zip(group_ids, user_ids, distances):
+            distance = float(distance)
+            best = results.get(group_id)
+            if best is not None and best[1] <= distance:
+                continue
+            entry = cls._entries.get(int(user_id)) if distance < tolerance else None
+            results[group_id] = (entry, distance)
+        return results
+
+    @classmethod
+    def ann_report(cls, sample_size=200, noise=0.03, n_probe=None, seed=0):
+        """
+        Recall/latency of the IVF index against brute force on the live gallery
+        Queries are enrolled encodings with Gaussian noise added
+        """
+        cls.ensure_loaded()
+        matrix = cls._matrix
+        if len(matrix.ids) == 0:
+            return {'error': 'Gallery is empty'}
+
+        ann = matrix.ann
+        if ann is None:
+            settings = cls._ann_settings
+            ann = IVFIndex.train(matrix.encodings, n_lists=settings['lists'], n_probe=settings['probes'])
+
+        rng = np.random.default_rng(seed)
+        picks = rng.choice(len(matrix.ids), min(sample_size, len(matrix.ids)), replace=False)
+        queries = matrix.encodings[picks] + rng.normal(0, noise, (len(picks), ENCODING_SIZE)).astype(GALLERY_DTYPE)
+        report = recall_report(ann, matrix.encodings, matrix.sq_norms, queries, n_probe=n_probe)
+        report['ann_active'] = matrix.ann is not None
+        return report
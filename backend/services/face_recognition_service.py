@@ -1,34 +1,188 @@
 """
 Face recognition service
 """
-import face_recognition
 import numpy as np
-from PIL import Image
-import base64
+from PIL import Image, ImageOps
 import io
-import os
-from datetime import datetime
+import threading
+from collections import namedtuple
+from services.face_gallery_service import FaceGalleryService
+from services.recognition_cache_service import RecognitionCacheService
+from utils.helpers import unpack_face_encoding, decode_base64_image
+from utils.metrics import STAGE_SECONDS, FACES_DETECTED, RECOGNITIONS
+
+# An uploaded image decoded once and passed through the whole pipeline
+# data: original bytes, rgb: decoded RGB array, scale: decoded / original width
+FaceImage = namedtuple('FaceImage', ['data', 'rgb', 'scale', 'format'])
+
+_face_recognition = None
+_face_recognition_lock = threading.Lock()
+
+def _models():
+    """The face_recognition module, imported on first use since importing it loads the dlib models"""
+    global _face_recognition
+    if _face_recognition is None:
+        with _face_recognition_lock:
+            if _face_recognition is None:
+                import face_recognition
+                _face_recognition = face_recognition
+    return _face_recognition
 
 class FaceRecognitionService:
     """Service for face recognition operations"""
     
+    # Preprocessing limits (longest image side in pixels), overridden by init_app
+    DECODE_MAX_SIDE = 1280
+    DETECT_MAX_SIDE = 640
+    # Smallest client-supplied face box (decoded pixels) trusted without detection
+    MIN_FACE_BOX_SIDE = 40
+    
+    @classmethod
+    def init_app(cls, app):
+        """Load preprocessing settings from app config"""
+        cls.DECODE_MAX_SIDE = app.config.get('FACE_DECODE_MAX_SIDE', cls.DECODE_MAX_SIDE)
+        cls.DETECT_MAX_SIDE = app.config.get('FACE_DETECT_MAX_SIDE', cls.DETECT_MAX_SIDE)
+    
     @staticmethod
-    def encode_face_from_base64(image_data):
+    def warm_up():
+        """Run one dummy detection and encoding so dlib models are loaded and ready"""
+        dummy = np.zeros((160, 160, 3), dtype=np.uint8)
+        FaceRecognitionService.detect_faces(dummy)
+        _models().face_encodings(dummy, [(20, 140, 140, 20)])
+    
+    @staticmethod
+    def load_image(image_bytes):
         """
-        Extract face encoding from base64 image data
-        Returns: (face_encoding, error_message)
+        Decode image bytes into an RGB array
+        JPEGs are decoded in draft mode straight to roughly DECODE_MAX_SIDE,
+        EXIF orientation is applied and RGBA/palette/grayscale become RGB
+        Returns: FaceImage
         """
-        try:
-            # Decode base64 image
-            if ',' in image_data:
-                image_data = image_data.split(',')[1]
-            
-            image_bytes = base64.b64decode(image_data)
+        with STAGE_SECONDS.time(stage='image_decode'):
             image = Image.open(io.BytesIO(image_bytes))
-            image_rgb = np.array(image)
+            image_format = image.format
+            original_width = image.width
+            max_side = FaceRecognitionService.DECODE_MAX_SIDE
+            if image.format == 'JPEG' and max_side and max(image.size) > max_side:
+                scale = max_side / max(image.size)
+                image.draft('RGB', (int(image.width * scale), int(image.height * scale)))
+            scale = image.width / original_width
+            image = ImageOps.exif_transpose(image)
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            return FaceImage(image_bytes, np.asarray(image), scale, image_format)
+    
+    @staticmethod
+    def detect_faces(image_rgb):
+        """
+        Run HOG face detection on a downscaled copy of the image
+        Returns: face locations (top, right, bottom, left) in full-resolution pixels
+        """
+        with STAGE_SECONDS.time(stage='face_locations'):
+            height, width = image_rgb.shape[:2]
+            max_side = FaceRecognitionService.DETECT_MAX_SIDE
+            scale = min(1.0, max_side / max(height, width)) if max_side else 1.0
+            if scale >= 1.0:
+                return _models().face_locations(image_rgb)
             
+            small = Image.fromarray(image_rgb).resize(
+                (max(1, round(width * scale)), max(1, round(height * scale))), Image.BILINEAR
+            )
+            face_locations = []
+            for top, right, bottom, left in _models().face_locations(np.asarray(small)):
+                face_locations.append((
+                    max(0, int(top / scale)),
+                    min(width, int(right / scale)),
+                    min(height, int(bottom / scale)),
+                    max(0, int(left / scale))
+                ))
+            return face_locations
+    
+    @staticmethod
+    def face_box_to_location(face_box, image_shape, scale=1.0):
+        """
+        Validate a client-supplied face box {x, y, width, height} in original image pixels
+        Returns: (top, right, bottom, left) in decoded pixels, or None if implausible
+        """
+        try:
+            x, y, box_width, box_height = (float(face_box[key]) * scale for key in ('x', 'y', 'width', 'height'))
+        except (TypeError, KeyError, ValueError):
+            return None
+        if not np.all(np.isfinite([x, y, box_width, box_height])):
+            return None
+        if min(box_width, box_height) < FaceRecognitionService.MIN_FACE_BOX_SIDE:
+            return None
+        if not 0.5 <= box_width / box_height <= 2.0:
+            return None
+        
+        height, width = image_shape[:2]
+        left, top = max(0.0, x), max(0.0, y)
+        right, bottom = min(float(width), x + box_width), min(float(height), y + box_height)
+        # Most of the box must lie inside the frame
+        if right <= left or bottom <= top or (right - left) * (bottom - top) < 0.8 * box_width * box_height:
+            return None
+        return int(top), int(right), int(bottom), int(left)
+    
+    @staticmethod
+    def face_crop_location(image_shape, margin):
+        """
+        Location of the face in a pre-cropped image padded by `margin` (fraction of face size) per side
+        Returns: (top, right, bottom, left)
+        """
+        height, width = image_shape[:2]
+        margin = min(max(float(margin), 0.0), 1.0)
+        pad_x = width * margin / (1 + 2 * margin)
+        pad_y = height * margin / (1 + 2 * margin)
+        return int(pad_y), int(width - pad_x), int(height - pad_y), int(pad_x)
+    
+    @staticmethod
+    def client_face_location(image_shape, scale, face_box=None, face_crop=False, face_margin=0.2):
+        """
+        Face location supplied by the client (box or pre-cropped image)
+        Returns: (top, right, bottom, left) or None when detection must run
+        """
+        if face_crop:
+            location = FaceRecognitionService.face_crop_location(image_shape, face_margin)
+            top, right, bottom, left = location
+            if min(right - left, bottom - top) >= FaceRecognitionService.MIN_FACE_BOX_SIDE:
+                return location
+            return None
+        if face_box:
+            return FaceRecognitionService.face_box_to_location(face_box, image_shape, scale)
+        return None
+    
+    @staticmethod
+    def encode_faces(image_rgb, face_locations=None):
+        """
+        Encode full-resolution face crops, detecting faces first when no locations are known
+        Returns: (face_locations, face_encodings)
+        """
+        if face_locations is None:
+            face_locations = FaceRecognitionService.detect_faces(image_rgb)
+        if not face_locations:
+            return [], []
+        FACES_DETECTED.inc(len(face_locations))
+        with STAGE_SECONDS.time(stage='face_encodings'):
+            return face_locations, _models().face_encodings(image_rgb, face_locations)
+    
+    @staticmethod
+    def detect_and_encode(face_image):
+        """
+        Shared preprocessing stage: detect on the downscaled frame,
+        encode full-resolution crops
+        Returns: (face_locations, face_encodings)
+        """
+        return FaceRecognitionService.encode_faces(face_image.rgb)
+    
+    @staticmethod
+    def encode_face(face_image):
+        """
+        Extract face encoding from a decoded image
+        Returns: (face_encoding, error_message)
+        """
+        try:
             # Get face encodings
-            face_encodings = face_recognition.face_encodings(image_rgb)
+            _, face_encodings = FaceRecognitionService.detect_and_encode(face_image)
             
             if len(face_encodings) == 0:
                 return None, "Không tìm thấy khuôn mặt trong ảnh!"
@@ -39,113 +193,110 @@ class FaceRecognitionService:
             return None, f"Lỗi xử lý ảnh: {str(e)}"
     
     @staticmethod
-    def save_face_image(image_data, employee_id):
+    def encode_image_faces(image_bytes):
         """
-        Save face image to file system
-        Returns: (image_path, error_message)
+        Decode raw image bytes and encode every face in it
+        Returns: (face_encodings, error_message)
         """
         try:
-            # Decode base64 image
-            if ',' in image_data:
-                image_data = image_data.split(',')[1]
-            
-            image_bytes = base64.b64decode(image_data)
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            # Create filename and path
-            image_filename = f"{employee_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-            image_path = os.path.join('face_images', image_filename)
-            
-            # Ensure directory exists
-            os.makedirs('face_images', exist_ok=True)
-            
-            # Save image
-            image.save(image_path)
-            
-            return image_path, None
-            
+            face_image = FaceRecognitionService.load_image(image_bytes)
+            _, face_encodings = FaceRecognitionService.detect_and_encode(face_image)
+            if len(face_encodings) == 0:
+                return [], "Không tìm thấy khuôn mặt trong ảnh!"
+            return face_encodings, None
         except Exception as e:
-            return None, f"Lỗi lưu ảnh: {str(e)}"
+            return [], f"Lỗi xử lý ảnh: {str(e)}"
     
     @staticmethod
-    def recognize_face(image_data, users):
+    def encode_face_from_base64(image_data):
+        """
+        Extract face encoding from base64 image data
+        Returns: (face_encoding, error_message)
         """
-        Recognize face from image data against list of users
+        try:
+            face_image = FaceRecognitionService.load_image(decode_base64_image(image_data))
+        except Exception as e:
+            return None, f"Lỗi xử lý ảnh: {str(e)}"
+        return FaceRecognitionService.encode_face(face_image)
+    
+    @staticmethod
+    def recognize_face(image_bytes, face_box=None, face_crop=False, face_margin=0.2):
+        """
+        Recognize face from raw image bytes against the in-memory face gallery
         Returns: (found_user, confidence, error_message)
         """
+        found_user, confidence, error, _ = FaceRecognitionService.identify_face(
+            image_bytes, face_box=face_box, face_crop=face_crop, face_margin=face_margin
+        )
+        return found_user, confidence, error
+    
+    @staticmethod
+    def _match_faces(face_encodings, recent=None):
+        """
+        Match encoded faces against the kiosk's recent frames, then the whole gallery
+        Returns: (found_user, distance, face_index, result label)
+        """
+        user_id, distance, face_index = RecognitionCacheService.match_recent(recent, face_encodings)
+        found_user = FaceGalleryService.get_entry(user_id) if user_id is not None else None
+        if found_user:
+            return found_user, distance, face_index, 'cached'
+        
+        # Find best match over all faces and users in one vectorized pass
+        found_user, distance, face_index = FaceGalleryService.match(face_encodings, tolerance=0.6)
+        return found_user, distance, face_index, 'match' if found_user else 'no_match'
+    
+    @staticmethod
+    def identify_face(image_bytes, face_box=None, face_crop=False, face_margin=0.2, recent=None):
+        """
+        Recognize face from raw image bytes and also return the matched face encoding
+        A face box from the client (or a pre-cropped face image) skips server-side
+        detection; full detection only runs when the box is missing or implausible.
+        Faces close to one of the kiosk's recent frames (RecentFrames) skip the gallery match
+        Returns: (found_user, confidence, error_message, face_encoding)
+        """
         try:
-            # Decode base64 image
-            if ',' in image_data:
-                image_data = image_data.split(',')[1]
+            face_image = FaceRecognitionService.load_image(image_bytes)
+            image_rgb = face_image.rgb
             
-            image_bytes = base64.b64decode(image_data)
-            image = Image.open(io.BytesIO(image_bytes))
-            image_rgb = np.array(image)
-            
-            # Find face encodings in image
-            face_locations = face_recognition.face_locations(image_rgb)
-            face_encodings = face_recognition.face_encodings(image_rgb, face_locations)
+            client_location = FaceRecognitionService.client_face_location(
+                image_rgb.shape, face_image.scale, face_box, face_crop, face_margin
+            )
+            # Find face encodings at the client location or in the whole image
+            _, face_encodings = FaceRecognitionService.encode_faces(
+                image_rgb, [client_location] if client_location else None
+            )
             
             if len(face_encodings) == 0:
-                return None, 0, "Không tìm thấy khuôn mặt trong ảnh!"
-            
-            # Prepare stored encodings
-            stored_encodings = []
-            user_list = []
-            
-            for user in users:
-                try:
-                    stored_encoding = np.array([float(x) for x in user.face_encoding.split(',')])
-                    stored_encodings.append(stored_encoding)
-                    user_list.append(user)
-                except Exception as e:
-                    print(f"Error processing user {user.name}: {str(e)}")
-                    continue
-            
-            if not stored_encodings:
-                return None, 0, "Không có dữ liệu khuôn mặt nào trong hệ thống!"
+                RECOGNITIONS.inc(result='no_face')
+                return None, 0, "Không tìm thấy khuôn mặt trong ảnh!", None
             
-            # Find best match
-            found_user = None
-            best_match_distance = float('inf')
-            
-            for face_encoding in face_encodings:
-                face_distances = face_recognition.face_distance(stored_encodings, face_encoding)
-                min_distance_index = np.argmin(face_distances)
-                min_distance = face_distances[min_distance_index]
-                
-                # Threshold for face recognition
-                if min_distance < 0.6 and min_distance < best_match_distance:
-                    found_user = user_list[min_distance_index]
-                    best_match_distance = min_distance
+            FaceGalleryService.ensure_loaded()
+            if FaceGalleryService.size() == 0:
+                RECOGNITIONS.inc(result='empty_gallery')
+                return None, 0, "Không có dữ liệu khuôn mặt nào trong hệ thống!", None
             
+            found_user, best_match_distance, face_index, result = FaceRecognitionService._match_faces(face_encodings, recent)
+            RECOGNITIONS.inc(result=result)
             if found_user:
                 confidence = max(0, (1 - best_match_distance) * 100)  # Convert to percentage
-                return found_user, confidence, None
-            else:
-                return None, 0, "Không nhận diện được khuôn mặt! Vui lòng đăng ký trước."
+                return found_user, confidence, None, face_encodings[face_index]
+            return None, 0, "Không nhận diện được khuôn mặt! Vui lòng đăng ký trước.", None
                 
         except Exception as e:
-            return None, 0, f"Lỗi nhận diện: {str(e)}"
+            RECOGNITIONS.inc(result='error')
+            return None, 0, f"Lỗi nhận diện: {str(e)}", None
     
     @staticmethod
-    def get_face_comparison_details(image_data, users):
+    def get_face_comparison_details(image_bytes, users):
         """
         Get detailed comparison results for debugging
         Returns: comparison_results
         """
         try:
-            # Decode base64 image
-            if ',' in image_data:
-                image_data = image_data.split(',')[1]
-            
-            image_bytes = base64.b64decode(image_data)
-            image = Image.open(io.BytesIO(image_bytes))
-            image_rgb = np.array(image)
+            face_image = FaceRecognitionService.load_image(image_bytes)
             
             # Find face encodings
-            face_locations = face_recognition.face_locations(image_rgb)
-            face_encodings = face_recognition.face_encodings(image_rgb, face_locations)
+            face_locations, face_encodings = FaceRecognitionService.detect_and_encode(face_image)
             
             result = {
                 'faces_detected': len(face_encodings),
@@ -163,9 +314,9 @@ class FaceRecognitionService:
                     
                     for user in users:
                         try:
-                            stored_encoding = np.array([float(x) for x in user.face_encoding.split(',')])
-                            distance = face_recognition.face_distance([stored_encoding], face_encoding)[0]
-                            is_match = distance < 0.6
+                            stored_encoding = unpack_face_encoding(user.face_encoding)
+                            distance = _models().face_distance([stored_encoding], face_encoding)[0]
+                            is_match = bool(distance < 0.6)
                             
                             face_result['matches'].append({
                                 'user_name': user.name,
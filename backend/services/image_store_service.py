@@ -0,0 +1,215 @@
+"""
+Face image store service
+"""
+import atexit
+import hashlib
+import io
+import os
+import queue
+import re
+import threading
+from PIL import Image
+
+# Content-addressed file name: sha256 of the stored JPEG bytes
+CONTENT_NAME = re.compile(r'^[0-9a-f]{64}\.jpg$')
+
+class ImageStoreService:
+    """
+    Content-addressed registration photo store
+    Photos are stored as face_images/ab/cd/<sha256>.jpg, so identical uploads
+    share one file. Writes and deletes go through a background writer thread;
+    an in-memory index of stored paths answers existence checks without
+    touching the disk.
+    """
+    
+    _root = 'face_images'
+    _max_side = 1024
+    _quality = 90
+    _lock = threading.Lock()
+    _index = set()
+    _pending = {}  # path -> bytes queued but not yet on disk
+    _queue = None
+    _thread = None
+    _written = 0
+    _deduplicated = 0
+    
+    @classmethod
+    def configure(cls, app):
+        """Read store settings only (recognition workers encode photos but never write them)"""
+        cls._root = app.config.get('IMAGE_STORE_DIR', cls._root)
+        cls._max_side = app.config.get('IMAGE_STORE_MAX_SIDE', cls._max_side)
+        cls._quality = app.config.get('IMAGE_STORE_QUALITY', cls._quality)
+    
+    @classmethod
+    def init_app(cls, app):
+        """Index stored photos and start the writer thread"""
+        cls.configure(app)
+        cls._index = cls._scan()
+        if cls._thread is None:
+            cls._queue = queue.Queue()
+            cls._thread = threading.Thread(target=cls._run, name='image-store-writer', daemon=True)
+            cls._thread.start()
+            atexit.register(cls.flush)
+        print(f"✅ Image store indexed: {len(cls._index)} photos")
+    
+    @classmethod
+    def _scan(cls):
+        """Paths of every photo under the store root (legacy flat files included)"""
+        thumbnails = os.path.join(cls._root, 'thumbnails')
+        paths = set()
+        for directory, subdirectories, files in os.walk(cls._root):
+            if directory == thumbnails:
+                subdirectories[:] = []
+                continue
+            paths.update(os.path.join(directory, name) for name in files if name.endswith('.jpg'))
+        return paths
+    
+    @classmethod
+    def content_path(cls, digest):
+        """Sharded path for a content hash"""
+        return os.path.join(cls._root, digest[:2], digest[2:4], f"{digest}.jpg")
+    
+    @classmethod
+    def encode(cls, face_image):
+        """
+        JPEG bytes to store: small JPEG uploads are kept as received, anything
+        else is re-encoded from the decoded pixels at IMAGE_STORE_QUALITY,
+        with the longest side capped at IMAGE_STORE_MAX_SIDE
+        """
+        if face_image.format == 'JPEG' and face_image.scale == 1 and max(face_image.rgb.shape[:2]) <= cls._max_side:
+            return face_image.data
+        image = Image.fromarray(face_image.rgb)
+        image.thumbnail((cls._max_side, cls._max_side))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=cls._quality)
+        return buffer.getvalue()
+    
+    @classmethod
+    def path_for(cls, data):
+        """Path the JPEG bytes will be stored at, known before storing them"""
+        return cls.content_path(hashlib.sha256(data).hexdigest())
+    
+    @classmethod
+    def store(cls, face_image):
+        """
+        Store a registration photo; the file is written in the background
+        Returns: (image_path, error_message)
+        """
+        try:
+            return cls.store_encoded(cls.encode(face_image))
+        except Exception as e:
+            return None, f"Lỗi lưu ảnh: {str(e)}"
+    
+    @classmethod
+    def store_encoded(cls, data):
+        """
+        Store JPEG bytes already produced by encode()
+        Returns: (image_path, error_message)
+        """
+        try:
+            image_path = cls.path_for(data)
+            with cls._lock:
+                if image_path in cls._index:
+                    cls._deduplicated += 1
+                    return image_path, None
+                cls._index.add(image_path)
+                cls._pending[image_path] = data
+            cls._queue.put(('write', image_path, data))
+            return image_path, None
+        
+        except Exception as e:
+            return None, f"Lỗi lưu ảnh: {str(e)}"
+    
+    @classmethod
+    def exists(cls, image_path):
+        """
+        Whether a photo is stored (or queued), answered from the index
+        Only index misses touch the disk, for photos stored by another process
+        """
+        if image_path in cls._index:
+            return True
+        if image_path and os.path.isfile(image_path):
+            with cls._lock:
+                cls._index.add(image_path)
+            return True
+        return False
+    
+    @classmethod
+    def open_image(cls, image_path):
+        """File object for a stored photo, served from memory while its write is queued"""
+        data = cls._pending.get(image_path)
+        return io.BytesIO(data) if data is not None else open(image_path, 'rb')
+    
+    @classmethod
+    def version(cls, image_path):
+        """
+        Cache version of a stored photo: the content hash for content-addressed
+        photos, the file mtime for legacy ones
+        Returns: version string or None when the photo is not stored
+        """
+        if not cls.exists(image_path):
+            return None
+        name = os.path.basename(image_path)
+        if CONTENT_NAME.match(name):
+            return name[:16]
+        try:
+            return str(os.stat(image_path).st_mtime_ns)
+        except OSError:
+            return None
+    
+    @classmethod
+    def delete(cls, image_path):
+        """Remove a photo from the index and delete its file in the background"""
+        if not cls.exists(image_path):
+            return False
+        with cls._lock:
+            cls._index.discard(image_path)
+        cls._queue.put(('delete', image_path, None))
+        return True
+    
+    @classmethod
+    def _run(cls):
+        """Writer loop: apply queued writes and deletes in order"""
+        while True:
+            operation, image_path, data = cls._queue.get()
+            try:
+                if operation == 'write':
+                    cls._write(image_path, data)
+                elif os.path.exists(image_path):
+                    os.remove(image_path)
+            except Exception as e:
+                print(f"❌ Image store {operation} failed for {image_path}: {str(e)}")
+            finally:
+                with cls._lock:
+                    if cls._pending.get(image_path) is data:
+                        cls._pending.pop(image_path, None)
+                cls._queue.task_done()
+    
+    @classmethod
+    def _write(cls, image_path, data):
+        """Durable atomic write: temp file, fsync, rename"""
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        temp_path = f"{image_path}.tmp"
+        with open(temp_path, 'wb') as image_file:
+            image_file.write(data)
+            image_file.flush()
+            os.fsync(image_file.fileno())
+        os.replace(temp_path, image_path)
+        cls._written += 1
+    
+    @classmethod
+    def flush(cls):
+        """Wait until every queued write and delete reached the disk"""
+        if cls._queue is not None:
+            cls._queue.join()
+    
+    @classmethod
+    def stats(cls):
+        """Store counters for the debug endpoint"""
+        return {
+            'indexed': len(cls._index),
+            'pending_writes': len(cls._pending),
+            'queued_operations': cls._queue.qsize() if cls._queue is not None else 0,
+            'written': cls._written,
+            'deduplicated': cls._deduplicated,
+        }
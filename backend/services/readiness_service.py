@@ -0,0 +1,105 @@
+"""
+Readiness service
+"""
+import threading
+import time
+from services.face_recognition_service import FaceRecognitionService
+from services.face_gallery_service import FaceGalleryService
+from services.recognition_executor_service import RecognitionExecutorService
+
+WARMUP_MODES = ('background', 'blocking', 'off')
+
+class ReadinessService:
+    """
+    Startup warm-up and the readiness state behind /ready
+    Warm-up imports the face models and runs a dummy detection and encoding,
+    waits for the recognition workers and builds the gallery, so the first
+    real check-in is as fast as later ones. In background mode the app serves
+    requests meanwhile and /ready answers 503 until warm-up succeeded.
+    """
+
+    _app = None
+    _mode = 'background'
+    _ready = False
+    _started_at = None
+    _warm_up_seconds = None
+    _steps = {}
+    _error = None
+    _thread = None
+    _retry_interval = 5.0
+
+    @classmethod
+    def init_app(cls, app):
+        """Warm up according to WARMUP_MODE: in a background thread, before returning, or not at all"""
+        cls._app = app
+        cls._mode = app.config.get('WARMUP_MODE', cls._mode)
+        if cls._mode not in WARMUP_MODES:
+            raise ValueError(f"WARMUP_MODE must be one of {', '.join(WARMUP_MODES)}")
+        cls._retry_interval = app.config.get('WARMUP_RETRY_INTERVAL', cls._retry_interval)
+        cls._started_at = time.time()
+
+        if cls._mode == 'off':
+            cls._ready = True
+        elif cls._mode == 'blocking':
+            cls.warm_up()
+        elif cls._thread is None:
+            cls._thread = threading.Thread(target=cls._run, name='warm-up', daemon=True)
+            cls._thread.start()
+
+    @classmethod
+    def _run(cls):
+        """Background warm-up, retried until it succeeds (e.g. once the database is reachable)"""
+        while not cls.warm_up():
+            time.sleep(cls._retry_interval)
+
+    @classmethod
+    def _load_gallery(cls):
+        """Build the face gallery unless it is loaded already"""
+        with cls._app.app_context():
+            FaceGalleryService.ensure_loaded()
+
+    @classmethod
+    def warm_up(cls):
+        """
+        Run every warm-up step and mark the app ready once all of them succeeded
+        Returns: whether the app is ready
+        """
+        steps = (
+            ('face_models', FaceRecognitionService.warm_up),
+            ('recognition_workers', RecognitionExecutorService.warm_up),
+            ('face_gallery', cls._load_gallery),
+        )
+        try:
+            for name, step in steps:
+                if name in cls._steps:
+                    continue
+                started = time.perf_counter()
+                step()
+                cls._steps = {**cls._steps, name: round(time.perf_counter() - started, 3)}
+        except Exception as e:
+            cls._error = f"{name}: {str(e)}"
+            print(f"❌ Warm-up failed at {name}: {str(e)}")
+            return False
+
+        cls._error = None
+        cls._warm_up_seconds = round(time.time() - cls._started_at, 3)
+        cls._ready = True
+        print(f"✅ Warm-up done in {cls._warm_up_seconds}s: {FaceGalleryService.size()} users in gallery")
+        return True
+
+    @classmethod
+    def is_ready(cls):
+        """Whether warm-up finished"""
+        return cls._ready
+
+    @classmethod
+    def status(cls):
+        """Readiness details for the /ready endpoint"""
+        return {
+            'ready': cls._ready,
+            'warmup_mode': cls._mode,
+            'steps': cls._steps,
+            'warm_up_seconds': cls._warm_up_seconds,
+            'uptime_seconds': round(time.time() - cls._started_at, 1) if cls._started_at else None,
+            'error': cls._error,
+        }
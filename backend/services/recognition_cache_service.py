@@ -0,0 +1,150 @@
+"""
+Recognition cache service
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+import numpy as np
+
+CachedCheckin = namedtuple('CachedCheckin', ['encoding', 'result', 'expires_at'])
+
+# Recently matched frames of one kiosk, compared with new faces before the gallery match
+RecentFrames = namedtuple('RecentFrames', ['user_ids', 'encodings', 'max_distance'])
+
+class RecognitionCacheService:
+    """
+    Short-lived per-kiosk/per-user cache of check-in results
+    A person standing in front of a kiosk triggers several check-ins within
+    seconds; frames close to the last matched frame reuse its result instead
+    of writing attendance again
+    """
+    
+    _entries = OrderedDict()
+    _lock = threading.Lock()
+    _ttl = 0.0
+    _max_size = 256
+    _max_distance = 0.35
+    _hits = 0
+    _misses = 0
+    _evictions = 0
+    
+    @classmethod
+    def init_app(cls, app):
+        """Read cache settings (RECOGNITION_CACHE_TTL = 0 disables the cache)"""
+        cls._ttl = app.config.get('RECOGNITION_CACHE_TTL', cls._ttl)
+        cls._max_size = app.config.get('RECOGNITION_CACHE_SIZE', cls._max_size)
+        cls._max_distance = app.config.get('RECOGNITION_CACHE_DISTANCE', cls._max_distance)
+        cls.clear()
+    
+    @classmethod
+    def enabled(cls):
+        """Whether results are cached at all"""
+        return cls._ttl > 0 and cls._max_size > 0
+    
+    @classmethod
+    def get(cls, kiosk_id, user_id, face_encoding):
+        """
+        Recent result for this kiosk and user when the new frame is close enough
+        Returns: cached result dict or None
+        """
+        if not cls.enabled() or face_encoding is None:
+            return None
+        
+        key = (kiosk_id, user_id)
+        now = time.monotonic()
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del cls._entries[key]
+                entry = None
+            
+            if entry is not None:
+                distance = np.linalg.norm(entry.encoding - np.asarray(face_encoding, dtype=entry.encoding.dtype))
+                if distance <= cls._max_distance:
+                    cls._entries.move_to_end(key)
+                    cls._hits += 1
+                    return entry.result
+            
+            cls._misses += 1
+            return None
+    
+    @classmethod
+    def recent_frames(cls, kiosk_id):
+        """
+        Unexpired cached frames of a kiosk, small enough to ship to a recognition worker
+        Returns: RecentFrames or None
+        """
+        if not cls.enabled():
+            return None
+        now = time.monotonic()
+        with cls._lock:
+            frames = [(key[1], entry.encoding) for key, entry in cls._entries.items()
+                      if key[0] == kiosk_id and entry.expires_at > now]
+        if not frames:
+            return None
+        return RecentFrames([user_id for user_id, _ in frames], np.vstack([encoding for _, encoding in frames]),
+                            cls._max_distance)
+    
+    @staticmethod
+    def match_recent(recent, face_encodings):
+        """
+        Closest recent frame of the kiosk within its max distance of any face
+        Returns: (user_id, distance, face_index) or (None, None, None)
+        """
+        if recent is None or len(face_encodings) == 0:
+            return None, None, None
+        faces = np.asarray(face_encodings, dtype=recent.encodings.dtype).reshape(len(face_encodings), -1)
+        distances = np.linalg.norm(faces[:, None, :] - recent.encodings[None, :, :], axis=2)
+        face_index, frame_index = np.unravel_index(np.argmin(distances), distances.shape)
+        distance = float(distances[face_index, frame_index])
+        if distance > recent.max_distance:
+            return None, None, None
+        return recent.user_ids[frame_index], distance, int(face_index)
+    
+    @classmethod
+    def put(cls, kiosk_id, user_id, face_encoding, result):
+        """Remember the result of a written check-in, evicting the least recently used entries"""
+        if not cls.enabled() or face_encoding is None:
+            return
+        
+        key = (kiosk_id, user_id)
+        entry = CachedCheckin(np.asarray(face_encoding, dtype=np.float32), result, time.monotonic() + cls._ttl)
+        with cls._lock:
+            cls._entries[key] = entry
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > cls._max_size:
+                cls._entries.popitem(last=False)
+                cls._evictions += 1
+    
+    @classmethod
+    def invalidate_user(cls, user_id):
+        """Drop every cached result of a user (e.g. after the user was deleted)"""
+        with cls._lock:
+            for key in [key for key in cls._entries if key[1] == user_id]:
+                del cls._entries[key]
+    
+    @classmethod
+    def clear(cls):
+        """Drop every cached result and reset the counters"""
+        with cls._lock:
+            cls._entries.clear()
+            cls._hits = 0
+            cls._misses = 0
+            cls._evictions = 0
+    
+    @classmethod
+    def stats(cls):
+        """Cache counters for the debug endpoint"""
+        with cls._lock:
+            lookups = cls._hits + cls._misses
+            return {
+                'enabled': cls.enabled(),
+                'ttl_seconds': cls._ttl,
+                'max_size': cls._max_size,
+                'max_distance': cls._max_distance,
+                'size': len(cls._entries),
+                'hits': cls._hits,
+                'misses': cls._misses,
+                'evictions': cls._evictions,
+                'hit_rate': round(cls._hits / lookups, 4) if lookups else None,
+            }
@@ -0,0 +1,242 @@
+"""
+Recognition executor service
+"""
+import atexit
+import multiprocessing
+import threading
+import time
+from concurrent.futures import (
+    ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait, FIRST_COMPLETED
+)
+from services.face_gallery_service import FaceGalleryService
+from services.face_recognition_service import FaceRecognitionService
+from services.image_store_service import ImageStoreService
+from services.thumbnail_service import ThumbnailService
+from utils.metrics import STAGE_SECONDS, capture, replay
+
+# Config keys forwarded to worker processes
+WORKER_CONFIG_PREFIXES = ('SQLALCHEMY_', 'FACE_', 'IMAGE_STORE_', 'THUMBNAIL_')
+
+class RecognitionBusyError(Exception):
+    """Raised when the recognition pool is saturated or a request timed out"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+# Worker process state (set by _init_worker)
+_worker_app = None
+_worker_gallery_version = None
+
+def _init_worker(worker_config, gallery_version, gallery=True):
+    """
+    Load dlib models, warm them up and build (or map) the gallery once per
+    worker process (gallery=False for encode-only pools)
+    """
+    global _worker_app, _worker_gallery_version
+    from flask import Flask
+    from config.database import init_db
+
+    _worker_app = Flask('recognition_worker')
+    _worker_app.config.update(worker_config)
+    init_db(_worker_app)
+    FaceRecognitionService.init_app(_worker_app)
+    FaceRecognitionService.warm_up()
+    # Photo settings for batch encoders that also prepare the stored JPEG and thumbnail
+    ImageStoreService.configure(_worker_app)
+    ThumbnailService.init_app(_worker_app)
+    FaceGalleryService.init_app(_worker_app, refresher=False, load=gallery)
+    _worker_gallery_version = gallery_version
+
+def _recognize_in_worker(image_bytes, face_box, face_crop, face_margin, recent, gallery_version):
+    """
+    Recognize one frame inside a worker process
+    Returns: (user_id, confidence, error_message, face_encoding, captured metrics)
+    """
+    global _worker_gallery_version
+    # The parent's gallery changed since this worker last loaded it: apply the delta
+    if gallery_version != _worker_gallery_version:
+        with _worker_app.app_context():
+            FaceGalleryService.refresh()
+        _worker_gallery_version = gallery_version
+
+    with capture() as metrics:
+        found_user, confidence, error, face_encoding = FaceRecognitionService.identify_face(
+            image_bytes, face_box=face_box, face_crop=face_crop, face_margin=face_margin, recent=recent
+        )
+    return (found_user.id if found_user else None), confidence, error, face_encoding, metrics
+
+def _encode_in_worker(encode, image_bytes):
+    """
+    Run a batch encoder on one image inside a worker process
+    Returns: (encoder result, captured metrics)
+    """
+    with capture() as metrics:
+        result = encode(image_bytes)
+    return result, metrics
+
+class RecognitionExecutorService:
+    """Pre-warmed process pool for CPU-bound face detection and encoding"""
+
+    _executor = None
+    _threads = None  # batch encoding threads when the process pool is disabled
+    _workers = 0
+    _spawning = []
+    _slots = None
+    _timeout = 10.0
+    _retry_after = 1
+
+    @classmethod
+    def init_app(cls, app, gallery=True):
+        """
+        Start the worker pool when RECOGNITION_WORKERS > 0, otherwise the batch
+        encoding threads; gallery=False skips loading the gallery in workers
+        that only encode (bulk import)
+        """
+        workers = app.config.get('RECOGNITION_WORKERS', 0)
+        if workers <= 0:
+            threads = app.config.get('RECOGNITION_BATCH_THREADS', 4)
+            if threads > 1 and cls._threads is None:
+                cls._threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='batch-encode')
+            return
+        if cls._executor is not None:
+            return
+
+        cls._workers = workers
+        cls._timeout = app.config.get('RECOGNITION_TIMEOUT', cls._timeout)
+        cls._retry_after = app.config.get('RECOGNITION_RETRY_AFTER', cls._retry_after)
+        # Requests running plus requests waiting for a worker
+        cls._slots = threading.BoundedSemaphore(workers + app.config.get('RECOGNITION_QUEUE_SIZE', workers))
+
+        worker_config = {key: value for key, value in app.config.items() if key.startswith(WORKER_CONFIG_PREFIXES)}
+        cls._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(worker_config, FaceGalleryService.version(), gallery),
+        )
+        # Spawn every worker now so models load before traffic arrives; warm_up() waits for them
+        cls._spawning = [cls._executor.submit(int, 0) for _ in range(workers)]
+        atexit.register(cls.shutdown)
+        print(f"✅ Recognition pool starting: {workers} workers")
+
+    @classmethod
+    def warm_up(cls):
+        """Wait until every worker process has loaded and warmed up its models"""
+        for future in cls._spawning:
+            future.result()
+        cls._spawning = []
+
+    @classmethod
+    def shutdown(cls):
+        """Stop the worker pool"""
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+
+    @classmethod
+    def recognize(cls, image_bytes, face_box=None, face_crop=False, face_margin=0.2, recent=None):
+        """
+        Recognize a frame in the pool, or inline when the pool is disabled
+        recent: the kiosk's RecentFrames, matched before the gallery
+        Raises RecognitionBusyError when saturated or on timeout
+        Returns: (found_user, confidence, error_message, face_encoding)
+        """
+        if cls._executor is None:
+            return FaceRecognitionService.identify_face(
+                image_bytes, face_box=face_box, face_crop=face_crop, face_margin=face_margin, recent=recent
+            )
+
+        if not cls._slots.acquire(blocking=False):
+            raise RecognitionBusyError('Hệ thống đang bận, vui lòng thử lại!', cls._retry_after)
+        try:
+            future = cls._executor.submit(
+                _recognize_in_worker, image_bytes, face_box, face_crop, face_margin, recent,
+                FaceGalleryService.version()
+            )
+        except Exception:
+            cls._slots.release()
+            raise
+        # The slot is held until the worker really finishes, even after a timeout
+        future.add_done_callback(lambda _: cls._slots.release())
+
+        try:
+            with STAGE_SECONDS.time(stage='recognition_pool'):
+                user_id, confidence, error, face_encoding, metrics = future.result(timeout=cls._timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise RecognitionBusyError('Nhận diện quá thời gian, vui lòng thử lại!', cls._retry_after)
+        # Stage timings recorded inside the worker
+        replay(metrics)
+
+        found_user = FaceGalleryService.get_entry(user_id) if user_id is not None else None
+        if user_id is not None and found_user is None:
+            return None, 0, "Không nhận diện được khuôn mặt! Vui lòng đăng ký trước.", None
+        return found_user, confidence, error, face_encoding
+
+    @classmethod
+    def _acquire_slots(cls, count):
+        """Take `count` queue slots at once or none of them (raises RecognitionBusyError)"""
+        acquired = 0
+        while acquired < count and cls._slots.acquire(blocking=False):
+            acquired += 1
+        if acquired < count:
+            for _ in range(acquired):
+                cls._slots.release()
+            raise RecognitionBusyError('Hệ thống đang bận, vui lòng thử lại!', cls._retry_after)
+
+    @classmethod
+    def encode_batch(cls, images, encode=FaceRecognitionService.encode_image_faces):
+        """
+        Encode the faces of many images in parallel: over the process pool when it
+        is enabled, else over the batch threads (image decoding runs in parallel,
+        detection and encoding as far as dlib releases the GIL)
+        encode: picklable function of the image bytes, encode_image_faces by default
+        Raises RecognitionBusyError when saturated or on timeout
+        Returns: list of encode results, by default (face_encodings, error_message), in input order
+        """
+        if cls._executor is None:
+            if cls._threads is None or len(images) < 2:
+                return [encode(image_bytes) for image_bytes in images]
+            return list(cls._threads.map(encode, images))
+
+        slot_count = min(len(images), cls._workers)
+        cls._acquire_slots(slot_count)
+        return cls._encode_in_pool(images, slot_count, encode)
+
+    @classmethod
+    def _encode_in_pool(cls, images, slot_count, encode):
+        """
+        Encode images in the pool with at most slot_count submitted at a time, so a
+        batch is charged one queue slot per running image like single recognitions
+        """
+        results = [None] * len(images)
+        waiting = list(enumerate(images))[::-1]
+        running = {}
+        deadline = time.monotonic() + cls._timeout * max(1, len(images) / cls._workers)
+        try:
+            while waiting or running:
+                while waiting and len(running) < slot_count:
+                    index, image_bytes = waiting.pop()
+                    running[cls._executor.submit(_encode_in_worker, encode, image_bytes)] = index
+                done, _ = wait(running, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    raise RecognitionBusyError('Nhận diện quá thời gian, vui lòng thử lại!', cls._retry_after)
+                for future in done:
+                    result, metrics = future.result()
+                    replay(metrics)
+                    results[running.pop(future)] = result
+            return results
+        finally:
+            cls._release_batch_slots(running, slot_count)
+
+    @classmethod
+    def _release_batch_slots(cls, running, slot_count):
+        """Free a batch's slots; images still running in a worker keep theirs until it finishes"""
+        held = 0
+        for future in running:
+            if not future.cancel():
+                held += 1
+                future.add_done_callback(lambda _: cls._slots.release())
+        for _ in range(slot_count - held):
+            cls._slots.release()
@@ -0,0 +1,177 @@
+"""
+Thumbnail service
+"""
+import base64
+import glob
+import io
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from PIL import Image, ImageOps
+from services.image_store_service import ImageStoreService
+
+Thumbnail = namedtuple('Thumbnail', ['data', 'version'])
+
+class ThumbnailService:
+    """
+    Small JPEG thumbnails of registration photos for check-in responses
+    Thumbnails are written at registration (or lazily on first use), named by
+    photo version (content hash, or mtime for legacy photos), and held in a
+    byte-bounded LRU keyed by (user_id, version), so a replaced photo never
+    serves a stale thumbnail
+    """
+    
+    _cache = OrderedDict()
+    _cache_bytes = 0
+    _lock = threading.Lock()
+    _max_bytes = 16 * 1024 * 1024
+    _size = 160
+    _quality = 80
+    _directory = os.path.join('face_images', 'thumbnails')
+    _hits = 0
+    _misses = 0
+    
+    @classmethod
+    def init_app(cls, app):
+        """Read thumbnail settings"""
+        cls._max_bytes = app.config.get('THUMBNAIL_CACHE_BYTES', cls._max_bytes)
+        cls._size = app.config.get('THUMBNAIL_SIZE', cls._size)
+        cls._quality = app.config.get('THUMBNAIL_QUALITY', cls._quality)
+        cls._directory = app.config.get('THUMBNAIL_DIR', cls._directory)
+    
+    @classmethod
+    def thumbnail_path(cls, image_path, version):
+        """Thumbnail file for one version of a registration photo"""
+        stem = os.path.splitext(os.path.basename(image_path))[0]
+        return os.path.join(cls._directory, stem[:2], f"{stem}-{version}.jpg")
+    
+    @classmethod
+    def _render(cls, image):
+        """Shrink a PIL image to a JPEG thumbnail"""
+        image = image.convert('RGB')
+        image.thumbnail((cls._size, cls._size))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=cls._quality, optimize=True)
+        return buffer.getvalue()
+    
+    @classmethod
+    def _write(cls, path, data):
+        """Write a thumbnail file atomically"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp{threading.get_ident()}"
+        with open(temp_path, 'wb') as thumbnail_file:
+            thumbnail_file.write(data)
+        os.replace(temp_path, path)
+    
+    @classmethod
+    def render_rgb(cls, image_rgb):
+        """Thumbnail JPEG bytes of already decoded pixels"""
+        return cls._render(Image.fromarray(image_rgb))
+    
+    @classmethod
+    def create_from_rgb(cls, image_rgb, image_path):
+        """Precompute the thumbnail at registration from already decoded pixels"""
+        cls.save(image_path, lambda: cls.render_rgb(image_rgb))
+    
+    @classmethod
+    def save(cls, image_path, render):
+        """Write the thumbnail of a stored photo unless present; render() returns its bytes"""
+        try:
+            version = ImageStoreService.version(image_path)
+            if version and not os.path.exists(cls.thumbnail_path(image_path, version)):
+                cls._write(cls.thumbnail_path(image_path, version), render())
+        except Exception as e:
+            print(f"Error creating thumbnail for {image_path}: {e}")
+    
+    @classmethod
+    def _load(cls, image_path, version):
+        """Thumbnail bytes from disk, generated from the photo when missing"""
+        path = cls.thumbnail_path(image_path, version)
+        try:
+            with open(path, 'rb') as thumbnail_file:
+                return thumbnail_file.read()
+        except FileNotFoundError:
+            pass
+        
+        # PIL leaves caller-supplied file objects open, so close the photo file here
+        with ImageStoreService.open_image(image_path) as photo_file, Image.open(photo_file) as image:
+            image.draft('RGB', (cls._size * 2, cls._size * 2))
+            data = cls._render(ImageOps.exif_transpose(image))
+        cls._write(path, data)
+        return data
+    
+    @classmethod
+    def get_thumbnail(cls, user_id, image_path):
+        """
+        Thumbnail of a user's registration photo
+        Returns: Thumbnail(data, version) or None when the photo is missing
+        """
+        version = ImageStoreService.version(image_path) if image_path else None
+        if version is None:
+            return None
+        
+        key = (user_id, version)
+        with cls._lock:
+            thumbnail = cls._cache.get(key)
+            if thumbnail is not None:
+                cls._cache.move_to_end(key)
+                cls._hits += 1
+                return thumbnail
+            cls._misses += 1
+        
+        try:
+            data = cls._load(image_path, version)
+        except Exception as e:
+            print(f"Error reading thumbnail for {image_path}: {e}")
+            return None
+        
+        thumbnail = Thumbnail(data, f"{user_id}-{version}")
+        cls._store(key, thumbnail)
+        return thumbnail
+    
+    @classmethod
+    def _store(cls, key, thumbnail):
+        """Insert into the LRU, evicting least recently used thumbnails over the byte budget"""
+        if len(thumbnail.data) > cls._max_bytes:
+            return
+        with cls._lock:
+            previous = cls._cache.pop(key, None)
+            if previous is not None:
+                cls._cache_bytes -= len(previous.data)
+            cls._cache[key] = thumbnail
+            cls._cache_bytes += len(thumbnail.data)
+            while cls._cache_bytes > cls._max_bytes:
+                _, evicted = cls._cache.popitem(last=False)
+                cls._cache_bytes -= len(evicted.data)
+    
+    @classmethod
+    def get_thumbnail_base64(cls, user_id, image_path):
+        """Thumbnail as a base64 string for inline JSON responses"""
+        thumbnail = cls.get_thumbnail(user_id, image_path)
+        return base64.b64encode(thumbnail.data).decode('utf-8') if thumbnail else None
+    
+    @classmethod
+    def invalidate_user(cls, user_id):
+        """Drop a user's cached thumbnails"""
+        with cls._lock:
+            for key in [key for key in cls._cache if key[0] == user_id]:
+                cls._cache_bytes -= len(cls._cache.pop(key).data)
+    
+    @classmethod
+    def delete_files(cls, image_path):
+        """Delete every thumbnail file of a photo that is no longer stored"""
+        stem = os.path.splitext(os.path.basename(image_path))[0]
+        for path in glob.glob(os.path.join(cls._directory, stem[:2], f"{glob.escape(stem)}-*.jpg")):
+            os.remove(path)
+    
+    @classmethod
+    def stats(cls):
+        """Cache counters for the debug endpoint"""
+        with cls._lock:
+            return {
+                'entries': len(cls._cache),
+                'bytes': cls._cache_bytes,
+                'max_bytes': cls._max_bytes,
+                'hits': cls._hits,
+                'misses': cls._misses,
+            }
@@ -0,0 +1,277 @@
+"""
+User bulk import service
+"""
+import csv
+import io
+import os
+import zipfile
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import undefer
+from models import User
+from config.database import db
+from services.face_recognition_service import FaceRecognitionService
+from services.face_gallery_service import FaceGalleryService
+from services.recognition_executor_service import RecognitionExecutorService, RecognitionBusyError
+from services.image_store_service import ImageStoreService
+from services.thumbnail_service import ThumbnailService
+from utils.helpers import pack_face_encoding
+
+ROSTER_REQUIRED_COLUMNS = ('name', 'email', 'employee_id')
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+# Stored JPEG bytes and thumbnail of a roster photo, built from its single decode
+PreparedPhoto = namedtuple('PreparedPhoto', ['data', 'thumbnail'])
+
+class PhotoSource:
+    """
+    Photos of a directory or zip archive looked up by file name
+    Names are matched case-insensitively on the base name, so archives with
+    nested folders work and roster entries can never reach outside the source
+    """
+    
+    def __init__(self, path_or_file, max_bytes=10 * 1024 * 1024):
+        self._max_bytes = max_bytes
+        self._zip = None
+        if isinstance(path_or_file, str) and os.path.isdir(path_or_file):
+            self._index = {
+                name.lower(): os.path.join(directory, name)
+                for directory, _, files in os.walk(path_or_file) for name in files
+            }
+        else:
+            self._zip = zipfile.ZipFile(path_or_file)
+            self._index = {
+                os.path.basename(info.filename).lower(): info
+                for info in self._zip.infolist() if not info.is_dir()
+            }
+    
+    def find(self, photo_name, employee_id):
+        """Index key of the roster photo, or of <employee_id>.<ext> when no photo is given"""
+        if photo_name:
+            key = os.path.basename(photo_name.replace('\\', '/')).lower()
+            return key if key in self._index else None
+        for extension in PHOTO_EXTENSIONS:
+            key = f'{employee_id}{extension}'.lower()
+            if key in self._index:
+                return key
+        return None
+    
+    def read(self, key):
+        """
+        Bytes of an indexed photo
+        Raises ValueError when the photo is larger than max_bytes
+        """
+        entry = self._index[key]
+        size = entry.file_size if self._zip else os.path.getsize(entry)
+        if size > self._max_bytes:
+            raise ValueError(f'Ảnh quá lớn ({size // 1024} KB)')
+        if self._zip:
+            return self._zip.read(entry)
+        with open(entry, 'rb') as photo_file:
+            return photo_file.read()
+    
+    def close(self):
+        """Close the archive"""
+        if self._zip:
+            self._zip.close()
+
+class UserImportService:
+    """
+    Bulk enrollment from a roster CSV plus a photo directory or zip
+    Duplicates are checked with one set-based query, faces are encoded in
+    chunks across the recognition process pool, and each chunk is inserted
+    with one batched INSERT and added to the gallery in one swap
+    """
+    
+    @staticmethod
+    def read_roster(roster_text):
+        """
+        Parse a roster CSV (name, email, employee_id, optional department and photo)
+        Returns: (list of row dicts, error_message)
+        """
+        reader = csv.DictReader(io.StringIO(roster_text.lstrip('\ufeff')))
+        columns = {(column or '').strip().lower() for column in reader.fieldnames or []}
+        missing = [column for column in ROSTER_REQUIRED_COLUMNS if column not in columns]
+        if missing:
+            return None, f"Thiếu cột trong danh sách: {', '.join(missing)}"
+        rows = []
+        for row in reader:
+            row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items() if key}
+            if any(row.values()):
+                rows.append(row)
+        return rows, None
+    
+    @staticmethod
+    def _existing_keys(rows):
+        """Emails and employee IDs of the roster already taken, from one query"""
+        emails = {row['email'] for row in rows if row.get('email')}
+        employee_ids = {row['employee_id'] for row in rows if row.get('employee_id')}
+        if not emails and not employee_ids:
+            return set(), set()
+        taken = db.session.query(User.email, User.employee_id).filter(
+            or_(User.email.in_(emails), User.employee_id.in_(employee_ids))
+        ).all()
+        return {row.email for row in taken}, {row.employee_id for row in taken}
+    
+    @staticmethod
+    def _validate(rows):
+        """
+        Per-row report entries, with an error for incomplete rows and for emails
+        or employee IDs that are taken or repeated in the roster
+        """
+        taken_emails, taken_employee_ids = UserImportService._existing_keys(rows)
+        seen_emails = set()
+        seen_employee_ids = set()
+        report = []
+        for index, row in enumerate(rows, start=1):
+            entry = {'row': index, 'employee_id': row.get('employee_id'), 'email': row.get('email'), 'success': False}
+            if not all(row.get(column) for column in ROSTER_REQUIRED_COLUMNS):
+                entry['message'] = 'Vui lòng điền đầy đủ thông tin!'
+            elif row['email'] in taken_emails:
+                entry['message'] = 'Email đã được sử dụng!'
+            elif row['employee_id'] in taken_employee_ids:
+                entry['message'] = 'Mã sinh viên đã được sử dụng!'
+            elif row['email'] in seen_emails or row['employee_id'] in seen_employee_ids:
+                entry['message'] = 'Trùng email hoặc mã sinh viên trong danh sách!'
+            seen_emails.add(row.get('email'))
+            seen_employee_ids.add(row.get('employee_id'))
+            report.append(entry)
+        return report
+    
+    @staticmethod
+    def import_users(rows, photos, chunk_size=64):
+        """
+        Enroll every valid roster row
+        rows: dicts from read_roster; photos: PhotoSource
+        Returns: per-row report (success, message, user_id)
+        """
+        report = UserImportService._validate(rows)
+        pending = [index for index, entry in enumerate(report) if 'message' not in entry]
+        for start in range(0, len(pending), chunk_size):
+            UserImportService._import_chunk(rows, report, pending[start:start + chunk_size], photos)
+        return report
+    
+    @staticmethod
+    def _import_chunk(rows, report, indexes, photos):
+        """Encode, store and insert one chunk of validated roster rows"""
+        images = UserImportService._read_photos(rows, report, indexes, photos)
+        
+        # Detect and encode every photo of the chunk across the process pool
+        encodable = list(images)
+        try:
+            encoded = RecognitionExecutorService.encode_batch(
+                [images[index] for index in encodable], UserImportService.encode_photo
+            )
+        except RecognitionBusyError as busy:
+            for index in encodable:
+                report[index]['message'] = str(busy)
+            return
+        
+        params = UserImportService._user_params(rows, report, zip(encodable, encoded))
+        inserted = UserImportService._insert_users(params, report)
+        if not inserted:
+            return
+        users = User.query.options(undefer(User.face_encoding)).filter(User.employee_id.in_([param['employee_id'] for param in inserted])).all()
+        user_ids = {user.employee_id: user.id for user in users}
+        for param in inserted:
+            # Photos are stored once their user row is committed, so rejected rows leave no files
+            ImageStoreService.store_encoded(param['_photo'].data)
+            ThumbnailService.save(param['image_path'], lambda: param['_photo'].thumbnail)
+            report[param['_index']].update({
+                'success': True,
+                'message': 'Đăng ký thành công!',
+                'user_id': user_ids.get(param['employee_id'])
+            })
+        FaceGalleryService.add_users(users)
+    
+    @staticmethod
+    def encode_photo(image_bytes):
+        """
+        Decode a roster photo once, encode its faces and build the JPEG to store
+        and its thumbnail from the same pixels (runs in a recognition worker)
+        Returns: (face_encodings, error_message, PreparedPhoto or None)
+        """
+        try:
+            face_image = FaceRecognitionService.load_image(image_bytes)
+            _, face_encodings = FaceRecognitionService.detect_and_encode(face_image)
+            if len(face_encodings) == 0:
+                return [], 'Không tìm thấy khuôn mặt trong ảnh!', None
+            photo = PreparedPhoto(ImageStoreService.encode(face_image), ThumbnailService.render_rgb(face_image.rgb))
+            return face_encodings, None, photo
+        except Exception as e:
+            return [], f"Lỗi xử lý ảnh: {str(e)}", None
+    
+    @staticmethod
+    def _read_photos(rows, report, indexes, photos):
+        """Photo bytes of the chunk's rows by roster index; missing photos are reported"""
+        images = {}
+        for index in indexes:
+            row = rows[index]
+            key = photos.find(row.get('photo'), row['employee_id'])
+            if key is None:
+                report[index]['message'] = 'Không tìm thấy ảnh!'
+                continue
+            try:
+                images[index] = photos.read(key)
+            except Exception as e:
+                report[index]['message'] = f"Lỗi đọc ảnh: {str(e)}"
+        return images
+    
+    @staticmethod
+    def _user_params(rows, report, encoded):
+        """
+        Insert params of encoded rows; their prepared photos are kept under '_photo'
+        encoded: (roster index, encode_photo result) pairs
+        Returns: insert params of the users to create, with their roster '_index'
+        """
+        now = datetime.utcnow()
+        params = []
+        for index, (encodings, error, photo) in encoded:
+            if error or not encodings:
+                report[index]['message'] = error or 'Không tìm thấy khuôn mặt trong ảnh!'
+                continue
+            row = rows[index]
+            params.append({
+                'name': row['name'],
+                'email': row['email'],
+                'employee_id': row['employee_id'],
+                'department': row.get('department') or None,
+                'face_encoding': pack_face_encoding(encodings[0]),
+                'image_path': ImageStoreService.path_for(photo.data),
+                'created_at': now,
+                'updated_at': now,
+                '_index': index,
+                '_photo': photo,
+            })
+        return params
+    
+    @staticmethod
+    def _insert_users(params, report):
+        """
+        Insert a chunk of users with one executemany INSERT; if a concurrent
+        registration took an email or employee ID meanwhile, fall back to
+        row-by-row inserts to report which rows clash
+        Returns: the params that were inserted
+        """
+        if not params:
+            return []
+        columns = [{key: value for key, value in param.items() if not key.startswith('_')} for param in params]
+        try:
+            db.session.execute(insert(User), columns)
+            db.session.commit()
+            return params
+        except IntegrityError:
+            db.session.rollback()
+        
+        inserted = []
+        for param, values in zip(params, columns):
+            try:
+                db.session.execute(insert(User), [values])
+                db.session.commit()
+                inserted.append(param)
+            except IntegrityError:
+                db.session.rollback()
+                report[param['_index']]['message'] = 'Email hoặc mã sinh viên đã được sử dụng!'
+        return inserted
@@ -1,19 +1,37 @@
 """
 User service
 """
-from models import User
+import time
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.orm import undefer
+from models import User, FaceTemplate
 from config.database import db
 from services.face_recognition_service import FaceRecognitionService
-import os
-import numpy as np
+from services.face_gallery_service import FaceGalleryService
+from services.recognition_cache_service import RecognitionCacheService
+from services.thumbnail_service import ThumbnailService
+from services.image_store_service import ImageStoreService
+from services.attendance_summary_service import AttendanceSummaryService
+from utils.helpers import pack_face_encoding, unpack_face_encoding, is_packed_face_encoding
+
+# Listing row without the face encoding or ORM state
+UserSummary = namedtuple('UserSummary', ['id', 'name', 'email', 'employee_id', 'department', 'created_at'])
+USER_SUMMARY_COLUMNS = (User.id, User.name, User.email, User.employee_id, User.department, User.created_at)
 
 class UserService:
     """Service for user operations"""
     
+    # When each user last got a check-in template in this process (monotonic seconds)
+    _learned_at = {}
+    
     @staticmethod
-    def create_user(name, email, employee_id, image_data):
+    def create_user(name, email, employee_id, image_bytes, extra_images=None, department=None):
         """
         Create a new user with face recognition data
+        The uploaded image is decoded once and reused for encoding and saving;
+        optional extra images (other angles, glasses...) become additional templates
         Returns: (user, error_message)
         """
         try:
@@ -24,40 +42,220 @@ class UserService:
             if User.query.filter_by(employee_id=employee_id).first():
                 return None, 'Mã sinh viên đã được sử dụng!'
             
-            # Process face image
-            face_encoding, face_error = FaceRecognitionService.encode_face_from_base64(image_data)
+            face_image, face_encoding, face_error = UserService._encode_registration_image(image_bytes)
             if face_error:
                 return None, face_error
             
-            # Save image
-            image_path, image_error = FaceRecognitionService.save_face_image(image_data, employee_id)
-            if image_error:
-                return None, image_error
+            # Encode extra registration images before anything is written
+            extra_encodings, extra_error = UserService._encode_extra_images(extra_images or [])
+            if extra_error:
+                return None, extra_error
             
-            # Convert face encoding to string
-            face_encoding_str = ','.join(map(str, face_encoding))
+            # Content-addressed path, known before the photo is stored
+            photo = ImageStoreService.encode(face_image)
+            image_path = ImageStoreService.path_for(photo)
             
             # Create new user
             new_user = User(
                 name=name,
                 email=email,
                 employee_id=employee_id,
-                face_encoding=face_encoding_str,
+                department=department or None,
+                face_encoding=pack_face_encoding(face_encoding),
                 image_path=image_path
             )
             
             db.session.add(new_user)
+            for encoding in extra_encodings:
+                new_user.face_templates.append(
+                    FaceTemplate(encoding=pack_face_encoding(encoding), source='registration')
+                )
             db.session.commit()
             
+            # Store the photo once a committed user references it: failed registrations
+            # leave no orphan file, and a concurrent delete_user of another user with the
+            # same photo either sees this reference or has its delete queued before this write
+            UserService._store_registration_photo(photo, image_path, face_image)
+            FaceGalleryService.upsert_user(new_user)
+            
             return new_user, None
             
         except Exception as e:
+            db.session.rollback()
             return None, f'Có lỗi xảy ra: {str(e)}'
     
+    @staticmethod
+    def _encode_registration_image(image_bytes):
+        """
+        Decode the registration photo once and encode its face
+        Returns: (FaceImage, face_encoding, error_message)
+        """
+        # Decode image once
+        try:
+            face_image = FaceRecognitionService.load_image(image_bytes)
+        except Exception as e:
+            return None, None, f"Lỗi xử lý ảnh: {str(e)}"
+        
+        # Process face image
+        face_encoding, face_error = FaceRecognitionService.encode_face(face_image)
+        if face_error:
+            return None, None, face_error
+        return face_image, face_encoding, None
+    
+    @staticmethod
+    def _store_registration_photo(photo, image_path, face_image):
+        """Queue the photo write (content-addressed, in the background) and render its thumbnail"""
+        _, image_error = ImageStoreService.store_encoded(photo)
+        if image_error:
+            print(f"❌ {image_error} ({image_path})")
+            return
+        ThumbnailService.create_from_rgb(face_image.rgb, image_path)
+    
+    @staticmethod
+    def _encode_extra_images(extra_images):
+        """
+        Encode additional registration images, capped by FACE_MAX_TEMPLATES_PER_USER
+        Returns: (list of encodings, error_message)
+        """
+        max_extra = current_app.config.get('FACE_MAX_TEMPLATES_PER_USER', 5) - 1
+        if len(extra_images) > max_extra:
+            return None, f'Tối đa {max_extra} ảnh bổ sung!'
+        
+        encodings = []
+        for index, image_bytes in enumerate(extra_images, start=1):
+            if not image_bytes:
+                return None, f'Ảnh bổ sung {index} không hợp lệ!'
+            try:
+                face_image = FaceRecognitionService.load_image(image_bytes)
+            except Exception as e:
+                return None, f"Lỗi xử lý ảnh bổ sung {index}: {str(e)}"
+            encoding, error = FaceRecognitionService.encode_face(face_image)
+            if error:
+                return None, f'Ảnh bổ sung {index}: {error}'
+            encodings.append(encoding)
+        return encodings, None
+    
+    @staticmethod
+    def _should_learn_template(user_id, face_encoding, confidence):
+        """
+        In-memory gates before any database work: confident match, no template
+        learnt for this user within FACE_TEMPLATE_LEARN_INTERVAL, and not a
+        near-duplicate of a stored template
+        """
+        config = current_app.config
+        if 1 - confidence / 100 > config.get('FACE_TEMPLATE_LEARN_DISTANCE', 0.4):
+            return False
+        
+        interval = config.get('FACE_TEMPLATE_LEARN_INTERVAL', 3600)
+        learned_at = UserService._learned_at.get(user_id)
+        if learned_at is not None and time.monotonic() - learned_at < interval:
+            return False
+        
+        distances = FaceGalleryService.template_distances(user_id, face_encoding)
+        if distances is None or (len(distances) and distances.min() < config.get('FACE_TEMPLATE_MIN_NOVELTY', 0.15)):
+            return False
+        UserService._learned_at[user_id] = time.monotonic()
+        return True
+    
+    @staticmethod
+    def _drop_oldest_templates(user_id):
+        """
+        Make room for one more check-in template by deleting the oldest ones
+        Returns: number of templates deleted, or None when the user has no room
+        """
+        templates = FaceTemplate.query.filter_by(user_id=user_id).order_by(FaceTemplate.created_at, FaceTemplate.id).all()
+        checkin_templates = [template for template in templates if template.source == 'checkin']
+        excess = len(templates) + 1 - (current_app.config.get('FACE_MAX_TEMPLATES_PER_USER', 5) - 1)
+        if excess > len(checkin_templates):
+            return None
+        for template in checkin_templates[:max(0, excess)]:
+            db.session.delete(template)
+        return max(0, excess)
+    
+    @staticmethod
+    def learn_face_template(user_id, face_encoding, confidence):
+        """
+        Keep a confidently matched check-in frame as an extra template
+        Only frames that are close to the user (FACE_TEMPLATE_LEARN_DISTANCE) but
+        not near-duplicates of a stored template (FACE_TEMPLATE_MIN_NOVELTY) are
+        kept, at most one per user every FACE_TEMPLATE_LEARN_INTERVAL seconds;
+        the oldest check-in template is dropped when the user is at the cap
+        Not done in edge mode, where templates are pulled from the central database
+        Returns: (template, error_message)
+        """
+        if face_encoding is None or current_app.config.get('EDGE_MODE'):
+            return None, None
+        try:
+            if not UserService._should_learn_template(user_id, face_encoding, confidence):
+                return None, None
+            
+            dropped = UserService._drop_oldest_templates(user_id)
+            if dropped is None:
+                return None, None
+            template = FaceTemplate(user_id=user_id, encoding=pack_face_encoding(face_encoding), source='checkin')
+            db.session.add(template)
+            db.session.commit()
+            
+            if dropped:
+                FaceGalleryService.upsert_user(User.query.get(user_id))
+            else:
+                FaceGalleryService.add_template(user_id, face_encoding)
+            return template, None
+            
+        except Exception as e:
+            db.session.rollback()
+            return None, f"Error learning face template: {str(e)}"
+    
+    @staticmethod
+    def get_user_thumbnail(user_id):
+        """
+        Thumbnail of a user's registration photo, located through the gallery when possible
+        Returns: Thumbnail or None
+        """
+        user = FaceGalleryService.get_entry(user_id) or User.query.get(user_id)
+        if not user:
+            return None
+        return ThumbnailService.get_thumbnail(user.id, user.image_path)
+    
     @staticmethod
     def get_all_users():
-        """Get all users"""
-        return User.query.all()
+        """Get all users with their face encodings"""
+        return User.query.options(undefer(User.face_encoding)).all()
+    
+    @staticmethod
+    def _search_filter(query, search):
+        """Match name anywhere, employee ID and email by prefix (index friendly)"""
+        if not search:
+            return query
+        search = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return query.filter(or_(
+            User.name.like(f'%{search}%', escape='\\'),
+            User.employee_id.like(f'{search}%', escape='\\'),
+            User.email.like(f'{search}%', escape='\\')
+        ))
+    
+    @staticmethod
+    def list_users(search=None, limit=100, after_id=None):
+        """
+        One page of slim user rows ordered by ID, optionally filtered by search
+        Keyset pagination: after_id is the last ID of the previous page
+        Returns: (list of UserSummary, next_after_id or None, total matching users)
+        """
+        query = UserService._search_filter(db.session.query(*USER_SUMMARY_COLUMNS), search)
+        total = UserService._search_filter(db.session.query(db.func.count(User.id)), search).scalar()
+        
+        if after_id:
+            query = query.filter(User.id > after_id)
+        rows = query.order_by(User.id).limit(limit + 1).all()
+        
+        next_after_id = rows[limit - 1].id if len(rows) > limit else None
+        return [UserSummary(*row) for row in rows[:limit]], next_after_id, total
+    
+    @staticmethod
+    def get_user_summary(user_id):
+        """Slim row for one user, or None"""
+        row = db.session.query(*USER_SUMMARY_COLUMNS).filter(User.id == user_id).first()
+        return UserSummary(*row) if row else None
     
     @staticmethod
     def get_user_by_id(user_id):
@@ -77,19 +275,21 @@ class UserService:
     @staticmethod
     def get_users_debug_info():
         """Get debug information for all users"""
-        users = User.query.all()
+        users = User.query.options(undefer(User.face_encoding)).all()
         users_info = []
         
         for user in users:
             # Check face encoding validity
             try:
-                face_encoding_array = np.array([float(x) for x in user.face_encoding.split(',')])
-                encoding_valid = len(face_encoding_array) == 128  # Face encoding must have 128 dimensions
+                face_encoding_array = unpack_face_encoding(user.face_encoding)
+                encoding_length = len(face_encoding_array)
+                encoding_valid = encoding_length == 128  # Face encoding must have 128 dimensions
             except:
+                encoding_length = 0
                 encoding_valid = False
             
-            # Check image file existence
-            image_exists = os.path.exists(user.image_path)
+            # Check image existence against the store index
+            image_exists = ImageStoreService.exists(user.image_path)
             
             users_info.append({
                 'id': user.id,
@@ -99,13 +299,15 @@ class UserService:
                 'image_path': user.image_path,
                 'image_exists': image_exists,
                 'encoding_valid': encoding_valid,
-                'encoding_length': len(user.face_encoding.split(',')) if user.face_encoding else 0,
+                'encoding_length': encoding_length,
+                'encoding_packed': is_packed_face_encoding(user.face_encoding),
                 'created_at': user.created_at.strftime('%Y-%m-%d %H:%M:%S')
             })
         
         return {
             'total_users': len(users),
-            'users': users_info
+            'users': users_info,
+            'image_store': ImageStoreService.stats()
         }
     
     @staticmethod
@@ -121,6 +323,7 @@ class UserService:
                     setattr(user, key, value)
             
             db.session.commit()
+            FaceGalleryService.upsert_user(user)
             return user, None
             
         except Exception as e:
@@ -134,12 +337,18 @@ class UserService:
             if not user:
                 return False, "User not found"
             
-            # Delete image file if exists
-            if os.path.exists(user.image_path):
-                os.remove(user.image_path)
-            
+            image_path = user.image_path
+            AttendanceSummaryService.remove_user(user_id)
             db.session.delete(user)
+            FaceGalleryService.record_deletions([user_id])
             db.session.commit()
+            FaceGalleryService.remove_user(user_id)
+            RecognitionCacheService.invalidate_user(user_id)
+            ThumbnailService.invalidate_user(user_id)
+            
+            # Identical uploads share one file: delete it with its last user
+            if not User.query.filter_by(image_path=image_path).first() and ImageStoreService.delete(image_path):
+                ThumbnailService.delete_files(image_path)
             return True, None
             
         except Exception as e:
@@ -0,0 +1,102 @@
+"""
+Shared fixtures: an app on a throwaway SQLite database and stand-in face models
+"""
+import base64
+import io
+import os
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from PIL import Image
+from app import create_app
+from config.config import config, TestingConfig
+from config.database import db
+from models import User
+from services import face_recognition_service
+from services.face_gallery_service import FaceGalleryService
+from utils.helpers import pack_face_encoding
+
+def color_encoding(image_rgb, location):
+    """128-d encoding derived from the mean colour of a face crop"""
+    top, right, bottom, left = location
+    mean = image_rgb[top:bottom, left:right].reshape(-1, 3).mean(axis=0) / 255.0
+    return np.resize(mean, 128) * np.linspace(0.5, 1.0, 128)
+
+def color_jpeg(color, size=(320, 240)):
+    """JPEG bytes of a plain image; its colour stands in for the face identity"""
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+def color_base64(color, size=(320, 240)):
+    """Data URL of a plain JPEG, as sent by the kiosk"""
+    return 'data:image/jpeg;base64,' + base64.b64encode(color_jpeg(color, size)).decode('ascii')
+
+@pytest.fixture
+def face_models(monkeypatch):
+    """
+    Deterministic replacement for the dlib models: one face in the middle of
+    every image but a black one, encoded from its colour; calls are counted per function
+    """
+    calls = {'face_locations': 0, 'face_encodings': 0}
+
+    def face_locations(image_rgb, *args, **kwargs):
+        calls['face_locations'] += 1
+        if image_rgb.max() < 16:
+            return []
+        height, width = image_rgb.shape[:2]
+        return [(height // 4, 3 * width // 4, 3 * height // 4, width // 4)]
+
+    def face_encodings(image_rgb, known_face_locations=None, *args, **kwargs):
+        calls['face_encodings'] += 1
+        locations = known_face_locations if known_face_locations is not None else face_locations(image_rgb)
+        return [color_encoding(image_rgb, location) for location in locations]
+
+    models = SimpleNamespace(face_locations=face_locations, face_encodings=face_encodings, calls=calls)
+    monkeypatch.setattr(face_recognition_service, '_face_recognition', models)
+    return models
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """
+    Application bound to a fresh SQLite database in tmp_path, or to the empty
+    database named by TEST_DATABASE_URL (e.g. MySQL); its tables are dropped afterwards
+    """
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL') or 'sqlite:///' + str(tmp_path / 'checkin.db')
+        IMAGE_STORE_DIR = str(tmp_path / 'face_images')
+        THUMBNAIL_DIR = str(tmp_path / 'face_images' / 'thumbnails')
+
+    monkeypatch.setitem(config, 'testing', Config)
+    FaceGalleryService._loaded = False
+    app = create_app('testing')
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def image_data():
+    """Build a base64 kiosk frame of a colour"""
+    return color_base64
+
+@pytest.fixture
+def enroll(app, face_models):
+    """Create a user whose face is an image of the given colour and add it to the gallery"""
+    def enroll_user(name, color):
+        image_rgb = np.asarray(Image.open(io.BytesIO(color_jpeg(color))).convert('RGB'))
+        height, width = image_rgb.shape[:2]
+        encoding = color_encoding(image_rgb, (height // 4, 3 * width // 4, 3 * height // 4, width // 4))
+        with app.app_context():
+            user = User(name=name, email=f'{name}@example.com', employee_id=name.upper(),
+                        face_encoding=pack_face_encoding(encoding), image_path='')
+            db.session.add(user)
+            db.session.commit()
+            FaceGalleryService.load()
+            return user.id
+    return enroll_user
@@ -0,0 +1,58 @@
+"""
+Concurrent check-ins of one user: exactly one check-in, the rest check-outs, one row
+"""
+import threading
+from collections import namedtuple
+from datetime import date
+from config.database import db
+from models import User, Attendance, AttendanceMonthlySummary
+from services.attendance_service import AttendanceService
+from services.attendance_summary_service import AttendanceSummaryService
+from utils.helpers import pack_face_encoding
+
+THREADS = 16
+
+# Detached user fields used by process_checkin, so threads hold no connection while waiting
+ProbeUser = namedtuple('ProbeUser', ['id', 'name', 'employee_id', 'image_path'])
+
+def create_probe_user(app):
+    with app.app_context():
+        user = User(name='concurrency', email='concurrency@example.com', employee_id='CC1',
+                    face_encoding=pack_face_encoding([0.0] * 128), image_path='')
+        db.session.add(user)
+        db.session.commit()
+        return ProbeUser(user.id, user.name, user.employee_id, user.image_path)
+
+def hammer(app, user, n_threads):
+    """Call process_checkin for the same user from n_threads threads released together"""
+    barrier = threading.Barrier(n_threads)
+    results = [None] * n_threads
+
+    def worker(i):
+        barrier.wait()
+        with app.app_context():
+            results[i] = AttendanceService.process_checkin(user, image_mode='none')
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_checkins_of_one_user(app):
+    user = create_probe_user(app)
+
+    results = hammer(app, user, THREADS)
+
+    assert [error for _, error in results if error] == []
+    types = [result['type'] for result, _ in results]
+    assert types.count('check_in') == 1
+    assert types.count('check_out') == THREADS - 1
+    # Each check-out saw the one committed before it: only the first had no previous check-out
+    assert [result['is_update'] for result, _ in results if result['type'] == 'check_out'].count(False) == 1
+    with app.app_context():
+        assert Attendance.query.filter_by(user_id=user.id).count() == 1
+        summary = AttendanceMonthlySummary.query.filter_by(user_id=user.id, month=date.today().replace(day=1)).one()
+        assert summary.days == 1
+        assert AttendanceSummaryService.check() == []
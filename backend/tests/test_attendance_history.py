@@ -0,0 +1,67 @@
+"""
+Attendance history keyset pages: (date, id) cursors over the user's rows, newest first
+"""
+from datetime import date, datetime, timedelta
+import pytest
+from config.database import db
+from models import User, Attendance
+from utils.helpers import pack_face_encoding
+from utils.sql_helpers import encode_keyset_cursor
+
+# Inserted out of date order so ids do not follow dates
+DAYS = [date(2026, 3, 2), date(2026, 3, 6), date(2026, 3, 3), date(2026, 3, 5), date(2026, 3, 4)]
+
+@pytest.fixture
+def history(app):
+    """A user with one attendance row per day of DAYS; returns (user_id, {date: id})"""
+    with app.app_context():
+        user = User(name='alice', email='alice@example.com', employee_id='ALICE',
+                    face_encoding=pack_face_encoding([0.0] * 128), image_path='')
+        db.session.add(user)
+        db.session.flush()
+        rows = []
+        for day in DAYS:
+            check_in = datetime.combine(day, datetime.min.time()) + timedelta(hours=8)
+            rows.append(Attendance(user_id=user.id, date=day, check_in=check_in,
+                                   check_out=check_in + timedelta(hours=9, minutes=15)))
+        db.session.add_all(rows)
+        db.session.commit()
+        return user.id, {row.date: row.id for row in rows}
+
+def test_pages_cover_every_row_once_newest_first(client, history):
+    user_id, ids = history
+    seen = []
+    cursor = None
+    while True:
+        query = f'/attendance/history/{user_id}?limit=2' + (f'&cursor={cursor}' if cursor else '')
+        body = client.get(query).get_json()
+        assert body['success']
+        assert len(body['attendances']) <= 2
+        seen.extend(body['attendances'])
+        cursor = body['next_cursor']
+        assert body['has_more'] == (cursor is not None)
+        if not cursor:
+            break
+
+    assert [row['date'] for row in seen] == [day.isoformat() for day in sorted(DAYS, reverse=True)]
+    assert [row['id'] for row in seen] == [ids[day] for day in sorted(DAYS, reverse=True)]
+    assert all(row['duration'] == '9h 15m' for row in seen)
+
+def test_cursor_date_ties_break_on_id(client, history):
+    user_id, ids = history
+    day = date(2026, 3, 4)
+
+    # A cursor on the same date but a higher id still lists that day's row
+    body = client.get(f'/attendance/history/{user_id}?limit=10&cursor={encode_keyset_cursor(day, ids[day] + 1)}').get_json()
+    assert [row['date'] for row in body['attendances']] == ['2026-03-04', '2026-03-03', '2026-03-02']
+
+    # A cursor on the row itself resumes after it
+    body = client.get(f'/attendance/history/{user_id}?limit=10&cursor={encode_keyset_cursor(day, ids[day])}').get_json()
+    assert [row['date'] for row in body['attendances']] == ['2026-03-03', '2026-03-02']
+    assert body['next_cursor'] is None
+
+def test_bad_cursor_is_rejected(client, history):
+    user_id, _ = history
+    response = client.get(f'/attendance/history/{user_id}?cursor=not-a-cursor')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
@@ -0,0 +1,67 @@
+"""
+Org attendance report: week/month buckets and worked time computed in SQL
+"""
+from datetime import date, datetime, timedelta
+import pytest
+from config.database import db
+from models import User, Attendance
+from utils.helpers import pack_face_encoding
+
+HOUR = 3600
+
+# (employee, date, hours worked or None when not checked out); 2026-03-29 is a Sunday
+ATTENDANCE = [
+    ('alice', date(2026, 3, 27), 8),
+    ('alice', date(2026, 3, 29), 8),
+    ('alice', date(2026, 3, 30), 9),
+    ('alice', date(2026, 4, 1), 7.5),
+    ('alice', date(2026, 4, 2), None),
+    ('bob', date(2026, 3, 30), 8),
+]
+
+@pytest.fixture
+def attendance(app):
+    with app.app_context():
+        users = {}
+        for name, department in (('alice', 'ops'), ('bob', 'sales')):
+            users[name] = User(name=name, email=f'{name}@example.com', employee_id=name.upper(),
+                               department=department, face_encoding=pack_face_encoding([0.0] * 128),
+                               image_path='')
+        db.session.add_all(users.values())
+        db.session.flush()
+        for name, day, hours in ATTENDANCE:
+            check_in = datetime.combine(day, datetime.min.time()) + timedelta(hours=8)
+            check_out = check_in + timedelta(hours=hours) if hours is not None else None
+            db.session.add(Attendance(user_id=users[name].id, date=day, check_in=check_in, check_out=check_out))
+        db.session.commit()
+
+def report(client, period, group_by):
+    body = client.get(f'/attendance/report?start=2026-03-28&end=2026-04-30&period={period}&group_by={group_by}').get_json()
+    assert body['success'], body
+    return body['rows']
+
+def test_weeks_start_on_monday(client, attendance):
+    rows = report(client, 'week', 'user')
+
+    assert [(row['period_start'], row['name'], row['total_days'], row['complete_days'], row['worked_seconds'])
+            for row in rows] == [
+        ('2026-03-23', 'alice', 1, 1, 8 * HOUR),
+        ('2026-03-30', 'alice', 3, 2, int(16.5 * HOUR)),
+        ('2026-03-30', 'bob', 1, 1, 8 * HOUR),
+    ]
+    assert rows[1]['average_duration'] == '8h 15m'
+
+def test_months_split_at_the_first_day(client, attendance):
+    rows = report(client, 'month', 'department')
+
+    assert [(row['period_start'], row['department'], row['users'], row['total_days'], row['worked_seconds'])
+            for row in rows] == [
+        ('2026-03-01', 'ops', 1, 2, 17 * HOUR),
+        ('2026-03-01', 'sales', 1, 1, 8 * HOUR),
+        ('2026-04-01', 'ops', 1, 2, int(7.5 * HOUR)),
+    ]
+    assert rows[2]['incomplete_days'] == 1
+
+def test_unknown_period_is_rejected(client, attendance):
+    response = client.get('/attendance/report?period=year')
+    assert response.status_code == 400
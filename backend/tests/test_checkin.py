@@ -0,0 +1,51 @@
+"""
+Check-in endpoint: client face hints and repeated kiosk frames
+"""
+from services.face_gallery_service import FaceGalleryService
+from services.recognition_cache_service import RecognitionCacheService
+
+def test_malformed_face_box_falls_back_to_detection(client, enroll, face_models, image_data):
+    enroll('alice', (200, 40, 40))
+
+    response = client.post('/attendance/checkin', json={
+        'image_data': image_data((200, 40, 40)),
+        'face_box': '{not json',
+        'face_margin': 'wide',
+    })
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['success'] is True
+    assert body['user'] == 'alice'
+    assert face_models.calls['face_locations'] == 1
+
+def test_unknown_face_in_valid_box_skips_full_detection(client, enroll, face_models, image_data):
+    enroll('alice', (200, 40, 40))
+
+    response = client.post('/attendance/checkin', json={
+        'image_data': image_data((40, 40, 200)),
+        'face_box': {'x': 80, 'y': 60, 'width': 160, 'height': 120},
+    })
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert face_models.calls['face_locations'] == 0
+    assert face_models.calls['face_encodings'] == 1
+
+def test_repeat_frame_skips_gallery_match(app, client, enroll, image_data, monkeypatch):
+    app.config['RECOGNITION_CACHE_TTL'] = 5
+    RecognitionCacheService.init_app(app)
+    enroll('alice', (200, 40, 40))
+    matches = []
+    gallery_match = FaceGalleryService.match
+    monkeypatch.setattr(FaceGalleryService, 'match',
+                        lambda *args, **kwargs: matches.append(1) or gallery_match(*args, **kwargs))
+
+    first = client.post('/attendance/checkin', json={'image_data': image_data((200, 40, 40))},
+                        headers={'X-Kiosk-Id': 'gate-1'})
+    second = client.post('/attendance/checkin', json={'image_data': image_data((200, 40, 40))},
+                         headers={'X-Kiosk-Id': 'gate-1'})
+
+    assert first.status_code == 200 and 'cached' not in first.get_json()
+    assert second.get_json()['cached'] is True
+    assert len(matches) == 1
@@ -0,0 +1,78 @@
+"""
+Check-out write-behind buffer: batched forward-only flushes with their summary deltas
+"""
+from datetime import date, datetime, timedelta
+import pytest
+from config.database import db
+from models import User, Attendance, AttendanceMonthlySummary
+from services.attendance_service import AttendanceService
+from services.attendance_summary_service import AttendanceSummaryService
+from services.checkout_buffer_service import CheckoutBufferService
+from utils.helpers import pack_face_encoding
+
+@pytest.fixture
+def buffer(app, monkeypatch):
+    """The buffer as with CHECKOUT_BUFFER_INTERVAL > 0, flushed only by the test"""
+    monkeypatch.setattr(CheckoutBufferService, '_interval', 3600.0)
+    monkeypatch.setattr(CheckoutBufferService, '_app', app)
+    monkeypatch.setattr(CheckoutBufferService, '_rows', {})
+    monkeypatch.setattr(CheckoutBufferService, '_pending', {})
+    return CheckoutBufferService
+
+@pytest.fixture
+def user_id(app):
+    with app.app_context():
+        user = User(name='alice', email='alice@example.com', employee_id='ALICE',
+                    face_encoding=pack_face_encoding([0.0] * 128), image_path='')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+def check_in(app, user_id):
+    with app.app_context():
+        result, error = AttendanceService.process_checkin(db.session.get(User, user_id), image_mode='none')
+        assert error is None
+        return result
+
+def stored(app, user_id):
+    with app.app_context():
+        row = Attendance.query.filter_by(user_id=user_id).one()
+        summary = AttendanceMonthlySummary.query.filter_by(user_id=user_id).one()
+        return row.check_out, summary.complete_days, AttendanceSummaryService.check()
+
+def test_flush_writes_latest_check_out_and_summary(app, buffer, user_id):
+    assert check_in(app, user_id)['type'] == 'check_in'
+    for _ in range(3):
+        assert check_in(app, user_id)['type'] == 'check_out'
+    assert stored(app, user_id)[0] is None
+
+    assert buffer.flush() == 1
+
+    check_out, complete_days, drift = stored(app, user_id)
+    assert check_out == buffer._rows[(user_id, date.today())]
+    assert complete_days == 1
+    assert drift == []
+    assert buffer.flush() == 0
+
+def test_newer_check_out_wins_over_a_requeued_failed_flush(app, buffer, user_id, monkeypatch):
+    check_in(app, user_id)
+    today = date.today()
+    first = datetime.now().replace(microsecond=0) + timedelta(minutes=1)
+    assert buffer.record_checkout(user_id, today, first) == (True, None)
+
+    def fail(pending):
+        raise RuntimeError('database unavailable')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(CheckoutBufferService, '_summary_changes', staticmethod(fail))
+        assert buffer.flush() == 0
+    assert buffer._pending == {(user_id, today): first}
+
+    newer = first + timedelta(minutes=5)
+    buffer.record_checkout(user_id, today, newer)
+    assert buffer.flush() == 1
+
+    check_out, complete_days, drift = stored(app, user_id)
+    assert check_out == newer
+    assert complete_days == 1
+    assert drift == []
@@ -0,0 +1,109 @@
+"""
+Edge uploads merged into the central database: one SQLite file per side
+"""
+import pytest
+from app import create_app
+from config.config import config, TestingConfig
+from config.database import db
+from models import User, Attendance, AttendanceMonthlySummary
+from services.attendance_service import AttendanceService
+from services.attendance_summary_service import AttendanceSummaryService
+from services.edge_sync_service import EdgeSyncService, edge_sync_queue
+from utils.helpers import pack_face_encoding
+
+@pytest.fixture
+def central_app(tmp_path, monkeypatch):
+    """Central database with one enrolled user"""
+    class CentralConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'central.db')
+
+    monkeypatch.setitem(config, 'central', CentralConfig)
+    app = create_app('central', services=False)
+    with app.app_context():
+        db.session.add(User(name='alice', email='alice@example.com', employee_id='ALICE',
+                            face_encoding=pack_face_encoding([0.0] * 128), image_path=''))
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+@pytest.fixture
+def edge_app(tmp_path, monkeypatch, central_app):
+    """Edge device syncing with central_app; its first start pulls the users"""
+    class EdgeConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = central_app.config['SQLALCHEMY_DATABASE_URI']
+        EDGE_MODE = True
+        EDGE_DATABASE_PATH = str(tmp_path / 'edge.db')
+
+    monkeypatch.setitem(config, 'edge', EdgeConfig)
+    for name in ('_app', '_central', '_thread', '_pushed', '_dropped', '_last_error'):
+        monkeypatch.setattr(EdgeSyncService, name, getattr(EdgeSyncService, name))
+    app = create_app('edge', services=False)
+    EdgeSyncService.init_app(app, start=False)
+    yield app
+    EdgeSyncService._central.dispose()
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+def check_in(app):
+    with app.app_context():
+        result, error = AttendanceService.process_checkin(User.query.one(), image_mode='none')
+        assert error is None
+        return result
+
+def central_state(central_app):
+    with central_app.app_context():
+        row = Attendance.query.one()
+        summary = AttendanceMonthlySummary.query.one()
+        return row.check_in, row.check_out, (summary.days, summary.complete_days), AttendanceSummaryService.check()
+
+def test_push_keeps_earliest_check_in_and_latest_check_out(central_app, request):
+    check_in(central_app)  # central kiosk first, then the edge device is set up
+    edge_app = request.getfixturevalue('edge_app')
+    check_in(edge_app)
+    check_out = check_in(edge_app)
+    with central_app.app_context():
+        central_check_in = Attendance.query.one().check_in
+
+    assert check_out['type'] == 'check_out'
+    assert EdgeSyncService.push_pending() == 1
+
+    merged_check_in, merged_check_out, counters, drift = central_state(central_app)
+    assert merged_check_in == central_check_in
+    with edge_app.app_context():
+        assert merged_check_out == Attendance.query.one().check_out
+        assert db.session.query(edge_sync_queue).count() == 0
+    assert counters == (1, 1)
+    assert drift == []
+
+def test_reupload_after_crash_does_not_double_count(central_app, edge_app):
+    check_in(edge_app)
+    check_in(edge_app)
+    EdgeSyncService.push_pending()
+    first = central_state(central_app)
+
+    # Crash between the central commit and the local queue delete: the same rows go up again
+    with edge_app.app_context():
+        row = Attendance.query.one()
+        EdgeSyncService.enqueue([row])
+        db.session.commit()
+    assert EdgeSyncService.push_pending() == 1
+
+    assert central_state(central_app) == first
+    assert first[2] == (1, 1) and first[3] == []
+
+def test_rows_of_users_unknown_centrally_are_dropped(central_app, edge_app):
+    with edge_app.app_context():
+        db.session.add(User(id=99, name='bob', email='bob@example.com', employee_id='BOB',
+                            face_encoding=pack_face_encoding([0.0] * 128), image_path=''))
+        db.session.commit()
+        result, error = AttendanceService.process_checkin(db.session.get(User, 99), image_mode='none')
+        assert error is None
+
+    assert EdgeSyncService.push_pending() == 1
+    assert EdgeSyncService.stats()['dropped_rows'] == 1
+    with central_app.app_context():
+        assert Attendance.query.count() == 0
+        assert AttendanceSummaryService.check() == []
@@ -0,0 +1,47 @@
+"""
+Gallery refresh across processes: deletion tombstones and snapshot generations
+"""
+import os
+import numpy as np
+from config.database import db
+from models import User
+from services.face_gallery_service import FaceGalleryService
+from utils.gallery_snapshot import reader_lock, write_snapshot, writer_lock
+
+def generations(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith('g'))
+
+def test_refresh_drops_user_deleted_by_another_process(app, enroll):
+    alice = enroll('alice', (200, 40, 40))
+    bob = enroll('bob', (40, 40, 200))
+
+    with app.app_context():
+        # What UserService.delete_user does in another process: row gone, tombstone written
+        db.session.delete(db.session.get(User, bob))
+        FaceGalleryService.record_deletions([bob])
+        db.session.commit()
+
+        assert FaceGalleryService.get_entry(bob) is not None
+        assert FaceGalleryService.refresh() is True
+        assert FaceGalleryService.get_entry(bob) is None
+        assert FaceGalleryService.get_entry(alice) is not None
+        assert FaceGalleryService.refresh() is False
+
+def test_generations_survive_while_a_reader_holds_the_lock(tmp_path):
+    directory = str(tmp_path / 'snapshot')
+    encodings, ids = np.zeros((1, 128), dtype=np.float32), np.array([1], dtype=np.int64)
+
+    def publish():
+        with writer_lock(directory):
+            return write_snapshot(directory, encodings, ids, [], None)
+
+    first = publish()
+    with reader_lock(directory):
+        for _ in range(3):
+            publish()
+        assert first in generations(directory)
+        assert len(generations(directory)) == 4
+
+    latest = publish()
+    assert generations(directory)[-1] == latest
+    assert len(generations(directory)) == 2
@@ -0,0 +1,33 @@
+"""
+Face encoding migration: legacy comma-separated text rewritten as packed float32
+"""
+import numpy as np
+from sqlalchemy import text
+from config.database import db
+from models import User
+from scripts import migrate_face_encoding
+from utils.helpers import pack_face_encoding, unpack_face_encoding, is_packed_face_encoding
+
+def test_legacy_text_encodings_are_packed(app, monkeypatch):
+    monkeypatch.setattr(migrate_face_encoding, 'BATCH_SIZE', 2)
+    encodings = np.random.default_rng(0).uniform(-0.5, 0.5, (3, 128))
+    with app.app_context():
+        users = [User(name=f'user{i}', email=f'user{i}@example.com', employee_id=f'E{i}',
+                      face_encoding=pack_face_encoding(encoding), image_path='')
+                 for i, encoding in enumerate(encodings)]
+        db.session.add_all(users)
+        db.session.commit()
+        # The first two rows as written before the binary format
+        for user, encoding in zip(users[:2], encodings):
+            db.session.execute(text("UPDATE users SET face_encoding = :value WHERE id = :id"),
+                               {'value': ','.join(repr(float(x)) for x in encoding), 'id': user.id})
+        db.session.commit()
+
+        assert migrate_face_encoding.convert_rows() == (2, 0)
+        assert migrate_face_encoding.convert_rows() == (0, 0)
+
+        db.session.expire_all()
+        for user, encoding in zip(users, encodings):
+            stored = db.session.get(User, user.id).face_encoding
+            assert is_packed_face_encoding(stored)
+            np.testing.assert_allclose(unpack_face_encoding(stored), encoding, rtol=1e-6, atol=1e-7)
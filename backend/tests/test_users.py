@@ -0,0 +1,38 @@
+"""
+Registration: photos reach the content store only for committed users
+"""
+import os
+from models import User
+from services.image_store_service import ImageStoreService
+
+def stored_files(app):
+    ImageStoreService.flush()
+    root = app.config['IMAGE_STORE_DIR']
+    return sorted(os.path.join(directory, name) for directory, _, files in os.walk(root) for name in files)
+
+def register(client, image_data, employee_id, extra_colors=()):
+    return client.post('/user/register', json={
+        'name': employee_id.lower(),
+        'email': f'{employee_id.lower()}@example.com',
+        'employee_id': employee_id,
+        'image_data': image_data((200, 40, 40)),
+        'extra_images': [image_data(color) for color in extra_colors],
+    })
+
+def test_faceless_extra_image_leaves_no_files(app, client, face_models, image_data):
+    response = register(client, image_data, 'E1', extra_colors=[(0, 0, 0)])
+
+    assert response.status_code == 400
+    assert stored_files(app) == []
+    with app.app_context():
+        assert User.query.count() == 0
+
+def test_registration_stores_photo_and_thumbnail(app, client, face_models, image_data):
+    response = register(client, image_data, 'E1', extra_colors=[(190, 50, 40)])
+
+    assert response.status_code == 200
+    with app.app_context():
+        image_path = User.query.one().image_path
+    files = stored_files(app)
+    assert image_path in files
+    assert len(files) == 2  # photo and its thumbnail
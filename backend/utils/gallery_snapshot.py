@@ -0,0 +1,120 @@
+"""
+On-disk face gallery snapshots shared by every process through the page cache
+
+A snapshot is a generation directory holding the template matrix
+(encodings.npy, sorted by owner), the owner ids (ids.npy) and meta.json
+(gallery entries and the updated_at watermark it reflects). The CURRENT file
+names the live generation and is replaced atomically, so readers always see
+a complete snapshot and processes that mapped an older one keep it valid.
+Readers hold a shared lock on read.lock from reading CURRENT until the
+generation is mapped; writers only delete old generations under the
+exclusive lock, so a generation never disappears halfway through a read.
+"""
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+CURRENT_FILE = 'CURRENT'
+LOCK_FILE = 'write.lock'
+READ_LOCK_FILE = 'read.lock'
+KEEP_GENERATIONS = 2
+
+def _write_atomic(path, write):
+    """Write a file through a temp file, fsync and rename"""
+    temp_path = f"{path}.tmp{os.getpid()}"
+    with open(temp_path, 'wb') as target:
+        write(target)
+        target.flush()
+        os.fsync(target.fileno())
+    os.replace(temp_path, path)
+
+def current_generation(directory):
+    """Name of the live generation, or None when no snapshot was written"""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as current:
+            return current.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+@contextmanager
+def writer_lock(directory):
+    """Exclusive lock between processes rewriting the snapshot"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+@contextmanager
+def reader_lock(directory):
+    """Shared lock held while resolving CURRENT and mapping that generation"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, READ_LOCK_FILE), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def write_snapshot(directory, encodings, ids, entries, watermark):
+    """
+    Write a new generation and make it the live one (call under writer_lock)
+    entries: iterable of tuples (id, name, email, employee_id, image_path)
+    Returns: generation name
+    """
+    generation = f"g{time.time_ns()}-{os.getpid()}"
+    path = os.path.join(directory, generation)
+    os.makedirs(path)
+    _write_atomic(os.path.join(path, 'encodings.npy'), lambda target: np.save(target, np.ascontiguousarray(encodings)))
+    _write_atomic(os.path.join(path, 'ids.npy'), lambda target: np.save(target, np.ascontiguousarray(ids)))
+    meta = {
+        'watermark': watermark.isoformat() if watermark else None,
+        'entries': [list(entry) for entry in entries],
+    }
+    _write_atomic(os.path.join(path, 'meta.json'), lambda target: target.write(json.dumps(meta).encode('utf-8')))
+    _write_atomic(os.path.join(directory, CURRENT_FILE), lambda target: target.write(generation.encode('ascii')))
+    _remove_old_generations(directory, generation)
+    return generation
+
+def _remove_old_generations(directory, generation):
+    """
+    Drop all but the newest generations; processes that still map a removed
+    one keep reading it until they remap (the files live on until unmapped)
+    Skipped while a reader holds read.lock: the next writer removes them instead
+    """
+    with open(os.path.join(directory, READ_LOCK_FILE), 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return
+        try:
+            generations = sorted(
+                (name for name in os.listdir(directory) if name.startswith('g') and name != generation),
+                key=lambda name: int(name[1:].split('-')[0]), reverse=True
+            )
+            for name in generations[KEEP_GENERATIONS - 1:]:
+                path = os.path.join(directory, name)
+                for file_name in os.listdir(path):
+                    os.remove(os.path.join(path, file_name))
+                os.rmdir(path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def read_snapshot(directory, generation):
+    """
+    Map a generation read-only (call under reader_lock unless holding writer_lock)
+    Returns: (encodings memmap, ids memmap, entry tuples, watermark datetime or None)
+    """
+    path = os.path.join(directory, generation)
+    encodings = np.load(os.path.join(path, 'encodings.npy'), mmap_mode='r')
+    ids = np.load(os.path.join(path, 'ids.npy'), mmap_mode='r')
+    with open(os.path.join(path, 'meta.json'), encoding='utf-8') as meta_file:
+        meta = json.load(meta_file)
+    watermark = datetime.fromisoformat(meta['watermark']) if meta['watermark'] else None
+    return encodings, ids, [tuple(entry) for entry in meta['entries']], watermark
@@ -2,7 +2,19 @@
 Utility functions
 """
 import os
+import base64
+import binascii
 from datetime import datetime
+import numpy as np
+from utils.metrics import STAGE_SECONDS
+
+# Face encodings are stored as packed little-endian float32 (128 x 4 bytes)
+FACE_ENCODING_DTYPE = np.dtype('<f4')
+FACE_ENCODING_SIZE = 128
+PACKED_FACE_ENCODING_BYTES = FACE_ENCODING_SIZE * FACE_ENCODING_DTYPE.itemsize
+
+# Request bodies treated as a raw uploaded image
+RAW_IMAGE_MIMETYPES = ('image/jpeg', 'image/png', 'image/webp', 'application/octet-stream')
 
 def ensure_directory_exists(directory_path):
     """Ensure a directory exists, create if it doesn't"""
@@ -47,4 +59,76 @@ def validate_email(email):
     """Basic email validation"""
     import re
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
\ No newline at end of file
+    return re.match(pattern, email) is not None
+
+def pack_face_encoding(face_encoding):
+    """Pack a face encoding into the binary storage format"""
+    return np.asarray(face_encoding, dtype=FACE_ENCODING_DTYPE).tobytes()
+
+def unpack_face_encoding(value):
+    """
+    Read a stored face encoding as a NumPy vector
+    Accepts the packed binary format and the legacy comma-separated text
+    """
+    if isinstance(value, memoryview):
+        value = value.tobytes()
+    if isinstance(value, bytes) and len(value) == PACKED_FACE_ENCODING_BYTES:
+        # Zero-copy view; legacy text of 128 floats is never exactly 512 bytes long
+        return np.frombuffer(value, dtype=FACE_ENCODING_DTYPE)
+    if isinstance(value, bytes):
+        value = value.decode('ascii')
+    return np.array(value.split(','), dtype=np.float64)
+
+def is_packed_face_encoding(value):
+    """Check whether a stored face encoding already uses the binary format"""
+    return isinstance(value, (bytes, memoryview)) and len(value) == PACKED_FACE_ENCODING_BYTES
+
+def decode_base64_image(image_data):
+    """Strip an optional data URL prefix and decode base64 image data to bytes"""
+    with STAGE_SECONDS.time(stage='base64_decode'):
+        if ',' in image_data:
+            image_data = image_data.split(',')[1]
+        return base64.b64decode(image_data)
+
+def read_request_image(request, field='image_data'):
+    """
+    Read the uploaded image of a request as bytes
+    Accepts a raw image body (other fields in the query string), a multipart
+    file part named 'image' or `field`, or base64 `field` in JSON/form data
+    Returns: (image_bytes or None, request fields)
+    """
+    if request.mimetype in RAW_IMAGE_MIMETYPES:
+        return request.get_data() or None, request.args
+
+    data = request.get_json() if request.is_json else request.form
+    upload = request.files.get('image') or request.files.get(field)
+    if upload:
+        return upload.read() or None, data
+
+    image_data = data.get(field)
+    if not image_data:
+        return None, data
+    try:
+        return decode_base64_image(image_data), data
+    except (binascii.Error, ValueError):
+        return None, data
+
+def read_request_images(request, field='images'):
+    """
+    Read every uploaded image of a batch request as bytes
+    Accepts multipart file parts named `field` or a JSON/form list of base64 strings
+    Returns: (list of image bytes or None per invalid image, request fields)
+    """
+    data = request.get_json() if request.is_json else request.form
+    uploads = request.files.getlist(field)
+    if uploads:
+        return [upload.read() or None for upload in uploads], data
+
+    images = []
+    encoded_images = data.get(field) if request.is_json else data.getlist(field)
+    for image_data in encoded_images or []:
+        try:
+            images.append(decode_base64_image(image_data) if image_data else None)
+        except (binascii.Error, ValueError, TypeError):
+            images.append(None)
+    return images, data
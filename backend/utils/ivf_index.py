@@ -0,0 +1,149 @@
+"""
+Inverted-file (IVF) approximate nearest-neighbour index in pure NumPy
+"""
+import time
+import numpy as np
+
+def squared_distances(queries, points, point_sq_norms=None):
+    """Squared Euclidean distances between query rows and point rows"""
+    queries = np.asarray(queries, dtype=points.dtype)
+    if point_sq_norms is None:
+        point_sq_norms = np.einsum('ij,ij->i', points, points)
+    query_sq = np.einsum('ij,ij->i', queries, queries)
+    sq = query_sq[:, None] + point_sq_norms[None, :] - 2.0 * (queries @ points.T)
+    return np.maximum(sq, 0.0)
+
+def kmeans(points, n_clusters, iterations=10, seed=0):
+    """Lloyd's k-means; returns centroids (n_clusters x dim)"""
+    rng = np.random.default_rng(seed)
+    centroids = points[rng.choice(len(points), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmin(squared_distances(points, centroids), axis=1)
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=n_clusters)
+        nonempty = counts > 0
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+        sums = np.add.reduceat(points[order], starts, axis=0)
+        centroids[nonempty] = sums / counts[nonempty, None]
+        # Re-seed empty clusters with random points
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            centroids[empty] = points[rng.choice(len(points), len(empty), replace=False)]
+    return centroids
+
+class IVFIndex:
+    """
+    Coarse k-means partitions over gallery rows
+    The index stores one list assignment per gallery row, aligned with the
+    gallery matrix, so it can follow the gallery's append/remove operations.
+    """
+
+    def __init__(self, centroids, assignments, n_probe, trained_size):
+        self.centroids = centroids
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self.n_probe = max(1, min(n_probe, len(centroids)))
+        self.trained_size = trained_size
+        # Inverted lists as one row array grouped by list plus per-list offsets
+        self._order = np.argsort(self.assignments, kind='stable')
+        counts = np.bincount(self.assignments, minlength=len(centroids))
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    @classmethod
+    def train(cls, encodings, n_lists=0, n_probe=8, iterations=10, sample_per_list=64, seed=0):
+        """Build an index over the given gallery rows"""
+        n_rows = len(encodings)
+        if n_lists <= 0:
+            n_lists = int(np.sqrt(n_rows))
+        n_lists = max(1, min(n_lists, n_rows))
+
+        rng = np.random.default_rng(seed)
+        sample_size = min(n_rows, n_lists * sample_per_list)
+        sample = encodings[rng.choice(n_rows, sample_size, replace=False)]
+        centroids = kmeans(sample, n_lists, iterations, seed).astype(encodings.dtype)
+        return cls(centroids, cls._assign(centroids, encodings), n_probe, n_rows)
+
+    @staticmethod
+    def _assign(centroids, encodings, chunk_size=8192):
+        """Nearest centroid for each row, chunked to bound memory"""
+        centroid_sq = np.einsum('ij,ij->i', centroids, centroids)
+        assignments = np.empty(len(encodings), dtype=np.int32)
+        for start in range(0, len(encodings), chunk_size):
+            chunk = encodings[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmin(
+                squared_distances(chunk, centroids, centroid_sq), axis=1
+            )
+        return assignments
+
+    def appended(self, encodings):
+        """New index with rows appended to the end of the gallery"""
+        new_assignments = self._assign(self.centroids, np.asarray(encodings).reshape(-1, self.centroids.shape[1]))
+        return IVFIndex(self.centroids, np.concatenate([self.assignments, new_assignments]),
+                        self.n_probe, self.trained_size)
+
+    def filtered(self, keep):
+        """New index with only the gallery rows selected by the boolean mask"""
+        return IVFIndex(self.centroids, self.assignments[keep], self.n_probe, self.trained_size)
+
+    def reordered(self, order):
+        """New index following a permutation of the gallery rows"""
+        return IVFIndex(self.centroids, self.assignments[order], self.n_probe, self.trained_size)
+
+    def candidates(self, query, n_probe=None):
+        """Gallery row indices in the n_probe lists closest to the query"""
+        n_probe = min(n_probe or self.n_probe, len(self.centroids))
+        centroid_distances = squared_distances(query.reshape(1, -1), self.centroids)[0]
+        lists = np.argpartition(centroid_distances, n_probe - 1)[:n_probe]
+        return np.concatenate([self._order[self._offsets[i]:self._offsets[i + 1]] for i in lists])
+
+    def search(self, queries, encodings, sq_norms, n_probe=None):
+        """
+        Approximate nearest gallery row for each query with exact re-ranking
+        Returns: (row_indices, distances) with -1 / inf where no candidate exists
+        """
+        queries = np.asarray(queries, dtype=encodings.dtype).reshape(-1, encodings.shape[1])
+        rows = np.full(len(queries), -1, dtype=np.int64)
+        distances = np.full(len(queries), np.inf)
+        for i, query in enumerate(queries):
+            candidates = self.candidates(query, n_probe)
+            if len(candidates) == 0:
+                continue
+            candidate_sq = squared_distances(query.reshape(1, -1), encodings[candidates], sq_norms[candidates])[0]
+            best = np.argmin(candidate_sq)
+            rows[i] = candidates[best]
+            distances[i] = np.sqrt(candidate_sq[best])
+        return rows, distances
+
+def recall_report(index, encodings, sq_norms, queries, tolerance=0.6, n_probe=None):
+    """
+    Compare IVF search against exact brute force on the same queries
+    Returns: dict with recall@1, match agreement and mean latencies (ms)
+    """
+    queries = np.asarray(queries, dtype=encodings.dtype).reshape(-1, encodings.shape[1])
+
+    started = time.perf_counter()
+    exact_rows = np.empty(len(queries), dtype=np.int64)
+    exact_distances = np.empty(len(queries))
+    for i, query in enumerate(queries):
+        sq = squared_distances(query.reshape(1, -1), encodings, sq_norms)[0]
+        exact_rows[i] = np.argmin(sq)
+        exact_distances[i] = np.sqrt(sq[exact_rows[i]])
+    brute_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    started = time.perf_counter()
+    ann_rows, ann_distances = index.search(queries, encodings, sq_norms, n_probe)
+    ann_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    exact_match = exact_distances < tolerance
+    ann_match = ann_distances < tolerance
+    agree = (exact_match == ann_match) & (~exact_match | (exact_rows == ann_rows))
+    return {
+        'gallery_size': int(len(encodings)),
+        'queries': int(len(queries)),
+        'n_lists': int(len(index.centroids)),
+        'n_probe': int(min(n_probe or index.n_probe, len(index.centroids))),
+        'recall_at_1': round(float(np.mean(exact_rows == ann_rows)), 4),
+        'match_agreement': round(float(np.mean(agree)), 4),
+        'brute_force_ms': round(brute_ms, 3),
+        'ann_ms': round(ann_ms, 3),
+        'speedup': round(brute_ms / ann_ms, 2) if ann_ms > 0 else None,
+    }
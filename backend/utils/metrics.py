@@ -0,0 +1,181 @@
+"""
+In-process metrics rendered in the Prometheus text format
+
+Counters and histograms are plain dicts updated under a lock, so recording
+costs a few microseconds and needs no client library or external service.
+Recognition pool workers record into a capture() list that is shipped back
+with their result and replayed in the web process, which serves /metrics.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond matching to multi-second detection
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = {}
+_capture = threading.local()
+
+def _label_text(labelnames, labels, extra=None):
+    """{name="value",...} label set, empty when there are no labels"""
+    pairs = list(zip(labelnames, labels)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    """Prometheus number formatting"""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """Named metric with a fixed label set, registered on creation"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        _registry[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _record(self, key, value):
+        """Keep the update for replay when the current thread captures metrics"""
+        records = getattr(_capture, 'records', None)
+        if records is not None:
+            records.append((self.name, key, value))
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+class Counter(_Metric):
+    """Monotonic count per label set (name it with the _total suffix)"""
+
+    kind = 'counter'
+
+    def inc(self, value=1, **labels):
+        key = self._key(labels)
+        self._apply(key, value)
+        self._record(key, value)
+
+    def _apply(self, key, value):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_label_text(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+class Gauge(_Metric):
+    """Current value per label set, set by the owner (not captured across processes)"""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_label_text(self.labelnames, key)} {_format_value(value)}')
+        return lines
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        self._apply(key, value)
+        self._record(key, value)
+
+    def _apply(self, key, value):
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _label_text(self.labelnames, key, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_label_text(self.labelnames, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_label_text(self.labelnames, key)} {count}')
+        return lines
+
+@contextmanager
+def capture():
+    """Collect the counter and histogram updates of this thread, e.g. inside a pool worker"""
+    records = []
+    _capture.records = records
+    try:
+        yield records
+    finally:
+        _capture.records = None
+
+def replay(records):
+    """Apply updates captured in another process"""
+    for name, key, value in records:
+        metric = _registry.get(name)
+        if metric is not None:
+            metric._apply(key, value)
+
+def render():
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry.values():
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+# Check-in pipeline metrics
+STAGE_SECONDS = Histogram(
+    'checkin_stage_seconds', 'Time spent in each recognition and attendance stage', ['stage']
+)
+REQUEST_SECONDS = Histogram(
+    'http_request_seconds', 'Request latency by Flask endpoint and status code', ['endpoint', 'status']
+)
+FACES_DETECTED = Counter('faces_detected_total', 'Faces found by detection or supplied by the client')
+RECOGNITIONS = Counter(
+    'recognitions_total', 'Recognized frames by outcome (match, cached, no_match, no_face, empty_gallery, error)', ['result']
+)
+ATTENDANCE_EVENTS = Counter('attendance_events_total', 'Recorded check-ins and check-outs', ['type'])
+GALLERY_USERS = Gauge('face_gallery_users', 'Users in the in-memory face gallery')
+GALLERY_TEMPLATES = Gauge('face_gallery_templates', 'Templates in the in-memory face gallery')
@@ -0,0 +1,70 @@
+"""
+SQL helpers shared by services: dialect-specific expressions and keyset cursors
+"""
+import base64
+from datetime import date
+from sqlalchemy import func, cast, literal_column, Date, Integer
+
+REPORT_PERIODS = ('day', 'week', 'month')
+
+def duration_seconds(start, end, dialect_name):
+    """
+    SQL expression for whole seconds between two DATETIME columns
+    Returns None for dialects without a known expression (compute in Python)
+    """
+    if dialect_name == 'mysql':
+        return func.timestampdiff(literal_column('SECOND'), start, end)
+    if dialect_name == 'sqlite':
+        # julianday is a float day count, round before truncating to seconds
+        return cast(func.round((func.julianday(end) - func.julianday(start)) * 86400), Integer)
+    if dialect_name == 'postgresql':
+        return cast(func.extract('epoch', end - start), Integer)
+    return None
+
+def period_start(column, period, dialect_name):
+    """
+    SQL expression for the first day of the day/week/month containing a DATE column
+    Weeks start on Monday
+    Raises ValueError for unknown periods or dialects
+    """
+    if period not in REPORT_PERIODS:
+        raise ValueError(f'Unknown period: {period}')
+    if period == 'day':
+        return column
+    if dialect_name == 'mysql':
+        if period == 'week':
+            return func.subdate(column, func.weekday(column), type_=Date)
+        return func.subdate(column, func.dayofmonth(column) - 1, type_=Date)
+    if dialect_name == 'sqlite':
+        if period == 'week':
+            # Six days back, then forward to the next Monday (or the same day)
+            return func.date(column, '-6 days', 'weekday 1', type_=Date)
+        return func.date(column, 'start of month', type_=Date)
+    if dialect_name == 'postgresql':
+        return cast(func.date_trunc(period, column), Date)
+    raise ValueError(f'Unsupported dialect: {dialect_name}')
+
+def format_duration(seconds):
+    """Format a duration in seconds as 'Xh Ym'"""
+    if seconds is None:
+        return None
+    seconds = int(seconds)
+    return f"{seconds // 3600}h {(seconds % 3600) // 60}m"
+
+def encode_keyset_cursor(row_date, row_id):
+    """Opaque cursor for the (date, id) position of the last row of a page"""
+    raw = f"{row_date.isoformat()}:{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_keyset_cursor(cursor):
+    """
+    Decode a cursor made by encode_keyset_cursor
+    Raises ValueError for malformed cursors
+    Returns: (date, id)
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        row_date, row_id = raw.split(':')
+        return date.fromisoformat(row_date), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
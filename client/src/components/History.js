@@ -5,20 +5,26 @@ import apiService from '../services/apiService';
 const History = () => {
   const navigate = useNavigate();
   const [users, setUsers] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [search, setSearch] = useState('');
   const [isLoading, setIsLoading] = useState(true);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [error, setError] = useState('');
 
   useEffect(() => {
     fetchUsers();
   }, []);
 
-  const fetchUsers = async () => {
+  const fetchUsers = async (query = search) => {
     try {
       setIsLoading(true);
-      const response = await apiService.getAllUsers();
+      const response = await apiService.getAllUsers(query);
       
       if (response.success) {
         setUsers(response.users);
+        setTotal(response.total);
+        setNextCursor(response.next_cursor);
       } else {
         setError(response.message || 'Không thể tải danh sách người dùng');
       }
@@ -29,6 +35,29 @@ const History = () => {
     }
   };
 
+  const fetchMoreUsers = async () => {
+    try {
+      setIsLoadingMore(true);
+      const response = await apiService.getAllUsers(search, nextCursor);
+      
+      if (response.success) {
+        setUsers((current) => [...current, ...response.users]);
+        setNextCursor(response.next_cursor);
+      } else {
+        setError(response.message || 'Không thể tải danh sách người dùng');
+      }
+    } catch (err) {
+      setError(err.message || 'Có lỗi xảy ra khi tải dữ liệu');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
+  const handleSearch = (event) => {
+    event.preventDefault();
+    fetchUsers(search.trim());
+  };
+
   const formatDate = (dateString) => {
     if (!dateString) return '';
     const date = new Date(dateString);
@@ -65,11 +94,27 @@ const History = () => {
           </div>
         )}
 
+        <form onSubmit={handleSearch} className="mb-6 flex gap-3">
+          <input
+            type="text"
+            value={search}
+            onChange={(event) => setSearch(event.target.value)}
+            placeholder="Tìm theo tên, mã NV hoặc email"
+            className="flex-1 px-4 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-purple-500"
+          />
+          <button
+            type="submit"
+            className="bg-purple-500 hover:bg-purple-600 text-white px-4 py-2 rounded-lg text-sm transition-colors"
+          >
+            Tìm kiếm
+          </button>
+        </form>
+
         {users.length === 0 ? (
           <div className="text-center py-12">
             <div className="text-8xl mb-6">📋</div>
             <h3 className="text-2xl font-semibold text-gray-700 mb-4">
-              Chưa có người dùng nào
+              {search ? 'Không tìm thấy người dùng phù hợp' : 'Chưa có người dùng nào'}
             </h3>
             <p className="text-gray-600 mb-6">
               Hãy đăng ký tài khoản trước khi sử dụng tính năng Checkin
@@ -85,11 +130,11 @@ const History = () => {
           <div>
             <div className="mb-6 flex justify-between items-center">
               <p className="text-gray-600">
-                Tổng cộng: <span className="font-semibold">{users.length}</span> người dùng
+                Tổng cộng: <span className="font-semibold">{total}</span> người dùng
               </p>
               
               <button
-                onClick={fetchUsers}
+                onClick={() => fetchUsers()}
                 className="bg-blue-500 hover:bg-blue-600 text-white px-4 py-2 rounded-lg text-sm transition-colors"
               >
                 🔄 Làm mới
@@ -154,6 +199,18 @@ const History = () => {
                 </tbody>
               </table>
             </div>
+
+            {nextCursor && (
+              <div className="text-center mt-6">
+                <button
+                  onClick={fetchMoreUsers}
+                  disabled={isLoadingMore}
+                  className="bg-blue-500 hover:bg-blue-600 disabled:opacity-50 text-white px-6 py-3 rounded-lg font-medium transition-colors"
+                >
+                  {isLoadingMore ? 'Đang tải...' : 'Xem thêm'}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </div>
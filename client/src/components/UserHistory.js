@@ -8,6 +8,9 @@ const UserHistory = () => {
   
   const [user, setUser] = useState(null);
   const [attendances, setAttendances] = useState([]);
+  const [summary, setSummary] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState('');
 
@@ -25,6 +28,8 @@ const UserHistory = () => {
       if (response.success) {
         setUser(response.user);
         setAttendances(response.attendances);
+        setSummary(response.summary);
+        setNextCursor(response.next_cursor);
       } else {
         setError(response.message || 'Không thể tải lịch sử Checkin');
       }
@@ -35,6 +40,24 @@ const UserHistory = () => {
     }
   };
 
+  const fetchMoreHistory = async () => {
+    try {
+      setIsLoadingMore(true);
+      const response = await apiService.getUserHistory(userId, nextCursor);
+      
+      if (response.success) {
+        setAttendances((current) => [...current, ...response.attendances]);
+        setNextCursor(response.next_cursor);
+      } else {
+        setError(response.message || 'Không thể tải lịch sử Checkin');
+      }
+    } catch (err) {
+      setError(err.message || 'Có lỗi xảy ra khi tải dữ liệu');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const formatDateTime = (dateTimeString) => {
     if (!dateTimeString) return '-';
     const date = new Date(dateTimeString);
@@ -143,14 +166,14 @@ const UserHistory = () => {
               <div className="grid md:grid-cols-3 gap-6 mb-8">
                 <div className="bg-gradient-to-br from-green-50 to-emerald-100 rounded-lg p-6 text-center">
                   <div className="text-3xl mb-2">📈</div>
-                  <div className="text-2xl font-bold text-green-700">{attendances.length}</div>
+                  <div className="text-2xl font-bold text-green-700">{summary ? summary.total : attendances.length}</div>
                   <div className="text-sm text-green-600">Tổng số ngày</div>
                 </div>
                 
                 <div className="bg-gradient-to-br from-blue-50 to-cyan-100 rounded-lg p-6 text-center">
                   <div className="text-3xl mb-2">✅</div>
                   <div className="text-2xl font-bold text-blue-700">
-                    {attendances.filter(a => a.checkin_time && a.checkout_time).length}
+                    {summary ? summary.complete_days : attendances.filter(a => a.checkin_time && a.checkout_time).length}
                   </div>
                   <div className="text-sm text-blue-600">Ngày hoàn thành</div>
                 </div>
@@ -158,7 +181,7 @@ const UserHistory = () => {
                 <div className="bg-gradient-to-br from-yellow-50 to-orange-100 rounded-lg p-6 text-center">
                   <div className="text-3xl mb-2">⏳</div>
                   <div className="text-2xl font-bold text-orange-700">
-                    {attendances.filter(a => a.checkin_time && !a.checkout_time).length}
+                    {summary ? summary.incomplete_days : attendances.filter(a => a.checkin_time && !a.checkout_time).length}
                   </div>
                   <div className="text-sm text-orange-600">Đang làm việc</div>
                 </div>
@@ -185,7 +208,7 @@ const UserHistory = () => {
             ) : (
               <div>
                 <h2 className="text-xl font-semibold text-gray-800 mb-6">
-                  Chi tiết Checkin ({attendances.length} ngày)
+                  Chi tiết Checkin ({summary ? summary.total : attendances.length} ngày)
                 </h2>
                 
                 <div className="overflow-x-auto">
@@ -222,6 +245,18 @@ const UserHistory = () => {
                     </tbody>
                   </table>
                 </div>
+
+                {nextCursor && (
+                  <div className="text-center mt-6">
+                    <button
+                      onClick={fetchMoreHistory}
+                      disabled={isLoadingMore}
+                      className="bg-blue-500 hover:bg-blue-600 disabled:opacity-50 text-white px-6 py-3 rounded-lg font-medium transition-colors"
+                    >
+                      {isLoadingMore ? 'Đang tải...' : 'Xem thêm'}
+                    </button>
+                  </div>
+                )}
               </div>
             )}
           </div>
@@ -1,5 +1,5 @@
 import React, { useState, useRef, useEffect } from 'react';
-import apiService from '../../services/apiService';
+import apiService, { apiUrl } from '../../services/apiService';
 import * as faceapi from 'face-api.js';
 
 const Checkin = () => {
@@ -21,6 +21,7 @@ const Checkin = () => {
   const detectionIntervalRef = useRef(null);
   const resultTimeoutRef = useRef(null);
   const lastScanTime = useRef(0);
+  const lastFaceBox = useRef(null);
 
   // Load face-api models
   useEffect(() => {
@@ -115,6 +116,7 @@ const Checkin = () => {
         
         // Draw bounding box
         const box = detection.box;
+        lastFaceBox.current = { x: box.x, y: box.y, width: box.width, height: box.height };
         ctx.strokeStyle = '#00ff00';
         ctx.lineWidth = 3;
         ctx.strokeRect(box.x, box.y, box.width, box.height);
@@ -160,6 +162,7 @@ const Checkin = () => {
         }
       } else {
         setFaceDetected(false);
+        lastFaceBox.current = null;
       }
     } catch (err) {
       console.error('Face detection error:', err);
@@ -185,8 +188,8 @@ const Checkin = () => {
       context.drawImage(video, 0, 0, canvasRef.current.width, canvasRef.current.height);
       const imageDataUrl = canvasRef.current.toDataURL('image/jpeg', 0.8);
       
-      // Try to checkin
-      const response = await apiService.checkin(imageDataUrl);
+      // Try to checkin (send the detected box so the server can skip detection)
+      const response = await apiService.checkin(imageDataUrl, lastFaceBox.current);
       if (response.success) {
         setCapturedImageUrl(imageDataUrl);
         setResult(response);
@@ -518,7 +521,7 @@ const Checkin = () => {
                         )}
                       </div>
 
-                      {capturedImageUrl && result.user_image && (
+                      {capturedImageUrl && (result.user_image || result.user_image_url) && (
                         <div className="space-y-1">
                           <div className="bg-white/10 backdrop-blur-sm rounded-xl border border-white/30 overflow-hidden">
                             <div className="bg-gradient-to-r from-blue-500/60 to-blue-600/60 backdrop-blur-sm px-3 py-2">
@@ -526,7 +529,7 @@ const Checkin = () => {
                             </div>
                             <div className="p-3">
                               <img 
-                                src={`data:image/jpeg;base64,${result.user_image}`}
+                                src={result.user_image_url ? apiUrl(result.user_image_url) : `data:image/jpeg;base64,${result.user_image}`}
                                 alt="User original"
                                 className="w-full h-auto rounded-lg"
                               />
@@ -10,6 +10,28 @@ const api = axios.create({
   },
 });
 
+// Convert a base64 data URL into a binary Blob for multipart upload
+const dataUrlToBlob = (dataUrl) => {
+  const [header, base64] = dataUrl.split(',');
+  const mimeType = header.match(/data:(.*?);/)?.[1] || 'image/jpeg';
+  const binary = atob(base64);
+  const bytes = new Uint8Array(binary.length);
+  for (let i = 0; i < binary.length; i++) {
+    bytes[i] = binary.charCodeAt(i);
+  }
+  return new Blob([bytes], { type: mimeType });
+};
+
+// Stable per-browser kiosk id so the server can debounce repeated frames per kiosk
+const getKioskId = () => {
+  let kioskId = localStorage.getItem('kioskId');
+  if (!kioskId) {
+    kioskId = `kiosk-${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 8)}`;
+    localStorage.setItem('kioskId', kioskId);
+  }
+  return kioskId;
+};
+
 // API service functions
 const apiService = {
   // User registration
@@ -23,9 +45,10 @@ const apiService = {
   },
 
   // Get all users for history
-  getAllUsers: async () => {
+  getAllUsers: async (search = '', cursor = null, limit = 100) => {
     try {
-      const response = await api.get('/user/history');
+      const params = { limit, ...(search ? { q: search } : {}), ...(cursor ? { cursor } : {}) };
+      const response = await api.get('/user/history', { params });
       return response.data;
     } catch (error) {
       throw error.response?.data || { success: false, message: 'Network error' };
@@ -33,9 +56,19 @@ const apiService = {
   },
 
   // Face recognition check-in
-  checkin: async (imageData) => {
+  checkin: async (imageData, faceBox = null) => {
     try {
-      const response = await api.post('/attendance/checkin', { image_data: imageData });
+      // Send the frame as a binary multipart part instead of base64 JSON
+      const formData = new FormData();
+      formData.append('image', dataUrlToBlob(imageData), 'frame.jpg');
+      // Registration photo as a cacheable thumbnail URL instead of inline base64
+      formData.append('image_mode', 'url');
+      if (faceBox) {
+        formData.append('face_box', JSON.stringify(faceBox));
+      }
+      const response = await api.post('/attendance/checkin', formData, {
+        headers: { 'Content-Type': 'multipart/form-data', 'X-Kiosk-Id': getKioskId() },
+      });
       return response.data;
     } catch (error) {
       throw error.response?.data || { success: false, message: 'Network error' };
@@ -43,9 +76,10 @@ const apiService = {
   },
 
   // Get user attendance history
-  getUserHistory: async (userId) => {
+  getUserHistory: async (userId, cursor = null, limit = 50) => {
     try {
-      const response = await api.get(`/attendance/history/${userId}`);
+      const params = cursor ? { limit, cursor } : { limit };
+      const response = await api.get(`/attendance/history/${userId}`, { params });
       return response.data;
     } catch (error) {
       throw error.response?.data || { success: false, message: 'Network error' };
@@ -72,4 +106,7 @@ const apiService = {
   }
 };
 
+// Absolute URL for a path returned by the API (e.g. user_image_url)
+export const apiUrl = (path) => `${API_BASE_URL}${path}`;
+
 export default apiService;
\ No newline at end of file